@@ -1,9 +1,12 @@
 from django.urls import path, include
 
+from hackathon_site.views import RequestMetricsView
+
 app_name = "api"
 
 urlpatterns = [
     path("auth/", include("dj_rest_auth.urls")),
     path("hardware/", include("hardware.api_urls", namespace="hardware")),
     path("event/", include("event.api_urls", namespace="event")),
+    path("metrics/", RequestMetricsView.as_view(), name="request-metrics"),
 ]
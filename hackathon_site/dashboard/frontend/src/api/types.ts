@@ -108,7 +108,14 @@ export type OrderStatus =
     | "In Progress";
 export type PartReturnedHealth = "Healthy" | "Heavily Used" | "Broken" | "Lost";
 
-export type ItemsInOrder = Omit<OrderItem, "order" | "time_occurred">;
+// Orders list their items one unit at a time, keyed by the id of their order item
+// and their position in it
+export interface ItemsInOrder {
+    id: string;
+    order_item_id: number;
+    hardware_id: number;
+    part_returned_health: PartReturnedHealth | null;
+}
 
 export interface Order {
     id: number;
@@ -172,7 +179,13 @@ export interface OrderItem {
     id: number;
     hardware_id: number;
     order: number;
+    // The worst health its returned units came back in
     part_returned_health: PartReturnedHealth | null;
+    quantity: number;
+    quantity_returned_healthy: number;
+    quantity_returned_heavily_used: number;
+    quantity_returned_broken: number;
+    quantity_returned_lost: number;
     time_occurred: string;
 }
 
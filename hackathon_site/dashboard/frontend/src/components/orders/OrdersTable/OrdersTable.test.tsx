@@ -61,12 +61,14 @@ describe("Orders Table", () => {
         let params = {
             value: [
                 {
-                    id: 6,
+                    id: "6-0",
+                    order_item_id: 6,
                     hardware_id: 3,
                     part_returned_health: null,
                 },
                 {
-                    id: 7,
+                    id: "7-0",
+                    order_item_id: 7,
                     hardware_id: 4,
                     part_returned_health: null,
                 },
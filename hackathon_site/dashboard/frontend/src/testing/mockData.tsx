@@ -596,12 +596,14 @@ export const mockPendingOrders: Order[] = [
         id: 3,
         items: [
             {
-                id: 6,
+                id: "6-0",
+                order_item_id: 6,
                 hardware_id: 3,
                 part_returned_health: null,
             },
             {
-                id: 7,
+                id: "7-0",
+                order_item_id: 7,
                 hardware_id: 4,
                 part_returned_health: null,
             },
@@ -626,17 +628,20 @@ export const mockPendingOrders: Order[] = [
         id: 4,
         items: [
             {
-                id: 8,
+                id: "8-0",
+                order_item_id: 8,
                 hardware_id: 4,
                 part_returned_health: null,
             },
             {
-                id: 9,
+                id: "9-0",
+                order_item_id: 9,
                 hardware_id: 1,
                 part_returned_health: null,
             },
             {
-                id: 11,
+                id: "11-0",
+                order_item_id: 11,
                 hardware_id: 1,
                 part_returned_health: null,
             },
@@ -661,7 +666,8 @@ export const mockPendingOrders: Order[] = [
         id: 5,
         items: [
             {
-                id: 10,
+                id: "10-0",
+                order_item_id: 10,
                 hardware_id: 10,
                 part_returned_health: null,
             },
@@ -682,7 +688,8 @@ export const mockPendingOrders: Order[] = [
         id: 6,
         items: [
             {
-                id: 12,
+                id: "12-0",
+                order_item_id: 12,
                 hardware_id: 10,
                 part_returned_health: null,
             },
@@ -706,12 +713,14 @@ export const mockCheckedOutOrders: Order[] = [
         id: 1,
         items: [
             {
-                id: 1,
+                id: "1-0",
+                order_item_id: 1,
                 hardware_id: 1,
                 part_returned_health: null,
             },
             {
-                id: 2,
+                id: "2-0",
+                order_item_id: 2,
                 hardware_id: 1,
                 part_returned_health: null,
             },
@@ -732,17 +741,20 @@ export const mockCheckedOutOrders: Order[] = [
         id: 2,
         items: [
             {
-                id: 3,
+                id: "3-0",
+                order_item_id: 3,
                 hardware_id: 1,
                 part_returned_health: "Healthy",
             },
             {
-                id: 4,
+                id: "4-0",
+                order_item_id: 4,
                 hardware_id: 1,
                 part_returned_health: null,
             },
             {
-                id: 5,
+                id: "5-0",
+                order_item_id: 5,
                 hardware_id: 2,
                 part_returned_health: null,
             },
@@ -767,17 +779,20 @@ export const mockCheckedOutOrders: Order[] = [
         id: 7,
         items: [
             {
-                id: 10,
+                id: "10-0",
+                order_item_id: 10,
                 hardware_id: 10,
                 part_returned_health: null,
             },
             {
-                id: 11,
+                id: "11-0",
+                order_item_id: 11,
                 hardware_id: 10,
                 part_returned_health: "Heavily Used",
             },
             {
-                id: 12,
+                id: "12-0",
+                order_item_id: 12,
                 hardware_id: 10,
                 part_returned_health: null,
             },
@@ -802,17 +817,20 @@ export const mockSubmittedOrder: Order = {
     id: 4,
     items: [
         {
-            id: 8,
+            id: "8-0",
+            order_item_id: 8,
             hardware_id: 4,
             part_returned_health: null,
         },
         {
-            id: 9,
+            id: "9-0",
+            order_item_id: 9,
             hardware_id: 1,
             part_returned_health: null,
         },
         {
-            id: 11,
+            id: "11-0",
+            order_item_id: 11,
             hardware_id: 1,
             part_returned_health: null,
         },
@@ -941,7 +959,8 @@ export const mockReturnedOrdersInTable: ReturnOrderInTable[] = [
         id: 2,
         hardwareInOrder: [
             {
-                id: 3,
+                id: "3-0",
+                order_item_id: 3,
                 hardware_id: 1,
                 part_returned_health: "Healthy",
                 quantity: 1,
@@ -953,7 +972,8 @@ export const mockReturnedOrdersInTable: ReturnOrderInTable[] = [
         id: 7,
         hardwareInOrder: [
             {
-                id: 11,
+                id: "11-0",
+                order_item_id: 11,
                 hardware_id: 10,
                 part_returned_health: "Heavily Used",
                 quantity: 1,
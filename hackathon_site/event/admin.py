@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.db.models import Count
 from import_export import resources
-from import_export.admin import ExportMixin
+from hackathon_site.admin import ReplicaExportMixin
 
 from event.models import Profile, Team as EventTeam, User
 from hardware.admin import OrderInline
@@ -36,7 +36,7 @@ class UserResource(resources.ModelResource):
 
 
 @admin.register(User)
-class EnhancedUser(ExportMixin, UserAdmin):
+class EnhancedUser(ReplicaExportMixin, UserAdmin):
     list_display = UserAdmin.list_display + (
         "is_active",
         "get_application_status",
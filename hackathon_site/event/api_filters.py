@@ -1,8 +1,13 @@
+from functools import reduce
+import operator
+
 from django import forms
+from django.db.models import Exists, OuterRef, Q
 from django_filters import rest_framework as filters, widgets
+from rest_framework.filters import SearchFilter
 
 
-from event.models import Team as EventTeam
+from event.models import Profile, Team as EventTeam
 from event.serializers import TeamSerializer
 
 
@@ -27,3 +32,45 @@ class TeamFilter(filters.FilterSet):
     team_code = filters.CharFilter(
         field_name="team_code", label="Team code", help_text="Team code",
     )
+
+
+class TeamSearchFilter(SearchFilter):
+    """
+    Search teams by the fields in the view's search_fields, and by the profile
+    fields of their members in the view's member_search_fields.
+
+    Members are matched with an EXISTS subquery rather than by joining the profiles,
+    so a team is returned once however many of its members match, without the
+    DISTINCT that SearchFilter adds for multi-valued relations.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+
+        team_lookups = [
+            self.construct_search(str(field))
+            for field in self.get_search_fields(view, request) or ()
+        ]
+        member_lookups = [
+            self.construct_search(str(field))
+            for field in getattr(view, "member_search_fields", ())
+        ]
+
+        conditions = []
+        for search_term in search_terms:
+            queries = [Q(**{lookup: search_term}) for lookup in team_lookups]
+            if member_lookups:
+                members = Profile.objects.filter(team=OuterRef("pk")).filter(
+                    reduce(
+                        operator.or_,
+                        (Q(**{lookup: search_term}) for lookup in member_lookups),
+                    )
+                )
+                queries.append(Q(Exists(members)))
+            if queries:
+                conditions.append(reduce(operator.or_, queries))
+        if not conditions:
+            return queryset
+        return queryset.filter(reduce(operator.and_, conditions))
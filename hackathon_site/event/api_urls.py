@@ -44,6 +44,11 @@ urlpatterns = [
         api_views.CurrentTeamOrderListView.as_view(),
         name="team-orders",
     ),
+    path(
+        "teams/team/holdings/",
+        api_views.CurrentTeamHoldingsView.as_view(),
+        name="team-holdings",
+    ),
     re_path(
         "teams/(?P<team_code>[A-Z0-9]{5})/",
         api_views.TeamDetailView.as_view(),
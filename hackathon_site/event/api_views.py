@@ -1,12 +1,9 @@
 import logging
 
-from django.core import mail
-from django.core.mail import send_mail
 from django.db import transaction
 from django.db.models import Q
 from django.conf import settings
-from django.http import HttpResponseServerError
-from django.template.loader import render_to_string
+from django.http import Http404, HttpResponseServerError
 from drf_yasg.utils import swagger_auto_schema
 
 from rest_framework import generics, mixins, status, permissions
@@ -20,15 +17,26 @@ from event.serializers import (
     ProfileCreateResponseSerializer,
     UserReviewStatusSerializer,
 )
-from event.models import User, Team as EventTeam, Profile
+from event.models import (
+    User,
+    Team as EventTeam,
+    Profile,
+    current_team_cache,
+    current_user_cache,
+)
 from event.serializers import UserSerializer, TeamSerializer
+from hackathon_site.cache import CachedResponseMixin
+from hackathon_site.db_router import primary_reads
+from hackathon_site.utils import lock_teams
 from hardware.serializers import (
     IncidentCreateSerializer,
     OrderListSerializer,
+    TeamHoldingSerializer,
     TeamOrderChangeSerializer,
 )
 from event.permissions import UserHasProfile, FullDjangoModelPermissions
-from hardware.models import OrderItem, Order, Incident
+from hardware.models import OrderItem, Order, Incident, team_holdings_cache
+from outbox.utils import NotificationComposer
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +47,9 @@ ORDER_STATUS_CLOSING_MSG = {
 }
 
 
-class CurrentUserAPIView(generics.GenericAPIView, mixins.RetrieveModelMixin):
+class CurrentUserAPIView(
+    CachedResponseMixin, generics.GenericAPIView, mixins.RetrieveModelMixin
+):
     """
     View to handle API interaction with the current user's Profile
     """
@@ -47,6 +57,10 @@ class CurrentUserAPIView(generics.GenericAPIView, mixins.RetrieveModelMixin):
     queryset = User.objects.select_related("profile")
     serializer_class = UserSerializer
 
+    @property
+    def response_cache(self):
+        return current_user_cache(self.request.user.id)
+
     def get_object(self):
         queryset = self.get_queryset()
 
@@ -59,7 +73,9 @@ class CurrentUserAPIView(generics.GenericAPIView, mixins.RetrieveModelMixin):
         Reads the profile of the current logged in user. User details and
         group list are nested within the profile and user object, respectively.
         """
-        return self.retrieve(request, *args, **kwargs)
+        return self.cached_response(
+            request, lambda: self.retrieve(request, *args, **kwargs)
+        )
 
 
 class UserReviewStatusAPIView(generics.GenericAPIView, mixins.RetrieveModelMixin):
@@ -102,27 +118,52 @@ class CurrentUserReviewStatusAPIView(
         return self.retrieve(request, *args, **kwargs)
 
 
-class CurrentTeamAPIView(generics.GenericAPIView, mixins.RetrieveModelMixin):
+class CurrentTeamAPIView(
+    CachedResponseMixin, generics.GenericAPIView, mixins.RetrieveModelMixin
+):
     """
     View to handle API interaction with the current logged in user's EventTeam
     """
 
-    queryset = EventTeam.objects.all()
+    # Load the members' users in one query, instead of one per member
+    queryset = EventTeam.objects.prefetch_related("profiles__user")
     serializer_class = TeamSerializer
 
-    def get_object(self):
-        queryset = self.get_queryset()
+    def get_team_id(self):
+        """
+        The id of the current user's team, or None if they have no profile. It is
+        cached with the user's current user response, so that the response of an
+        unchanged team is served without any query.
+        """
+        user_cache = current_user_cache(self.request.user.id)
+        team_id = user_cache.get("team_id")
+        if team_id is None:
+            with primary_reads():
+                team_id = (
+                    Profile.objects.filter(user_id=self.request.user.id)
+                    .values_list("team_id", flat=True)
+                    .first()
+                )
+            if team_id is not None:
+                user_cache.set(team_id, "team_id")
+        return team_id
 
-        return generics.get_object_or_404(
-            queryset, profiles__user_id=self.request.user.id
-        )
+    def get_object(self):
+        return generics.get_object_or_404(self.get_queryset(), id=self.team_id)
 
     def get(self, request, *args, **kwargs):
         """
         Get the current users team profile and team details
         Reads the profile of the current logged in team.
         """
-        return self.retrieve(request, *args, **kwargs)
+        self.team_id = self.get_team_id()
+        if self.team_id is None:
+            raise Http404
+        # Shared by the members of the team
+        self.response_cache = current_team_cache(self.team_id)
+        return self.cached_response(
+            request, lambda: self.retrieve(request, *args, **kwargs)
+        )
 
 
 class LeaveTeamView(generics.GenericAPIView):
@@ -131,8 +172,8 @@ class LeaveTeamView(generics.GenericAPIView):
 
     @transaction.atomic
     def post(self, request, *args, **kwargs):
-        profile = request.user.profile
-        team = profile.team
+        profile = Profile.objects.select_for_update().get(user=request.user)
+        team = lock_teams(EventTeam, profile.team_id)[profile.team_id]
 
         if Profile.objects.filter(team__exact=team).count() <= 1:
             raise ValidationError(
@@ -174,12 +215,17 @@ class JoinTeamView(generics.GenericAPIView, mixins.RetrieveModelMixin):
 
     @transaction.atomic
     def post(self, request, *args, **kwargs):
-
-        profile = request.user.profile
-        current_team = profile.team
-
+        profile = Profile.objects.select_for_update().get(user=request.user)
         team = self.get_object()
 
+        # The members of both teams are counted with their rows locked, so that
+        # concurrent joins can't take a team over capacity
+        teams = lock_teams(EventTeam, profile.team_id, team.id)
+        if team.id not in teams:
+            raise Http404("The team was deleted")
+        current_team = teams[profile.team_id]
+        team = teams[team.id]
+
         if team.profiles.count() >= settings.MAX_MEMBERS:
             raise ValidationError({"detail": "Team is full"})
 
@@ -276,6 +322,35 @@ class CurrentTeamOrderListView(generics.ListAPIView):
         return self.list(request, *args, **kwargs)
 
 
+class CurrentTeamHoldingsView(CachedResponseMixin, generics.GenericAPIView):
+    serializer_class = TeamHoldingSerializer
+    permission_classes = [UserHasProfile]
+
+    @property
+    def response_cache(self):
+        return team_holdings_cache(self.request.user.profile.team_id)
+
+    def get_queryset(self):
+        return OrderItem.objects.filter(
+            order__team_id=self.request.user.profile.team_id
+        ).holdings()
+
+    def list_holdings(self):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return Response({"hardware": serializer.data})
+
+    @swagger_auto_schema(responses={200: TeamHoldingSerializer(many=True)})
+    def get(self, request, *args, **kwargs):
+        """
+        Summarize the hardware held by the current user's team
+
+        For each hardware in the team's orders, the number of units waiting to be
+        picked up, checked out, and returned in each condition, all computed in
+        one query. Cancelled orders are left out.
+        """
+        return self.cached_response(request, self.list_holdings)
+
+
 class TeamDetailView(
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -341,64 +416,34 @@ class TeamOrderDetailView(mixins.UpdateModelMixin, generics.GenericAPIView):
         if order_team != user_team:
             raise PermissionDenied("Can only change the status of your orders.")
 
+    @transaction.atomic
     def patch(self, request, *args, **kwargs):
         response = self.partial_update(request, *args, **kwargs)
 
         if "status" in request.data:
-            profiles = Profile.objects.filter(team__exact=response.data["team_id"])
-            connection = mail.get_connection(fail_silently=False)
-            connection.open()
-
-            try:
-                render_to_string_context = {
-                    "recipient": "Hardware Inventory Admins",
+            profiles = Profile.objects.filter(
+                team__exact=response.data["team_id"]
+            ).select_related("user")
+            composer = NotificationComposer(
+                self.update_order_email_subject_template,
+                {
                     "order": response.data,
                     "order_status_message": f'{ORDER_STATUS_MSG[response.data["status"]]} by {request.user.first_name}',
-                }
-                send_mail(
-                    subject=render_to_string(
-                        self.update_order_email_subject_template,
-                        render_to_string_context,
-                    ),
-                    message=render_to_string(
-                        self.update_order_email_template_admin,
-                        render_to_string_context,
-                    ),
-                    html_message=render_to_string(
-                        self.update_order_email_template_admin,
-                        render_to_string_context,
-                    ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    connection=connection,
-                    recipient_list=[settings.HSS_ADMIN_EMAIL],
+                    "order_status_closing_message": ORDER_STATUS_CLOSING_MSG[
+                        response.data["status"]
+                    ],
+                },
+            )
+            composer.add(
+                self.update_order_email_template_admin,
+                "Hardware Inventory Admins",
+                settings.HSS_ADMIN_EMAIL,
+            )
+            for profile in profiles:
+                composer.add(
+                    self.update_order_email_template_participant,
+                    profile.user.first_name,
+                    profile.user.email,
                 )
-                for profile in profiles:
-                    render_to_string_context = {
-                        **render_to_string_context,
-                        "recipient": profile.user,
-                        "order_status_closing_message": ORDER_STATUS_CLOSING_MSG[
-                            response.data["status"]
-                        ],
-                    }
-                    profile.user.email_user(
-                        subject=render_to_string(
-                            self.update_order_email_subject_template,
-                            render_to_string_context,
-                        ),
-                        message=render_to_string(
-                            self.update_order_email_template_participant,
-                            render_to_string_context,
-                        ),
-                        html_message=render_to_string(
-                            self.update_order_email_template_participant,
-                            render_to_string_context,
-                        ),
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        connection=connection,
-                    )
-            except Exception as e:
-                logger.error(e)
-                raise e
-            finally:
-                connection.close()
+            composer.queue()
         return response
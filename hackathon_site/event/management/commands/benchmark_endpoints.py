@@ -0,0 +1,368 @@
+from datetime import datetime, timedelta
+import json
+from pathlib import Path
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from event.models import (
+    Profile,
+    Team,
+    User,
+    current_team_cache,
+    current_user_cache,
+)
+from hackathon_site.metrics import percentile
+from hardware.models import Hardware, OrderItem, hardware_catalog_cache
+
+DEFAULT_BUDGETS_PATH = Path(__file__).resolve().parents[2] / "benchmark_budgets.json"
+# Added to the measured p95 latency when updating the budgets, at least, so that
+# the budgets of the fastest endpoints aren't within the noise
+MIN_LATENCY_SLACK_MS = 20
+
+
+class Endpoint:
+    """
+    A request to benchmark, made by the given user. The setup function is called
+    before every request.
+    """
+
+    def __init__(self, name, user, method, url, data=None, setup=None):
+        self.name = name
+        self.user = user
+        self.method = method
+        self.url = url
+        self.data = data
+        self.setup = setup
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot API and admin endpoints against the data in the database, "
+        "which should be seeded with seed_event. The p50 and p95 latency and number "
+        "of queries of every endpoint are compared against the budgets in "
+        "event/benchmark_budgets.json, and the command fails if any is exceeded. "
+        "Every request is rolled back, so the database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Number of measured requests to each endpoint (default: 20).",
+        )
+        parser.add_argument(
+            "--budgets",
+            default=str(DEFAULT_BUDGETS_PATH),
+            help="Path of the budgets file (default: event/benchmark_budgets.json).",
+        )
+        parser.add_argument(
+            "--skip-latency",
+            action="store_true",
+            help="Only check the number of queries, e.g. on a slower machine.",
+        )
+        parser.add_argument(
+            "--update-budgets",
+            action="store_true",
+            help="Write the measurements to the budgets file instead of checking them.",
+        )
+        parser.add_argument(
+            "--headroom",
+            type=float,
+            default=2.0,
+            help=(
+                "Factor applied to the measured p95 latency when updating the budgets "
+                "(default: 2.0)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        budgets_path = Path(options["budgets"])
+        budgets = {}
+        if not options["update_budgets"]:
+            try:
+                budgets = json.loads(budgets_path.read_text())["endpoints"]
+            except FileNotFoundError:
+                raise CommandError(
+                    f"No budgets file at {budgets_path}, create it with "
+                    "--update-budgets"
+                )
+
+        now = datetime.now(settings.TZ_INFO)
+        with override_settings(
+            # The test client uses the testserver host
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            # Orders can only be placed while hardware sign out is open
+            HARDWARE_SIGN_OUT_START_DATE=now - timedelta(days=1),
+            HARDWARE_SIGN_OUT_END_DATE=now + timedelta(days=1),
+        ), transaction.atomic():
+            results = {
+                endpoint.name: self.measure(endpoint, options["iterations"])
+                for endpoint in self.get_endpoints()
+            }
+            transaction.set_rollback(True)
+
+        if options["update_budgets"]:
+            self.update_budgets(budgets_path, results, options["headroom"])
+            return
+
+        regressions = []
+        for name, result in results.items():
+            budget = budgets.get(name)
+            if budget is None:
+                regressions.append(f"{name}: no budget")
+                continue
+            self.stdout.write(
+                f"{name}: p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms "
+                f"(budget {budget['p95_ms']:.1f} ms), {result['queries']} queries "
+                f"(budget {budget['queries']})"
+            )
+            if result["queries"] > budget["queries"]:
+                regressions.append(
+                    f"{name}: {result['queries']} queries, budget is "
+                    f"{budget['queries']}"
+                )
+            if not options["skip_latency"] and result["p95_ms"] > budget["p95_ms"]:
+                regressions.append(
+                    f"{name}: p95 latency is {result['p95_ms']:.1f} ms, budget is "
+                    f"{budget['p95_ms']:.1f} ms"
+                )
+
+        if regressions:
+            raise CommandError("Endpoints over budget:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("All endpoints are within budget."))
+
+    def get_endpoints(self):
+        admin = User.objects.create_superuser(
+            username="benchmark-admin@example.com",
+            email="benchmark-admin@example.com",
+            password=None,
+        )
+        admin.groups.add(Group.objects.get(name="Hardware Site Admins"))
+
+        # A team which can order, and whose members can leave since it has no
+        # orders in progress
+        idle_team = (
+            Team.objects.annotate(
+                members=Count("profiles", distinct=True),
+                active_orders=Count(
+                    "order", filter=~Q(order__status__in=["Cancelled", "Returned"])
+                ),
+            )
+            .filter(
+                members__gte=max(settings.MIN_MEMBERS, 2),
+                members__lte=settings.MAX_MEMBERS,
+                active_orders=0,
+            )
+            .order_by("id")
+            .first()
+        )
+        if idle_team is None:
+            raise CommandError(
+                "No team without orders in progress, seed the database with seed_event"
+            )
+        participant = Profile.objects.filter(team=idle_team).order_by("id").first().user
+        other_team = (
+            Team.objects.exclude(id=idle_team.id)
+            .annotate(members=Count("profiles"))
+            .filter(members__lt=settings.MAX_MEMBERS)
+            .order_by("id")
+            .first()
+        )
+
+        hardware = list(
+            Hardware.objects.filter(quantity_remaining__gt=0, max_per_team__gt=0)
+            .exclude(categories__max_per_team__lt=2)
+            .order_by("id")[:2]
+        )
+        unreturned_item = (
+            OrderItem.objects.filter(order__status="Picked Up")
+            .unreturned()
+            .order_by("id")
+            .first()
+        )
+        if other_team is None or len(hardware) < 2 or unreturned_item is None:
+            raise CommandError(
+                "Not enough data to benchmark, seed the database with seed_event"
+            )
+        search = hardware[0].name.split()[0]
+
+        return [
+            Endpoint(
+                "hardware-list",
+                participant,
+                "GET",
+                reverse("api:hardware:hardware-list"),
+                # Measure the view rather than the response cache
+                setup=hardware_catalog_cache.invalidate,
+            ),
+            Endpoint(
+                "hardware-list-cached",
+                participant,
+                "GET",
+                reverse("api:hardware:hardware-list"),
+            ),
+            Endpoint(
+                "hardware-search",
+                participant,
+                "GET",
+                f"{reverse('api:hardware:hardware-list')}?search={search}",
+                setup=hardware_catalog_cache.invalidate,
+            ),
+            Endpoint(
+                "order-create",
+                participant,
+                "POST",
+                reverse("api:hardware:order-list"),
+                data={"hardware": [{"id": h.id, "quantity": 1} for h in hardware]},
+            ),
+            Endpoint(
+                "order-return",
+                admin,
+                "POST",
+                reverse("api:hardware:order-return"),
+                data={
+                    "order": unreturned_item.order_id,
+                    "hardware": [
+                        {
+                            "id": unreturned_item.hardware_id,
+                            "quantity": 1,
+                            "part_returned_health": "Healthy",
+                        }
+                    ],
+                },
+            ),
+            Endpoint(
+                "team-join",
+                participant,
+                "POST",
+                reverse("api:event:join-team", args=[other_team.team_code]),
+            ),
+            Endpoint(
+                "team-leave", participant, "POST", reverse("api:event:leave-team"),
+            ),
+            Endpoint(
+                "current-user",
+                participant,
+                "GET",
+                reverse("api:event:current-user"),
+                setup=current_user_cache(participant.id).invalidate,
+            ),
+            Endpoint(
+                "current-user-cached",
+                participant,
+                "GET",
+                reverse("api:event:current-user"),
+            ),
+            Endpoint(
+                "current-team",
+                participant,
+                "GET",
+                reverse("api:event:current-team"),
+                setup=current_team_cache(idle_team.id).invalidate,
+            ),
+            Endpoint(
+                "current-team-cached",
+                participant,
+                "GET",
+                reverse("api:event:current-team"),
+            ),
+            Endpoint("team-list", admin, "GET", reverse("api:event:team-list")),
+            Endpoint(
+                "team-search",
+                admin,
+                "GET",
+                f"{reverse('api:event:team-list')}?search={participant.first_name}",
+            ),
+            Endpoint(
+                "admin-order-changelist",
+                admin,
+                "GET",
+                reverse("admin:hardware_order_changelist"),
+            ),
+            Endpoint(
+                "admin-hardware-changelist",
+                admin,
+                "GET",
+                reverse("admin:hardware_hardware_changelist"),
+            ),
+            Endpoint(
+                "admin-teamreview-changelist",
+                admin,
+                "GET",
+                reverse("admin:review_teamreview_changelist"),
+            ),
+        ]
+
+    def measure(self, endpoint, iterations):
+        client = APIClient()
+        client.force_login(endpoint.user)
+
+        timings = []
+        query_counts = []
+        # The first request warms up e.g. the content type and URL caches
+        for i in range(iterations + 1):
+            if endpoint.setup is not None:
+                endpoint.setup()
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = client.generic(
+                        endpoint.method,
+                        endpoint.url,
+                        json.dumps(endpoint.data) if endpoint.data else "",
+                        content_type="application/json",
+                    )
+                    duration = (time.perf_counter() - start) * 1000
+                transaction.set_rollback(True)
+
+            if response.status_code >= 400:
+                raise CommandError(
+                    f"{endpoint.name}: {endpoint.method} {endpoint.url} returned "
+                    f"{response.status_code}: {response.content[:500]}"
+                )
+            if i > 0:
+                timings.append(duration)
+                query_counts.append(len(queries))
+
+        timings.sort()
+        return {
+            "p50_ms": percentile(timings, 50),
+            "p95_ms": percentile(timings, 95),
+            "queries": max(query_counts),
+        }
+
+    def update_budgets(self, path, results, headroom):
+        budgets = {
+            name: {
+                "queries": result["queries"],
+                "p95_ms": round(
+                    max(
+                        result["p95_ms"] * headroom,
+                        result["p95_ms"] + MIN_LATENCY_SLACK_MS,
+                    ),
+                    1,
+                ),
+            }
+            for name, result in results.items()
+        }
+        path.write_text(
+            json.dumps(
+                {
+                    "dataset": "seed_event --users 1000",
+                    "headroom": headroom,
+                    "endpoints": budgets,
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        self.stdout.write(f"Wrote the budgets of {len(budgets)} endpoints to {path}")
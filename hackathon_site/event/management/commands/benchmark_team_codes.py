@@ -0,0 +1,161 @@
+import logging
+from statistics import mean
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.db.models import Count
+
+from event.models import Team as EventTeam
+from hackathon_site.metrics import percentile
+from registration.models import Team as RegistrationTeam
+
+MODELS = {"event": EventTeam, "registration": RegistrationTeam}
+
+
+class RetryCounter(logging.Handler):
+    """
+    Count the team code collisions logged by UniqueTeamCodeMixin.
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how long creating teams takes with unique team codes, one at a "
+        "time and from concurrent connections, and check that no code was handed "
+        "out twice. The teams created one at a time are rolled back, and those "
+        "created concurrently, which requires PostgreSQL, are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--teams",
+            type=int,
+            default=20000,
+            help="Number of teams created in each run (default: 20000).",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=16,
+            help="Number of concurrent connections creating teams (default: 16).",
+        )
+        parser.add_argument(
+            "--model",
+            choices=MODELS,
+            default="event",
+            help="Team model to create (default: event).",
+        )
+
+    def handle(self, *args, **options):
+        model = MODELS[options["model"]]
+        retry_counter = RetryCounter()
+        logger = logging.getLogger("hackathon_site.utils")
+        previous_level = logger.level
+        logger.setLevel(logging.INFO)
+        logger.addHandler(retry_counter)
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                timings = self.create_teams(model, options["teams"])
+                self.report(
+                    "Serial", timings, time.perf_counter() - start, retry_counter
+                )
+                self.check_unique(model)
+                transaction.set_rollback(True)
+
+            if connection.vendor != "postgresql":
+                self.stdout.write(
+                    self.style.WARNING(
+                        "Concurrent creation requires PostgreSQL, skipping it on "
+                        f"{connection.vendor}."
+                    )
+                )
+                return
+            retry_counter.count = 0
+            self.benchmark_concurrent(model, options, retry_counter)
+        finally:
+            logger.removeHandler(retry_counter)
+            logger.setLevel(previous_level)
+
+    @staticmethod
+    def create_teams(model, count, team_ids=None):
+        timings = []
+        for _ in range(count):
+            start = time.perf_counter()
+            team = model.objects.create()
+            timings.append(time.perf_counter() - start)
+            if team_ids is not None:
+                team_ids.append(team.id)
+        return timings
+
+    def benchmark_concurrent(self, model, options, retry_counter):
+        threads = options["threads"]
+        per_thread = options["teams"] // threads
+        barrier = threading.Barrier(threads)
+        timings = [[] for _ in range(threads)]
+        team_ids = [[] for _ in range(threads)]
+
+        def run(thread_timings, thread_team_ids):
+            try:
+                barrier.wait()
+                thread_timings += self.create_teams(model, per_thread, thread_team_ids)
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=run, args=(timings[i], team_ids[i]))
+            for i in range(threads)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        duration = time.perf_counter() - start
+
+        try:
+            all_timings = [timing for thread in timings for timing in thread]
+            self.report(
+                f"Concurrent ({threads} connections)",
+                all_timings,
+                duration,
+                retry_counter,
+            )
+            self.check_unique(model)
+        finally:
+            model.objects.filter(
+                id__in=[team_id for thread in team_ids for team_id in thread]
+            ).delete()
+
+    def report(self, label, timings, duration, retry_counter):
+        timings = sorted(timing * 1000 for timing in timings)
+        self.stdout.write(
+            f"{label}: {len(timings)} teams in {duration:.2f} s "
+            f"({len(timings) / duration:.0f} per second), mean {mean(timings):.3f} ms, "
+            f"p50 {percentile(timings, 50):.3f} ms, p95 {percentile(timings, 95):.3f} "
+            f"ms, max {timings[-1]:.3f} ms per team, {retry_counter.count} code "
+            "collisions retried"
+        )
+
+    def check_unique(self, model):
+        duplicates = (
+            model.objects.values("team_code")
+            .annotate(count=Count("id"))
+            .filter(count__gt=1)
+            .count()
+        )
+        if duplicates:
+            self.stdout.write(
+                self.style.ERROR(f"{duplicates} team codes are used more than once")
+            )
+        else:
+            self.stdout.write("Every team code is unique.")
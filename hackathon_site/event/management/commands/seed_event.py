@@ -0,0 +1,527 @@
+from collections import Counter
+from datetime import date, timedelta
+from math import exp
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from event.models import Profile, Team as EventTeam, User
+from hardware.models import Category, Hardware, Incident, Order, OrderItem
+from registration.models import Application, Team as RegistrationTeam
+from review.models import Review
+
+BATCH_SIZE = 2000
+
+FIRST_NAMES = [
+    "Alex",
+    "Sam",
+    "Jordan",
+    "Taylor",
+    "Morgan",
+    "Casey",
+    "Riley",
+    "Jamie",
+    "Avery",
+    "Quinn",
+    "Priya",
+    "Wei",
+    "Omar",
+    "Sofia",
+    "Mateo",
+    "Aiko",
+]
+LAST_NAMES = [
+    "Smith",
+    "Chen",
+    "Patel",
+    "Nguyen",
+    "Kim",
+    "Garcia",
+    "Singh",
+    "Brown",
+    "Li",
+    "Martin",
+    "Wong",
+    "Khan",
+]
+SCHOOLS = [
+    "University of Toronto",
+    "University of Waterloo",
+    "McGill University",
+    "Queen's University",
+    "York University",
+    "McMaster University",
+]
+CATEGORIES = [
+    "Microcontrollers",
+    "Single Board Computers",
+    "Sensors",
+    "Motors",
+    "Displays",
+    "Power",
+    "Cables",
+    "Cameras",
+    "Audio",
+    "Wireless",
+    "Prototyping",
+    "Tools",
+    "Robotics",
+    "Wearables",
+    "Storage",
+]
+PARTS = [
+    "Arduino",
+    "Raspberry Pi",
+    "ESP32",
+    "Servo Motor",
+    "Stepper Motor",
+    "Ultrasonic Sensor",
+    "Temperature Sensor",
+    "LED Strip",
+    "Camera Module",
+    "Motor Driver",
+    "Breadboard",
+    "USB Cable",
+    "Battery Pack",
+    "LCD Display",
+    "Accelerometer",
+    "Microphone",
+]
+VARIANTS = ["Mini", "Nano", "Pro", "Uno", "Mega", "Lite", "Plus", "Max", "Zero"]
+MANUFACTURERS = ["Adafruit", "SparkFun", "Seeed", "DFRobot", "Pololu", "Espressif"]
+
+# (value, weight) pairs of the distributions used below
+TEAM_SIZES = [(4, 40), (3, 30), (2, 20), (1, 10)]
+REVIEW_STATUSES = [("Accepted", 60), ("Waitlisted", 20), ("Rejected", 20)]
+ORDER_STATUSES = [
+    ("Submitted", 10),
+    ("Ready for Pickup", 10),
+    ("Picked Up", 45),
+    ("Returned", 20),
+    ("Cancelled", 15),
+]
+RETURN_HEALTHS = [("Healthy", 85), ("Heavily Used", 8), ("Broken", 5), ("Lost", 2)]
+INCIDENT_STATES = {
+    "Heavily Used": "Heavily Used",
+    "Broken": "Broken",
+    "Lost": "Missing",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic event: users, registration teams, "
+        "applications, reviews, event teams and profiles, hardware, categories, "
+        "orders, order items and incidents. The data only depends on the "
+        "arguments, so the same seed always produces the same event. All of the "
+        "rows are written with bulk_create, in a single transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=1000,
+            help="Number of participants to create (default: 1000).",
+        )
+        parser.add_argument(
+            "--hardware",
+            type=int,
+            default=300,
+            help="Number of hardware in the catalog (default: 300).",
+        )
+        parser.add_argument(
+            "--orders-per-team",
+            type=float,
+            default=4,
+            help="Average number of orders placed by an event team (default: 4).",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed (default: 0)."
+        )
+        parser.add_argument(
+            "--password",
+            default="hackathon",
+            help="Password of every generated user (default: hackathon).",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.seed = options["seed"]
+        if User.objects.filter(username__startswith=self.username_prefix).exists():
+            raise CommandError(
+                f"Users from seed {self.seed} already exist, use another --seed."
+            )
+
+        start = time.perf_counter()
+        self.counts = Counter()
+        # Time spent in bulk_create, per model
+        self.durations = Counter()
+        self.next_ids = {}
+        # Hashing a password is slow on purpose, so every user shares one hash
+        self.password_hash = make_password(options["password"], salt=f"seed{self.seed}")
+        with transaction.atomic():
+            users = self.create_users(options["users"])
+            reviewers = self.create_reviewers(max(options["users"] // 200, 1))
+            accepted = self.create_applications(users, reviewers)
+            event_teams = self.create_event_teams(accepted)
+            categories = self.create_categories()
+            # Enough stock for about half of the units ordered to be out at once
+            stock_scale = max(
+                round(len(event_teams) * options["orders_per_team"] / 3000), 1
+            )
+            hardware = self.create_hardware(
+                options["hardware"], categories, stock_scale
+            )
+            self.create_orders(event_teams, hardware, options["orders_per_team"])
+            self.reset_sequences()
+
+        for label, count in self.counts.items():
+            self.stdout.write(
+                f"{label}: {count} rows, created in {self.durations[label]:.2f} s"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Seeded in {time.perf_counter() - start:.2f} s.")
+        )
+
+    @property
+    def username_prefix(self):
+        return f"seed{self.seed}-"
+
+    def choose(self, weighted_choices):
+        values, weights = zip(*weighted_choices)
+        return self.rng.choices(values, weights)[0]
+
+    def new(self, model, **fields):
+        """
+        Instantiate a model with an explicit id, so that it can be referenced
+        before it is created. Some backends don't return the ids of objects
+        created with bulk_create.
+        """
+        if model not in self.next_ids:
+            max_id = model.objects.aggregate(max_id=Max("id"))["max_id"]
+            self.next_ids[model] = (max_id or 0) + 1
+        obj = model(id=self.next_ids[model], **fields)
+        self.next_ids[model] += 1
+        return obj
+
+    def bulk_create(self, model, objects):
+        start = time.perf_counter()
+        model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+        self.counts[model._meta.label] += len(objects)
+        self.durations[model._meta.label] += time.perf_counter() - start
+        return objects
+
+    def reset_sequences(self):
+        """
+        Move the id sequences past the explicit ids given to the new rows.
+        """
+        models = [
+            User,
+            RegistrationTeam,
+            Application,
+            Review,
+            EventTeam,
+            Profile,
+            Category,
+            Hardware,
+            Hardware.categories.through,
+            Order,
+            OrderItem,
+            Incident,
+        ]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    def create_users(self, count):
+        users = []
+        for i in range(count):
+            first_name = self.rng.choice(FIRST_NAMES)
+            last_name = self.rng.choice(LAST_NAMES)
+            email = f"{self.username_prefix}{i}@example.com"
+            users.append(
+                self.new(
+                    User,
+                    username=email,
+                    email=email,
+                    first_name=first_name,
+                    last_name=last_name,
+                    password=self.password_hash,
+                )
+            )
+        return self.bulk_create(User, users)
+
+    def create_reviewers(self, count):
+        return self.bulk_create(
+            User,
+            [
+                self.new(
+                    User,
+                    username=f"{self.username_prefix}reviewer{i}@example.com",
+                    email=f"{self.username_prefix}reviewer{i}@example.com",
+                    first_name="Reviewer",
+                    last_name=str(i),
+                    password=self.password_hash,
+                    is_staff=True,
+                )
+                for i in range(count)
+            ],
+        )
+
+    def create_applications(self, users, reviewers):
+        """
+        Most users apply, in registration teams of one to four, and most
+        applications are reviewed. Returns the applications of accepted
+        applicants who RSVP yes.
+        """
+        applicants = [user for user in users if self.rng.random() < 0.9]
+        teams = []
+        applications = []
+        reviews = []
+        i = 0
+        while i < len(applicants):
+            team_size = self.choose(TEAM_SIZES)
+            teams.append(self.new(RegistrationTeam, team_code=self.team_code()))
+            for user in applicants[i : i + team_size]:
+                application = self.new(
+                    Application,
+                    user=user,
+                    team=teams[-1],
+                    birthday=date(2000, 1, 1)
+                    + timedelta(days=self.rng.randrange(8 * 365)),
+                    gender=self.rng.choice(Application.GENDER_CHOICES[1:])[0],
+                    ethnicity=self.rng.choice(Application.ETHNICITY_CHOICES[1:])[0],
+                    phone_number=f"416555{self.rng.randrange(10000):04}",
+                    school=self.rng.choice(SCHOOLS),
+                    study_level=self.rng.choice(Application.STUDY_LEVEL_CHOICES[1:])[0],
+                    graduation_year=self.rng.randrange(2024, 2030),
+                    resume="applications/resumes/seed.pdf",
+                    q1="Why do you want to attend?",
+                    q2="What would you like to build?",
+                    q3="Tell us about a project you are proud of.",
+                    conduct_agree=True,
+                    data_agree=True,
+                )
+                applications.append(application)
+                if self.rng.random() < 0.8:
+                    reviews.append(self.review(application, reviewers))
+            i += team_size
+
+        self.bulk_create(RegistrationTeam, teams)
+        self.bulk_create(Application, applications)
+        self.bulk_create(Review, reviews)
+        return [
+            review.application
+            for review in reviews
+            if review.status == "Accepted" and review.application.rsvp
+        ]
+
+    def review(self, application, reviewers):
+        status = self.choose(REVIEW_STATUSES)
+        if status == "Accepted":
+            application.rsvp = self.rng.random() < 0.85
+        return self.new(
+            Review,
+            reviewer=self.rng.choice(reviewers),
+            application=application,
+            interest=self.rng.randint(0, 10),
+            experience=self.rng.randint(0, 10),
+            quality=self.rng.randint(0, 10),
+            status=status,
+            decision_sent_date=date.today(),
+        )
+
+    def create_event_teams(self, accepted):
+        """
+        Accepted applicants who RSVP yes get a profile, in an event team with the
+        rest of their registration team.
+        """
+        registration_team_ids = sorted({app.team_id for app in accepted})
+        event_teams = {
+            team_id: self.new(EventTeam, team_code=self.team_code())
+            for team_id in registration_team_ids
+        }
+        self.bulk_create(EventTeam, list(event_teams.values()))
+        self.bulk_create(
+            Profile,
+            [
+                self.new(
+                    Profile,
+                    user_id=application.user_id,
+                    team=event_teams[application.team_id],
+                    phone_number=application.phone_number,
+                    id_provided=self.rng.random() < 0.9,
+                    attended=self.rng.random() < 0.9,
+                    acknowledge_rules=True,
+                    e_signature=f"{application.user.first_name} "
+                    f"{application.user.last_name}",
+                )
+                for application in accepted
+            ],
+        )
+        return list(event_teams.values())
+
+    def team_code(self):
+        """
+        A unique team code, for both kinds of teams. Team codes are normally
+        generated with one query each to check for collisions.
+        """
+        if not hasattr(self, "team_codes"):
+            self.team_codes = set(
+                RegistrationTeam.objects.values_list("team_code", flat=True)
+            ) | set(EventTeam.objects.values_list("team_code", flat=True))
+        while True:
+            team_code = "".join(self.rng.choice("0123456789ABCDEF") for _ in range(5))
+            if team_code not in self.team_codes:
+                self.team_codes.add(team_code)
+                return team_code
+
+    def create_categories(self):
+        return self.bulk_create(
+            Category,
+            [
+                self.new(
+                    Category, name=name, max_per_team=self.rng.choice([4, 6, 8, 10, 20])
+                )
+                for name in CATEGORIES
+            ],
+        )
+
+    def create_hardware(self, count, categories, stock_scale):
+        hardware = self.bulk_create(
+            Hardware,
+            [
+                self.new(
+                    Hardware,
+                    name=f"{self.rng.choice(PARTS)} {self.rng.choice(VARIANTS)} {i}",
+                    model_number=f"{self.rng.choice('ABCDEFGH')}"
+                    f"{self.rng.randrange(10000)}",
+                    manufacturer=self.rng.choice(MANUFACTURERS),
+                    datasheet="/datasheet/location/",
+                    quantity_available=self.rng.randrange(5, 100) * stock_scale,
+                    max_per_team=self.rng.randrange(1, 9),
+                    picture="/picture/location",
+                )
+                for i in range(count)
+            ],
+        )
+        HardwareCategory = Hardware.categories.through
+        self.bulk_create(
+            HardwareCategory,
+            [
+                self.new(HardwareCategory, hardware=item, category=category)
+                for item in hardware
+                for category in self.rng.sample(categories, self.rng.randint(1, 2))
+            ],
+        )
+        return hardware
+
+    def create_orders(self, event_teams, hardware, orders_per_team):
+        """
+        Teams order a few lines of hardware at a time, with popular hardware
+        ordered much more often. Hardware is never ordered past its stock.
+        """
+        # Popularity follows Zipf's law
+        popularity = [1 / (rank + 1) for rank in range(len(hardware))]
+        stock = {item.id: item.quantity_available for item in hardware}
+
+        orders = []
+        order_items = []
+        for team in event_teams:
+            for _ in range(self.poisson(orders_per_team)):
+                status = self.choose(ORDER_STATUSES)
+                order = self.new(Order, team=team, status=status, request=[])
+                lines = {}
+                for item in self.rng.choices(
+                    hardware, popularity, k=self.rng.randint(1, 8)
+                ):
+                    quantity = min(
+                        self.rng.randint(1, 3), item.max_per_team, stock[item.id]
+                    )
+                    if quantity > 0 and item.id not in lines:
+                        lines[item.id] = self.new(
+                            OrderItem, order=order, hardware=item, quantity=quantity
+                        )
+                if not lines:
+                    continue
+
+                for order_item in lines.values():
+                    if status != "Cancelled":
+                        stock[order_item.hardware_id] -= order_item.quantity
+                    if status == "Returned" or (
+                        status == "Picked Up" and self.rng.random() < 0.2
+                    ):
+                        self.return_units(order_item, status == "Returned")
+                    order.request.append(
+                        {
+                            "id": order_item.hardware_id,
+                            "requested_quantity": order_item.quantity,
+                        }
+                    )
+                    if status != "Cancelled":
+                        # Returned healthy units are back in stock
+                        stock[
+                            order_item.hardware_id
+                        ] += order_item.quantity_returned_healthy
+                orders.append(order)
+                order_items += lines.values()
+
+        self.bulk_create(Order, orders)
+        self.bulk_create(OrderItem, order_items)
+        self.create_incidents(order_items)
+
+        # Order items are created without signals, so update the stock here
+        Hardware.objects.update_quantity_checked_out(
+            {item.id: item.quantity_available - stock[item.id] for item in hardware}
+        )
+
+    def return_units(self, order_item, all_units):
+        returned = (
+            order_item.quantity
+            if all_units
+            else self.rng.randint(1, order_item.quantity)
+        )
+        for _ in range(returned):
+            field = OrderItem.RETURNED_HEALTH_FIELDS[self.choose(RETURN_HEALTHS)]
+            setattr(order_item, field, getattr(order_item, field) + 1)
+
+    def create_incidents(self, order_items):
+        """
+        Units returned in a bad state usually come with an incident report.
+        """
+        now = timezone.now()
+        incidents = []
+        for order_item in order_items:
+            for health, state in INCIDENT_STATES.items():
+                field = OrderItem.RETURNED_HEALTH_FIELDS[health]
+                if getattr(order_item, field) and self.rng.random() < 0.7:
+                    incidents.append(
+                        self.new(
+                            Incident,
+                            state=state,
+                            time_occurred=now
+                            - timedelta(minutes=self.rng.randrange(48 * 60)),
+                            description=f"{health} {order_item.hardware.name}",
+                            order_item=order_item,
+                        )
+                    )
+        self.bulk_create(Incident, incidents)
+
+    def poisson(self, mean):
+        """
+        A Poisson distributed number, with Knuth's algorithm.
+        """
+        limit = exp(-mean)
+        count = 0
+        product = self.rng.random()
+        while product > limit:
+            count += 1
+            product *= self.rng.random()
+        return count
@@ -2,18 +2,38 @@ from django.db import models
 from django.contrib.auth import get_user_model
 import uuid
 
+from hackathon_site.cache import VersionedCache
+from hackathon_site.utils import UniqueTeamCodeMixin
+
 User = get_user_model()
 
 
+def current_user_cache(user_id):
+    """
+    Cached current user API response of a user, and the id of their team.
+    Invalidated whenever the user, their profile or their groups change, see
+    event/signals.py.
+    """
+    return VersionedCache(f"event:current_user:{user_id}")
+
+
+def current_team_cache(team_id):
+    """
+    Cached current team API response of a team's members. Invalidated whenever
+    the team, its members' profiles or their users change, see event/signals.py.
+    """
+    return VersionedCache(f"event:current_team:{team_id}")
+
+
 def _generate_team_code():
-    team_code = uuid.uuid4().hex[:5].upper()
-    while Team.objects.filter(team_code=team_code).exists():
-        team_code = uuid.uuid4().hex[:5].upper()
-    return team_code
+    # Uniqueness is enforced by the database, see UniqueTeamCodeMixin
+    return uuid.uuid4().hex[:5].upper()
 
 
-class Team(models.Model):
-    team_code = models.CharField(max_length=5, default=_generate_team_code, null=False)
+class Team(UniqueTeamCodeMixin, models.Model):
+    team_code = models.CharField(
+        max_length=5, default=_generate_team_code, unique=True, null=False
+    )
 
     created_at = models.DateTimeField(auto_now_add=True, null=False)
     updated_at = models.DateTimeField(auto_now=True, null=False)
@@ -1,8 +1,75 @@
-import copy
-
 from rest_framework import permissions
 from rest_framework.permissions import DjangoModelPermissions
 
+from hackathon_site.cache import VersionedCache
+from hackathon_site.db_router import primary_reads
+
+
+def permission_snapshot_cache(user_id):
+    """
+    Cached groups and permissions of a user. Invalidated whenever the user's
+    groups or permissions, or the permissions of their groups, change, see
+    event/signals.py.
+    """
+    return VersionedCache(f"event:permissions:{user_id}")
+
+
+class PermissionSnapshot:
+    """
+    The names of a user's groups, and their model permissions as returned by
+    user.get_all_permissions().
+
+    Like ModelBackend, active superusers have every permission. Theirs aren't
+    listed, so that they also have the permissions added after the snapshot was
+    taken.
+    """
+
+    def __init__(self, groups=(), permissions=(), is_active=False, is_superuser=False):
+        self.groups = frozenset(groups)
+        self.permissions = frozenset(permissions)
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+
+    def in_group(self, name):
+        return name in self.groups
+
+    def has_perms(self, perms):
+        if self.is_active and self.is_superuser:
+            return True
+        return all(perm in self.permissions for perm in perms)
+
+
+def get_permission_snapshot(user):
+    """
+    Get the permission snapshot of a user from the cache, computing it if needed.
+    It is memoized on the user, which lasts as long as the request.
+    """
+    if not user or not user.is_authenticated:
+        return PermissionSnapshot()
+
+    snapshot = getattr(user, "_permission_snapshot", None)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot_cache = permission_snapshot_cache(user.id)
+    data = snapshot_cache.get("snapshot")
+    if data is None:
+        # Read from the primary, like cached responses, so that a lagging replica
+        # can't have the old permissions cached as new
+        with primary_reads():
+            data = {
+                "groups": sorted(user.groups.values_list("name", flat=True)),
+                "permissions": (
+                    [] if user.is_superuser else sorted(user.get_all_permissions())
+                ),
+                "is_active": user.is_active,
+                "is_superuser": user.is_superuser,
+            }
+        snapshot_cache.set(data, "snapshot")
+
+    user._permission_snapshot = PermissionSnapshot(**data)
+    return user._permission_snapshot
+
 
 class UserHasProfile(permissions.IsAuthenticated):
     """
@@ -26,17 +93,30 @@ class UserIsAdmin(permissions.IsAuthenticated):
         return (
             super().has_permission(request, view)
             and request.user
-            and request.user.groups.filter(name="Hardware Site Admins").exists()
+            and get_permission_snapshot(request.user).in_group("Hardware Site Admins")
         )
 
 
 class FullDjangoModelPermissions(DjangoModelPermissions):
     """
-    Adds view permission requirements, which are otherwise not checked by DjangoModelPermissions
+    Adds view permission requirements, which are otherwise not checked by DjangoModelPermissions.
+    Permissions are checked against the user's permission snapshot.
     """
 
-    def __init__(self):
-        self.perms_map = copy.deepcopy(self.perms_map)
-        self.perms_map["GET"] = ["%(app_label)s.view_%(model_name)s"]
-        self.perms_map["OPTIONS"] = ["%(app_label)s.view_%(model_name)s"]
-        self.perms_map["HEAD"] = ["%(app_label)s.view_%(model_name)s"]
+    perms_map = {
+        **DjangoModelPermissions.perms_map,
+        "GET": ["%(app_label)s.view_%(model_name)s"],
+        "OPTIONS": ["%(app_label)s.view_%(model_name)s"],
+        "HEAD": ["%(app_label)s.view_%(model_name)s"],
+    }
+
+    def has_permission(self, request, view):
+        if getattr(view, "_ignore_model_permissions", False):
+            return True
+
+        if not request.user or not request.user.is_authenticated:
+            return False
+
+        queryset = self._queryset(view)
+        perms = self.get_required_permissions(request.method, queryset.model)
+        return get_permission_snapshot(request.user).has_perms(perms)
@@ -6,6 +6,7 @@ from django.conf import settings
 from rest_framework import serializers
 
 from event.models import Profile, User, Team
+from event.permissions import get_permission_snapshot
 from registration.models import Application
 from review.models import Review
 
@@ -99,10 +100,8 @@ class CurrentProfileSerializer(ProfileSerializer):
         if hasattr(current_user, "profile"):
             raise serializers.ValidationError("User already has profile")
 
-        is_test_user = (
-            self.context["request"]
-            .user.groups.filter(name=settings.TEST_USER_GROUP)
-            .exists()
+        is_test_user = get_permission_snapshot(self.context["request"].user).in_group(
+            settings.TEST_USER_GROUP
         )
 
         if not is_test_user:
@@ -1,6 +1,27 @@
-from django.db.models.signals import post_delete
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
-from event.models import Profile, Team
+from event.models import (
+    Profile,
+    Team,
+    User,
+    current_team_cache,
+    current_user_cache,
+)
+from event.permissions import permission_snapshot_cache
+from hackathon_site.utils import lock_teams
+
+# Fields of the user shown in the current user and current team responses
+USER_RESPONSE_FIELDS = {"id", "first_name", "last_name", "email"}
+# Fields of the user that change their permissions
+USER_PERMISSION_FIELDS = {"is_active", "is_superuser"}
 
 
 @receiver(post_delete, sender=Profile, dispatch_uid="profile_delete_signal")
@@ -13,9 +34,146 @@ def delete_profile(sender, instance, **kwargs):
     delete the team properly, remaining Profiles do not need to do so
     """
 
-    try:
-        team = instance.team
-    except Team.DoesNotExist:
+    with transaction.atomic():
+        # Locked so that nobody joins the team between the count and the delete
+        team = lock_teams(Team, instance.team_id).get(instance.team_id)
+        if team is not None and not team.profiles.exists():
+            team.delete()
+
+
+@receiver(pre_save, sender=Profile, dispatch_uid="current_team_profile_pre_save")
+def remember_profile_team(sender, instance, raw=False, **kwargs):
+    """
+    Remember the team of the profile before it was saved, so that the team it
+    left can be invalidated too.
+    """
+    instance._previous_team_id = None
+    if raw or instance.pk is None:
+        return
+
+    instance._previous_team_id = (
+        Profile.objects.filter(pk=instance.pk).values_list("team_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Profile, dispatch_uid="current_user_profile_save")
+@receiver(post_delete, sender=Profile, dispatch_uid="current_user_profile_delete")
+def invalidate_profile_responses(sender, instance, **kwargs):
+    current_user_cache(instance.user_id).invalidate()
+    team_ids = {instance.team_id, getattr(instance, "_previous_team_id", None)}
+    for team_id in team_ids - {None}:
+        current_team_cache(team_id).invalidate()
+
+
+@receiver(post_save, sender=Team, dispatch_uid="current_team_team_save")
+@receiver(post_delete, sender=Team, dispatch_uid="current_team_team_delete")
+def invalidate_team_response(sender, instance, **kwargs):
+    current_team_cache(instance.id).invalidate()
+
+
+@receiver(post_save, sender=User, dispatch_uid="current_user_user_save")
+@receiver(post_delete, sender=User, dispatch_uid="current_user_user_delete")
+def invalidate_user_responses(sender, instance, update_fields=None, **kwargs):
+    """
+    Saves of fields that aren't in the responses, like the last login, leave
+    them cached.
+    """
+    if update_fields is not None and not USER_RESPONSE_FIELDS & set(update_fields):
+        return
+
+    current_user_cache(instance.id).invalidate()
+    team_id = (
+        Profile.objects.filter(user_id=instance.id)
+        .values_list("team_id", flat=True)
+        .first()
+    )
+    if team_id is not None:
+        current_team_cache(team_id).invalidate()
+
+
+def _changed_user_ids(instance, action, reverse, pk_set):
+    """
+    The ids of the users whose groups or permissions were changed by an
+    m2m_changed signal, or None if there are none to invalidate yet.
+    """
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            return [instance.id]
+        return None
+
+    # Changed from the group or permission, pk_set has the ids of users
+    if action in ("post_add", "post_remove"):
+        return pk_set
+    if action == "pre_clear":
+        return instance.user_set.values_list("id", flat=True)
+    return None
+
+
+@receiver(
+    m2m_changed, sender=User.groups.through, dispatch_uid="current_user_groups_changed"
+)
+def invalidate_user_groups(sender, instance, action, reverse, pk_set, **kwargs):
+    for user_id in _changed_user_ids(instance, action, reverse, pk_set) or ():
+        current_user_cache(user_id).invalidate()
+        permission_snapshot_cache(user_id).invalidate()
+
+
+@receiver(
+    m2m_changed,
+    sender=User.user_permissions.through,
+    dispatch_uid="permission_snapshot_user_permissions_changed",
+)
+def invalidate_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    for user_id in _changed_user_ids(instance, action, reverse, pk_set) or ():
+        permission_snapshot_cache(user_id).invalidate()
+
+
+@receiver(
+    m2m_changed,
+    sender=Group.permissions.through,
+    dispatch_uid="permission_snapshot_group_permissions_changed",
+)
+def invalidate_group_permission_snapshots(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if not reverse:
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        group_ids = [instance.id]
+    # Changed from the permission, pk_set has the ids of groups
+    elif action in ("post_add", "post_remove"):
+        group_ids = pk_set
+    elif action == "pre_clear":
+        group_ids = instance.group_set.values_list("id", flat=True)
+    else:
+        return
+
+    user_ids = (
+        User.objects.filter(groups__in=group_ids)
+        .values_list("id", flat=True)
+        .distinct()
+    )
+    for user_id in user_ids:
+        permission_snapshot_cache(user_id).invalidate()
+
+
+@receiver(post_save, sender=User, dispatch_uid="permission_snapshot_user_save")
+def invalidate_user_permission_snapshot(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not USER_PERMISSION_FIELDS & set(update_fields):
+        return
+    permission_snapshot_cache(instance.id).invalidate()
+
+
+@receiver(post_save, sender=Group, dispatch_uid="current_user_group_save")
+@receiver(pre_delete, sender=Group, dispatch_uid="current_user_group_delete")
+def invalidate_group_users(sender, instance, created=False, **kwargs):
+    """
+    Both the current user responses and permission snapshots have the names of
+    the groups. Deleting a group removes its users from it without sending
+    m2m_changed, so they are invalidated before the delete.
+    """
+    if created:
         return
-    if team.profiles.count() == 0:
-        team.delete()
+    for user_id in instance.user_set.values_list("id", flat=True):
+        current_user_cache(user_id).invalidate()
+        permission_snapshot_cache(user_id).invalidate()
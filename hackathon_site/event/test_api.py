@@ -1,20 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+
 from django.conf import settings
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from hackathon_site.tests import SetupUserMixin
 from django.contrib.auth.models import Permission
 from django.db.models import Q
 
 
 from event.models import Profile, User, Team
+from event.permissions import get_permission_snapshot
 from event.serializers import (
     UserSerializer,
     TeamSerializer,
 )
 
-from hardware.serializers import OrderListSerializer
+from hardware.serializers import OrderListSerializer, return_order_items
 from hardware.models import Hardware, Order, OrderItem
 
 
@@ -24,6 +32,7 @@ class CurrentUserTestCase(SetupUserMixin, APITestCase):
         self.group = Group.objects.create(name="Test Users")
         self.user.groups.add(self.group)
         self.profile = Profile.objects.create(user=self.user)
+        cache.clear()
 
         self.view = reverse("api:event:current-user")
 
@@ -57,6 +66,82 @@ class CurrentUserTestCase(SetupUserMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json(), serializer.data)
 
+    def test_response_is_cached(self):
+        self._login()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        with CaptureQueriesContext(connection) as queries:
+            cached_response = self.client.get(self.view)
+        self.assertEqual(cached_response["X-Cache"], "HIT")
+        self.assertEqual(cached_response.json(), response.json())
+        self.assertFalse(
+            any(
+                table in query["sql"]
+                for query in queries
+                for table in ("event_profile", "auth_group")
+            )
+        )
+
+    def test_unchanged_response_not_modified(self):
+        self._login()
+        response = self.client.get(self.view)
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        response = self.client.get(self.view, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        self.profile.phone_number = "1234567890"
+        self.profile.save()
+        response = self.client.get(self.view, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["profile"]["phone_number"], "1234567890")
+
+    def test_user_change_invalidates_cache(self):
+        self._login()
+        self.client.get(self.view)
+
+        # The last login isn't in the response
+        self.user.save(update_fields=["last_login"])
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        self.user.first_name = "Changed"
+        self.user.save()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["first_name"], "Changed")
+
+    def test_group_change_invalidates_cache(self):
+        self._login()
+        other_group = Group.objects.create(name="Other Users")
+
+        def assert_groups(groups):
+            response = self.client.get(self.view)
+            self.assertEqual(response["X-Cache"], "MISS")
+            self.assertCountEqual(
+                [group["name"] for group in response.json()["groups"]], groups
+            )
+
+        self.client.get(self.view)
+        self.user.groups.add(other_group)
+        assert_groups(["Test Users", "Other Users"])
+
+        self.group.name = "Renamed Users"
+        self.group.save()
+        assert_groups(["Renamed Users", "Other Users"])
+
+        other_group.user_set.clear()
+        assert_groups(["Renamed Users"])
+
+        self.group.delete()
+        assert_groups([])
+
 
 class CurrentTeamTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -66,6 +151,7 @@ class CurrentTeamTestCase(SetupUserMixin, APITestCase):
         self.team = Team.objects.create()
 
         self.profile = Profile.objects.create(user=self.user, team=self.team)
+        cache.clear()
 
         self.view = reverse("api:event:current-team")
 
@@ -95,6 +181,86 @@ class CurrentTeamTestCase(SetupUserMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json(), serializer.data)
 
+    def _make_teammate(self, team=None):
+        teammate = User.objects.create_user(
+            username="teammate@bar.com",
+            password=self.password,
+            first_name="Team",
+            last_name="Mate",
+        )
+        Profile.objects.create(user=teammate, team=team or self.team)
+        return teammate
+
+    def test_response_is_cached_for_the_team(self):
+        teammate = self._make_teammate()
+        self._login()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        # Shared by the members of the team, who only look up their team once
+        self.client.force_login(teammate)
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "HIT")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertFalse(any("event_" in query["sql"] for query in queries))
+
+    def test_unchanged_response_not_modified(self):
+        self._login()
+        response = self.client.get(self.view)
+        etag = response["ETag"]
+
+        response = self.client.get(self.view, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+        self.team.project_description = "A project"
+        self.team.save()
+        response = self.client.get(self.view, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["project_description"], "A project")
+
+    def test_membership_change_invalidates_cache(self):
+        self._login()
+        self.client.get(self.view)
+
+        teammate = self._make_teammate()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["profiles"]), 2)
+
+        # Both the team left and the team joined change
+        other_team = Team.objects.create()
+        self.client.force_login(teammate)
+        self.client.get(self.view)
+        self.profile.team = other_team
+        self.profile.save()
+
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["profiles"]), 1)
+        self._login()
+        response = self.client.get(self.view)
+        self.assertEqual(response.json()["id"], other_team.id)
+
+    def test_member_change_invalidates_cache(self):
+        teammate = self._make_teammate()
+        self._login()
+        self.client.get(self.view)
+
+        teammate.last_name = "Changed"
+        teammate.save()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertIn(
+            "Changed",
+            [profile["user"]["last_name"] for profile in response.json()["profiles"]],
+        )
+
 
 class JoinTeamTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -314,6 +480,92 @@ class LeaveTeamTestCase(SetupUserMixin, APITestCase):
         )
 
 
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Concurrent team changes need row locking, run against Postgres",
+)
+class TeamJoinLeaveConcurrencyTestCase(TransactionTestCase):
+    number_of_joiners = 40
+
+    def setUp(self):
+        self.team = Team.objects.create()
+        self.members = [
+            self._make_user(f"member{i}", self.team)
+            for i in range(settings.MAX_MEMBERS - 1)
+        ]
+        # Each in a team of their own
+        self.joiners = [
+            self._make_user(f"joiner{i}") for i in range(self.number_of_joiners)
+        ]
+
+    @staticmethod
+    def _make_user(name, team=None):
+        user = User.objects.create_user(
+            username=f"{name}@example.com",
+            email=f"{name}@example.com",
+            password="foobar123",
+        )
+        Profile.objects.create(
+            user=user, team=team or Team.objects.create(), phone_number="1234567890"
+        )
+        return user
+
+    @staticmethod
+    def _post(user, view):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        try:
+            return client.post(view).status_code
+        finally:
+            # Each thread has its own database connection
+            connections.close_all()
+
+    def _run_concurrently(self, requests):
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            futures = [executor.submit(self._post, *request) for request in requests]
+            return [future.result() for future in futures]
+
+    def _assert_consistent(self):
+        # No profile was deleted with a team, and no team was left empty
+        self.assertEqual(
+            Profile.objects.count(), len(self.members) + self.number_of_joiners
+        )
+        self.assertFalse(Team.objects.filter(profiles__isnull=True).exists())
+
+    def test_concurrent_joins_respect_capacity(self):
+        join_view = reverse("api:event:join-team", args=[self.team.team_code])
+        status_codes = self._run_concurrently(
+            [(joiner, join_view) for joiner in self.joiners]
+        )
+
+        free_places = settings.MAX_MEMBERS - len(self.members)
+        self.assertEqual(status_codes.count(status.HTTP_200_OK), free_places)
+        self.assertEqual(
+            status_codes.count(status.HTTP_400_BAD_REQUEST),
+            self.number_of_joiners - free_places,
+        )
+        self.assertEqual(self.team.profiles.count(), settings.MAX_MEMBERS)
+        self._assert_consistent()
+
+    def test_concurrent_joins_and_leaves_respect_capacity(self):
+        join_view = reverse("api:event:join-team", args=[self.team.team_code])
+        leave_view = reverse("api:event:leave-team")
+        requests = [(joiner, join_view) for joiner in self.joiners]
+        # Members leave while the others join
+        for i, member in enumerate(self.members[:-1]):
+            requests.insert(i * 10, (member, leave_view))
+        status_codes = self._run_concurrently(requests)
+
+        self.assertLessEqual(self.team.profiles.count(), settings.MAX_MEMBERS)
+        self.assertEqual(
+            self.team.profiles.count(),
+            len(self.members)
+            + status_codes.count(status.HTTP_200_OK)
+            - status_codes.count(status.HTTP_201_CREATED),
+        )
+        self._assert_consistent()
+
+
 class EventTeamListsViewTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
         self.team = Team.objects.create()
@@ -390,6 +642,73 @@ class EventTeamListsViewTestCase(SetupUserMixin, APITestCase):
         returned_ids = [res["team_code"] for res in results]
         self.assertCountEqual(returned_ids, [self.team2.team_code])
 
+    def _add_members(self, team, count, first_name="Member", last_name="Person"):
+        for _ in range(count):
+            user = User.objects.create_user(
+                username=f"{team.team_code}-{team.profiles.count()}@example.com",
+                first_name=first_name,
+                last_name=last_name,
+            )
+            self._make_profile(user, team)
+
+    def test_member_search_filter(self):
+        self._add_members(self.team, 1, first_name="Grace")
+        self._add_members(self.team2, 1, last_name="Hopper")
+        self._add_members(self.team3, 1)
+        self._login(self.permissions)
+
+        response = self.client.get(self._build_filter_url(search="grace"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        returned_ids = [res["id"] for res in response.json()["results"]]
+        self.assertCountEqual(returned_ids, [self.team.id])
+
+        response = self.client.get(self._build_filter_url(search="hopper"))
+        returned_ids = [res["id"] for res in response.json()["results"]]
+        self.assertCountEqual(returned_ids, [self.team2.id])
+
+    def test_member_search_filter_returns_team_once(self):
+        self._add_members(self.team, 3, first_name="Grace")
+        self._login(self.permissions)
+
+        response = self.client.get(self._build_filter_url(search="grace"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["count"], 1)
+        self.assertEqual([res["id"] for res in data["results"]], [self.team.id])
+        self.assertEqual(len(data["results"][0]["profiles"]), 3)
+
+    def test_search_terms_match_team_and_members(self):
+        self._add_members(self.team, 1, first_name="Grace")
+        self._add_members(self.team2, 1, first_name="Grace")
+        self._login(self.permissions)
+
+        # Every term must match, either the team or one of its members
+        response = self.client.get(
+            self._build_filter_url(search=f"grace {self.team.team_code}")
+        )
+        returned_ids = [res["id"] for res in response.json()["results"]]
+        self.assertCountEqual(returned_ids, [self.team.id])
+
+    def test_query_count_independent_of_team_size(self):
+        self._login(self.permissions)
+        self._add_members(self.team, 1)
+        # Cache the permissions of the user ahead of time
+        get_permission_snapshot(self.user)
+
+        with CaptureQueriesContext(connection) as small_teams:
+            response = self.client.get(self.view)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for team in (self.team, self.team2, self.team3):
+            self._add_members(team, settings.MAX_MEMBERS - team.profiles.count())
+        Team.objects.bulk_create(Team(team_code=f"Q{i:04}") for i in range(20))
+
+        with CaptureQueriesContext(connection) as large_teams:
+            response = self.client.get(self.view)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 23)
+        self.assertEqual(len(large_teams), len(small_teams))
+
 
 class ProfileDetailViewTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -747,6 +1066,197 @@ class CurrentTeamOrderListViewTestCase(SetupUserMixin, APITestCase):
         self.assertEqual(expected_response, data["results"])
 
 
+class CurrentTeamHoldingsViewTestCase(SetupUserMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.team = Team.objects.create()
+        self.hardware = Hardware.objects.create(
+            name="name", quantity_available=10, max_per_team=10,
+        )
+        self.other_hardware = Hardware.objects.create(
+            name="other", quantity_available=10, max_per_team=10,
+        )
+        self.picked_up_order = Order.objects.create(
+            status="Picked Up", team=self.team, request={"hardware": []}
+        )
+        OrderItem.objects.create(
+            order=self.picked_up_order,
+            hardware=self.hardware,
+            quantity=5,
+            quantity_returned_healthy=1,
+            quantity_returned_broken=1,
+        )
+        OrderItem.objects.create(
+            order=self.picked_up_order,
+            hardware=self.other_hardware,
+            quantity=2,
+            quantity_returned_lost=2,
+        )
+        self.submitted_order = Order.objects.create(
+            status="Submitted", team=self.team, request={"hardware": []}
+        )
+        OrderItem.objects.create(
+            order=self.submitted_order, hardware=self.hardware, quantity=2
+        )
+
+        # Cancelled orders and orders of other teams are left out
+        cancelled_order = Order.objects.create(
+            status="Cancelled", team=self.team, request={"hardware": []}
+        )
+        OrderItem.objects.create(
+            order=cancelled_order, hardware=self.other_hardware, quantity=3
+        )
+        self.other_team = Team.objects.create(team_code="ABCDE")
+        self.other_order = Order.objects.create(
+            status="Picked Up", team=self.other_team, request={"hardware": []}
+        )
+        OrderItem.objects.create(
+            order=self.other_order, hardware=self.hardware, quantity=4
+        )
+
+        self.view = reverse("api:event:team-holdings")
+
+    @staticmethod
+    def _holding(hardware, **quantities):
+        return {
+            "hardware_id": hardware.id,
+            "quantity_pending": 0,
+            "quantity_checked_out": 0,
+            "quantity_returned_healthy": 0,
+            "quantity_returned_heavily_used": 0,
+            "quantity_returned_broken": 0,
+            "quantity_returned_lost": 0,
+            **quantities,
+        }
+
+    def test_user_not_logged_in(self):
+        response = self.client.get(self.view)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_has_no_profile(self):
+        self._login()
+        response = self.client.get(self.view)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_user_has_profile(self):
+        Profile.objects.create(user=self.user, team=self.team)
+        self._login()
+        response = self.client.get(self.view)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {
+                "hardware": [
+                    self._holding(
+                        self.hardware,
+                        quantity_pending=2,
+                        quantity_checked_out=3,
+                        quantity_returned_healthy=1,
+                        quantity_returned_broken=1,
+                    ),
+                    self._holding(self.other_hardware, quantity_returned_lost=2),
+                ]
+            },
+        )
+
+    def test_holdings_are_computed_in_one_query(self):
+        profile = Profile.objects.create(user=self.user, team=self.team)
+        self._login()
+        # Fetch the session, user and profile ahead of time
+        self.client.get(reverse("api:event:current-user"))
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        holdings_queries = [
+            query for query in queries if "hardware_orderitem" in query["sql"]
+        ]
+        self.assertEqual(len(holdings_queries), 1)
+
+        # More hardware and orders don't add queries
+        for _ in range(3):
+            order = Order.objects.create(
+                status="Picked Up", team=profile.team, request={"hardware": []}
+            )
+            OrderItem.objects.create(
+                order=order,
+                hardware=Hardware.objects.create(
+                    name="more", quantity_available=1, max_per_team=1
+                ),
+            )
+        with CaptureQueriesContext(connection) as more_queries:
+            response = self.client.get(self.view)
+        self.assertEqual(len(response.json()["hardware"]), 5)
+        self.assertEqual(len(more_queries), len(queries))
+
+    def test_response_is_cached(self):
+        Profile.objects.create(user=self.user, team=self.team)
+        self._login()
+
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        # Changes to the orders of other teams keep the cache
+        self.other_order.status = "Returned"
+        self.other_order.save()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_order_change_invalidates_cache(self):
+        Profile.objects.create(user=self.user, team=self.team)
+        self._login()
+        self.client.get(self.view)
+
+        self.submitted_order.status = "Cancelled"
+        self.submitted_order.save()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["hardware"][0]["quantity_pending"], 0)
+
+        # Moving an order to another team changes the holdings of both
+        self.client.get(self.view)
+        self.other_order.team = self.team
+        self.other_order.save()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["hardware"][0]["quantity_checked_out"], 7)
+
+    def test_order_item_change_invalidates_cache(self):
+        Profile.objects.create(user=self.user, team=self.team)
+        self._login()
+        self.client.get(self.view)
+
+        OrderItem.objects.create(
+            order=self.submitted_order, hardware=self.other_hardware, quantity=1
+        )
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["hardware"][1]["quantity_pending"], 1)
+
+    def test_return_invalidates_cache(self):
+        Profile.objects.create(user=self.user, team=self.team)
+        self._login()
+        self.client.get(self.view)
+
+        with transaction.atomic():
+            return_order_items([], full_returns=[(self.picked_up_order, "Healthy")])
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(
+            response.json()["hardware"][0],
+            self._holding(
+                self.hardware,
+                quantity_pending=2,
+                quantity_returned_healthy=4,
+                quantity_returned_broken=1,
+            ),
+        )
+
+
 class TeamIncidentListViewPostTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
         super().setUp()
@@ -873,7 +1383,7 @@ class EventTeamDetailViewTestCase(SetupUserMixin, APITestCase):
             request={"hardware": [{"id": 1, "quantity": 2}, {"id": 2, "quantity": 3}]},
         )
         self.order_item_2 = OrderItem.objects.create(
-            order=self.order_2, hardware=self.hardware, part_returned_health="Healthy"
+            order=self.order_2, hardware=self.hardware, quantity_returned_healthy=1
         )
 
         self.permissions = Permission.objects.filter(
@@ -0,0 +1,166 @@
+from datetime import datetime
+from io import StringIO
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from event.models import Profile, Team, User
+from hardware.models import Hardware, Incident, Order, OrderItem
+from registration.models import Application
+from review.models import Review
+
+
+class SeedEventTestCase(TestCase):
+    def _call_command(self, **options):
+        out = StringIO()
+        call_command("seed_event", users=200, hardware=20, stdout=out, **options)
+        return out.getvalue()
+
+    @staticmethod
+    def _snapshot():
+        return {
+            "users": list(User.objects.order_by("id").values_list("id", "email")),
+            "reviews": list(
+                Review.objects.order_by("id").values_list("application_id", "status")
+            ),
+            "profiles": list(
+                Profile.objects.order_by("id").values_list("user_id", "team__team_code")
+            ),
+            "hardware": list(
+                Hardware.objects.order_by("id").values_list(
+                    "name", "quantity_available", "quantity_checked_out"
+                )
+            ),
+            "orders": list(
+                Order.objects.order_by("id").values_list("team_id", "status")
+            ),
+            "order_items": list(
+                OrderItem.objects.order_by("id").values_list(
+                    "order_id", "hardware_id", "quantity", "quantity_returned_healthy"
+                )
+            ),
+        }
+
+    def test_seeds_every_model(self):
+        output = self._call_command()
+        self.assertIn("Seeded in", output)
+
+        for model in (User, Application, Review, Team, Profile, Hardware, Order):
+            self.assertTrue(model.objects.exists(), msg=model.__name__)
+        self.assertTrue(OrderItem.objects.exists())
+        self.assertTrue(Incident.objects.exists())
+        # Every profile is in a team with the rest of its registration team
+        for profile in Profile.objects.select_related("user__application"):
+            self.assertEqual(profile.user.application.review.status, "Accepted")
+            self.assertTrue(profile.user.application.rsvp)
+
+    def test_deterministic(self):
+        snapshots = []
+        for _ in range(2):
+            with transaction.atomic():
+                self._call_command(seed=1)
+                snapshots.append(self._snapshot())
+                transaction.set_rollback(True)
+
+        self.assertEqual(snapshots[0], snapshots[1])
+        with transaction.atomic():
+            self._call_command(seed=2)
+            self.assertNotEqual(self._snapshot(), snapshots[0])
+            transaction.set_rollback(True)
+
+    def test_stock_is_consistent(self):
+        self._call_command()
+        out = StringIO()
+        call_command("reconcile_hardware_stock", dry_run=True, stdout=out)
+        self.assertIn("No drift found.", out.getvalue())
+
+        for hardware in Hardware.objects.all():
+            self.assertGreaterEqual(hardware.quantity_remaining, 0)
+
+    def test_new_rows_after_seeding(self):
+        self._call_command()
+        # The id sequences were moved past the seeded rows
+        Order.objects.create(team=Team.objects.create(), request=[])
+        User.objects.create_user(username="foo@bar.com", password="foobar123")
+
+    def test_same_seed_twice(self):
+        self._call_command()
+        with self.assertRaises(CommandError):
+            self._call_command()
+        self._call_command(seed=1)
+
+
+class BenchmarkEndpointsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            "seed_event", users=200, hardware=20, orders_per_team=1, stdout=StringIO()
+        )
+
+    def _call_command(self, *args):
+        out = StringIO()
+        call_command("benchmark_endpoints", "--iterations=2", *args, stdout=out)
+        return out.getvalue()
+
+    def test_within_budget(self):
+        # Latency depends on the machine, but the number of queries must not
+        # exceed the budgets checked into the repo
+        output = self._call_command("--skip-latency")
+        self.assertIn("order-create: p50", output)
+        self.assertIn("admin-teamreview-changelist: p50", output)
+        self.assertIn("All endpoints are within budget.", output)
+
+    @override_settings(
+        HARDWARE_SIGN_OUT_START_DATE=datetime(2020, 9, 1, tzinfo=settings.TZ_INFO),
+        HARDWARE_SIGN_OUT_END_DATE=datetime(2020, 9, 30, tzinfo=settings.TZ_INFO),
+    )
+    def test_hardware_sign_out_closed(self):
+        # The benchmark opens sign out for the orders it places
+        output = self._call_command("--skip-latency")
+        self.assertIn("order-create: p50", output)
+
+    def test_over_budget(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "budgets.json"
+            self._call_command("--update-budgets", f"--budgets={path}")
+            budgets = json.loads(path.read_text())
+            self.assertEqual(len(budgets["endpoints"]), 16)
+
+            budgets["endpoints"]["current-user"]["queries"] = 1
+            del budgets["endpoints"]["current-team"]
+            path.write_text(json.dumps(budgets))
+            with self.assertRaisesMessage(CommandError, "current-user: ") as context:
+                self._call_command(f"--budgets={path}", "--skip-latency")
+            self.assertIn("current-team: no budget", str(context.exception))
+
+    def test_leaves_database_unchanged(self):
+        snapshot = SeedEventTestCase._snapshot()
+        self._call_command("--skip-latency")
+        self.assertEqual(SeedEventTestCase._snapshot(), snapshot)
+        self.assertFalse(User.objects.filter(username__startswith="benchmark").exists())
+
+
+class BenchmarkTeamCodesTestCase(TransactionTestCase):
+    # On PostgreSQL, the teams created concurrently are committed, and deleted by
+    # the benchmark
+    def test_benchmark(self):
+        for model in ("event", "registration"):
+            out = StringIO()
+            call_command(
+                "benchmark_team_codes",
+                "--teams=50",
+                "--threads=2",
+                f"--model={model}",
+                stdout=out,
+            )
+
+            output = out.getvalue()
+            self.assertIn("Serial: 50 teams", output)
+            self.assertIn("Every team code is unique.", output)
+        # The teams are rolled back
+        self.assertFalse(Team.objects.exists())
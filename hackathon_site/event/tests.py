@@ -1,15 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
 import re
+from types import SimpleNamespace
+from unittest import skipUnless
 from unittest.mock import patch
 from datetime import datetime, timedelta, date
 
 from django.core import mail
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import AnonymousUser, Group, Permission
 from django.conf import settings
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import Client, TestCase, TransactionTestCase
 from django.urls import reverse
 from rest_framework import status
 
 from event.models import Profile, User, Team as EventTeam
+from event.permissions import (
+    FullDjangoModelPermissions,
+    UserIsAdmin,
+    get_permission_snapshot,
+)
 from hackathon_site.tests import SetupUserMixin
 from registration.models import Team as RegistrationTeam, Application
 
@@ -1011,6 +1021,59 @@ class UserReviewStatusSerializerTestCase(SetupUserMixin, TestCase):
         self.assertEqual(user_expected, user_serialized)
 
 
+@skipUnless(
+    connection.vendor == "postgresql" and settings.TEAMS,
+    "Concurrent team changes need row locking, run against Postgres",
+)
+class DashboardJoinTeamConcurrencyTestCase(SetupUserMixin, TransactionTestCase):
+    number_of_joiners = 20
+
+    def setUp(self):
+        self.team = RegistrationTeam.objects.create()
+        for i in range(RegistrationTeam.MAX_MEMBERS - 1):
+            self._apply_as_user(self._make_user(f"member{i}"), team=self.team)
+        self.joiners = [
+            self._make_user(f"joiner{i}") for i in range(self.number_of_joiners)
+        ]
+        for joiner in self.joiners:
+            self._apply_as_user(joiner)
+
+    @staticmethod
+    def _make_user(name):
+        return User.objects.create_user(
+            username=f"{name}@example.com",
+            email=f"{name}@example.com",
+            password="foobar123",
+        )
+
+    def _join(self, user):
+        client = Client()
+        client.force_login(user)
+        try:
+            return client.post(
+                reverse("event:dashboard"), {"team_code": self.team.team_code}
+            ).status_code
+        finally:
+            # Each thread has its own database connection
+            connections.close_all()
+
+    def test_concurrent_joins_respect_capacity(self):
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            status_codes = list(executor.map(self._join, self.joiners))
+
+        # Joins redirect to the dashboard, and a full team shows the form again
+        self.assertEqual(status_codes.count(302), 1)
+        self.assertEqual(status_codes.count(200), self.number_of_joiners - 1)
+        self.assertEqual(self.team.applications.count(), RegistrationTeam.MAX_MEMBERS)
+        self.assertEqual(
+            Application.objects.count(),
+            RegistrationTeam.MAX_MEMBERS - 1 + self.number_of_joiners,
+        )
+        self.assertFalse(
+            RegistrationTeam.objects.filter(applications__isnull=True).exists()
+        )
+
+
 class TeamModelTest(TestCase):
     def test_project_description_char_limit(self):
         team = EventTeam.objects.create(team_code="ABC")
@@ -1033,3 +1096,165 @@ class TeamModelTest(TestCase):
         self.assertTrue(
             hasattr(team, "project_description")
         )  # Check if the project_description field exists
+
+    def _patch_team_code_default(self, codes):
+        return patch.object(
+            EventTeam._meta.get_field("team_code"), "_get_default", side_effect=codes,
+        )
+
+    def test_team_code_collision_retries(self):
+        EventTeam.objects.create(team_code="AAAAA")
+        with self._patch_team_code_default(["AAAAA", "AAAAA", "BBBBB"]):
+            team = EventTeam.objects.create()
+
+        self.assertEqual(team.team_code, "BBBBB")
+        self.assertEqual(EventTeam.objects.get(id=team.id).team_code, "BBBBB")
+
+    def test_team_code_attempts_exhausted(self):
+        EventTeam.objects.create(team_code="AAAAA")
+        with self._patch_team_code_default(
+            ["AAAAA"] * (EventTeam.TEAM_CODE_ATTEMPTS + 1)
+        ), self.assertRaises(IntegrityError):
+            EventTeam.objects.create()
+
+    def test_explicit_team_code_not_replaced(self):
+        EventTeam.objects.create(team_code="AAAAA")
+        with transaction.atomic(), self.assertRaises(IntegrityError):
+            EventTeam.objects.create(team_code="AAAAA")
+
+    def test_existing_team_saved_without_retry(self):
+        team = EventTeam.objects.get(id=EventTeam.objects.create().id)
+        team.project_description = "Robots"
+        with self._patch_team_code_default([]) as get_default:
+            team.save()
+        get_default.assert_not_called()
+
+
+class PermissionSnapshotTestCase(SetupUserMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.group = Group.objects.create(name="Test Users")
+        self.view_team = Permission.objects.get(
+            content_type__app_label="event", codename="view_team"
+        )
+        self.change_team = Permission.objects.get(
+            content_type__app_label="event", codename="change_team"
+        )
+
+    def _snapshot(self):
+        # A fresh user, like in a new request
+        return get_permission_snapshot(User.objects.get(pk=self.user.pk))
+
+    def test_snapshot(self):
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self.view_team)
+        self.user.user_permissions.add(self.change_team)
+
+        snapshot = self._snapshot()
+        self.assertTrue(snapshot.in_group("Test Users"))
+        self.assertFalse(snapshot.in_group("Hardware Site Admins"))
+        self.assertTrue(snapshot.has_perms(["event.view_team", "event.change_team"]))
+        self.assertFalse(snapshot.has_perms(["event.view_team", "event.delete_team"]))
+
+    def test_anonymous_user(self):
+        snapshot = get_permission_snapshot(AnonymousUser())
+        self.assertEqual(snapshot.groups, frozenset())
+        self.assertFalse(snapshot.has_perms(["event.view_team"]))
+
+    def test_snapshot_is_cached_and_memoized(self):
+        user = User.objects.get(pk=self.user.pk)
+        snapshot = get_permission_snapshot(user)
+        other_user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(get_permission_snapshot(user), snapshot)
+            get_permission_snapshot(other_user)
+
+    def test_group_membership_invalidates_snapshot(self):
+        self._snapshot()
+
+        self.user.groups.add(self.group)
+        self.assertTrue(self._snapshot().in_group("Test Users"))
+
+        self.group.user_set.remove(self.user)
+        self.assertFalse(self._snapshot().in_group("Test Users"))
+
+        self.group.user_set.add(self.user)
+        self._snapshot()
+        self.group.user_set.clear()
+        self.assertFalse(self._snapshot().in_group("Test Users"))
+
+    def test_group_change_invalidates_snapshot(self):
+        self.user.groups.add(self.group)
+        self._snapshot()
+
+        self.group.name = "Renamed Users"
+        self.group.save()
+        self.assertTrue(self._snapshot().in_group("Renamed Users"))
+
+        self.group.delete()
+        self.assertEqual(self._snapshot().groups, frozenset())
+
+    def test_group_permissions_invalidate_snapshot(self):
+        self.user.groups.add(self.group)
+        self._snapshot()
+
+        self.group.permissions.add(self.view_team)
+        self.assertTrue(self._snapshot().has_perms(["event.view_team"]))
+
+        # From the permission's side
+        self.view_team.group_set.remove(self.group)
+        self.assertFalse(self._snapshot().has_perms(["event.view_team"]))
+
+        self.view_team.group_set.add(self.group)
+        self._snapshot()
+        self.view_team.group_set.clear()
+        self.assertFalse(self._snapshot().has_perms(["event.view_team"]))
+
+    def test_user_permissions_invalidate_snapshot(self):
+        self._snapshot()
+
+        self.user.user_permissions.add(self.view_team)
+        self.assertTrue(self._snapshot().has_perms(["event.view_team"]))
+
+        self.view_team.user_set.clear()
+        self.assertFalse(self._snapshot().has_perms(["event.view_team"]))
+
+    def test_superuser_change_invalidates_snapshot(self):
+        self._snapshot()
+
+        # The last login doesn't change permissions
+        self.user.save(update_fields=["last_login"])
+        self.assertFalse(self._snapshot().has_perms(["event.view_team"]))
+
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertTrue(self._snapshot().has_perms(["event.view_team"]))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self._snapshot().has_perms(["event.view_team"]))
+
+    def test_superuser_has_permissions_added_later(self):
+        self.user.is_superuser = True
+        self.user.save()
+        self._snapshot()
+
+        # e.g. created by a migration, which doesn't invalidate any snapshot
+        Permission.objects.create(
+            codename="new_permission",
+            name="New permission",
+            content_type=self.view_team.content_type,
+        )
+        self.assertTrue(self._snapshot().has_perms(["event.new_permission"]))
+
+    def test_permission_classes_read_snapshot(self):
+        self.user.groups.add(Group.objects.get(name="Hardware Site Admins"))
+        self.user.user_permissions.add(self.view_team)
+        self._snapshot()
+        request = SimpleNamespace(user=User.objects.get(pk=self.user.pk), method="GET")
+        view = SimpleNamespace(queryset=EventTeam.objects.all())
+
+        with self.assertNumQueries(0):
+            self.assertTrue(UserIsAdmin().has_permission(request, view))
+            self.assertTrue(FullDjangoModelPermissions().has_permission(request, view))
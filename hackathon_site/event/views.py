@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.views.generic.base import TemplateView
@@ -12,17 +13,16 @@ from django.conf import settings
 from django_filters import rest_framework as filters
 
 from rest_framework import generics, mixins
-from rest_framework.filters import SearchFilter
 
 
-from hackathon_site.utils import is_registration_open
+from hackathon_site.utils import is_registration_open, lock_teams
 from registration.forms import JoinTeamForm
-from registration.models import Team as RegistrationTeam
+from registration.models import Application, Team as RegistrationTeam
 
 
-from event.models import Team as EventTeam
+from event.models import Profile, Team as EventTeam
 from event.serializers import TeamSerializer
-from event.api_filters import TeamFilter
+from event.api_filters import TeamFilter, TeamSearchFilter
 from event.permissions import FullDjangoModelPermissions
 
 
@@ -82,18 +82,40 @@ class DashboardView(LoginRequiredMixin, FormView):
         """
 
         if isinstance(form, JoinTeamForm):
-            application = self.request.user.application
-            new_team = RegistrationTeam.objects.get(
-                team_code=form.cleaned_data["team_code"]
-            )
-            old_team = application.team
-
-            application.team = new_team
-            application.save()
+            with transaction.atomic():
+                application = Application.objects.select_for_update().get(
+                    user=self.request.user
+                )
+                new_team = RegistrationTeam.objects.get(
+                    team_code=form.cleaned_data["team_code"]
+                )
 
-            # Delete the old team if it is empty
-            if not old_team.applications.exists():
-                old_team.delete()
+                # The form checked that the team has room, check again with the
+                # rows of both teams locked, so that concurrent joins can't take
+                # the team over capacity
+                teams = lock_teams(RegistrationTeam, application.team_id, new_team.id)
+                if new_team.id not in teams:
+                    form.add_error(
+                        "team_code",
+                        f"Team {form.cleaned_data['team_code']} does not exist.",
+                    )
+                    return self.form_invalid(form)
+                if (
+                    new_team.id != application.team_id
+                    and new_team.applications.count() >= RegistrationTeam.MAX_MEMBERS
+                ):
+                    form.add_error(
+                        "team_code", f"Team {form.cleaned_data['team_code']} is full."
+                    )
+                    return self.form_invalid(form)
+                old_team = teams[application.team_id]
+
+                application.team = new_team
+                application.save()
+
+                # Delete the old team if it is empty
+                if not old_team.applications.exists():
+                    old_team.delete()
 
         return redirect(self.get_success_url())
 
@@ -189,18 +211,18 @@ class DashboardView(LoginRequiredMixin, FormView):
 
 
 class TeamListView(mixins.ListModelMixin, generics.GenericAPIView):
-    queryset = EventTeam.objects.all()
+    # The members and their users are fetched in one query each for the whole page,
+    # and the teams are ordered so that pages are stable
+    queryset = EventTeam.objects.prefetch_related(
+        Prefetch("profiles", queryset=Profile.objects.select_related("user"))
+    ).order_by("id")
     serializer_class = TeamSerializer
     permission_classes = [FullDjangoModelPermissions]
 
-    filter_backends = (filters.DjangoFilterBackend, SearchFilter)
+    filter_backends = (filters.DjangoFilterBackend, TeamSearchFilter)
     filterset_class = TeamFilter
-    search_fields = (
-        "team_code",
-        "id",
-        "profiles__user__first_name",
-        "profiles__user__last_name",
-    )
+    search_fields = ("team_code", "id")
+    member_search_fields = ("user__first_name", "user__last_name")
 
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
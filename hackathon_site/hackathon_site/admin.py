@@ -0,0 +1,14 @@
+from import_export.admin import ExportMixin
+
+from hackathon_site.db_router import replica_reads
+
+
+class ReplicaExportMixin(ExportMixin):
+    """
+    An ExportMixin which reads the exported data from the read replica, when one
+    is configured. Exports are read-only, but are sent as POST requests.
+    """
+
+    def get_export_data(self, *args, **kwargs):
+        with replica_reads():
+            return super().get_export_data(*args, **kwargs)
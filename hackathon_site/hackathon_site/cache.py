@@ -0,0 +1,186 @@
+import hashlib
+import json
+import re
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from hackathon_site.db_router import primary_reads
+from hackathon_site.metrics import record_cache_lookup
+
+
+class VersionedCache:
+    """
+    A namespace of cache keys that can be invalidated all at once.
+
+    Every key is prefixed with the namespace's current version, which is itself
+    stored in the cache. Invalidating the namespace bumps the version, so entries
+    written under the old version are never read again and simply expire.
+    """
+
+    def __init__(self, namespace, timeout=None):
+        self.namespace = namespace
+        # None uses the TIMEOUT from the CACHES setting
+        self.timeout = timeout
+
+    @property
+    def version_key(self):
+        return f"{self.namespace}:version"
+
+    def get_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # Start from the current time instead of 1, so that if the version
+            # key is ever evicted, old entries can't be picked up again.
+            cache.add(self.version_key, int(time.time() * 1000), timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def make_key(self, *parts):
+        digest = hashlib.md5(repr(parts).encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{self.get_version()}:{digest}"
+
+    def get(self, *parts):
+        value = cache.get(self.make_key(*parts))
+        record_cache_lookup(hit=value is not None)
+        return value
+
+    def set(self, value, *parts):
+        cache.set(self.make_key(*parts), value, timeout=self.timeout)
+
+    def _bump_version(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            # The version key doesn't exist (yet), starting one is enough
+            self.get_version()
+
+    def invalidate(self):
+        """
+        Invalidate every key in the namespace.
+
+        The version is bumped right away, and again once the current transaction
+        commits. Otherwise, a request running between the two could cache data
+        read before the changes were committed under the new version.
+        """
+        self._bump_version()
+        transaction.on_commit(self._bump_version)
+
+
+class CachedResponseMixin:
+    """
+    Cache the data of successful GET responses of a DRF view in a VersionedCache.
+
+    Responses are keyed on the request path and the query parameters that can
+    change the response (filters, search, ordering and pagination), normalized so
+    that equivalent requests share an entry. Every response has an ``X-Cache``
+    header set to ``HIT`` or ``MISS``.
+
+    Cached responses also have an ``ETag`` computed from their data. When the
+    request's ``If-None-Match`` header has the ETag of the cached entry, the
+    response is a 304 without a body, and the view isn't called at all. Browsers
+    are asked to revalidate every time rather than reuse their copy.
+    """
+
+    response_cache = None
+
+    def get_cache_query_params(self):
+        """
+        Names of the query parameters that are part of the cache key. Any other
+        parameter is ignored.
+        """
+        params = set()
+        filterset_class = getattr(self, "filterset_class", None)
+        if filterset_class is not None:
+            params.update(filterset_class.base_filters.keys())
+        for backend in getattr(self, "filter_backends", ()):
+            for attribute in ("search_param", "ordering_param"):
+                if hasattr(backend, attribute):
+                    params.add(getattr(backend, attribute))
+        paginator = getattr(self, "paginator", None)
+        if paginator is not None:
+            for attribute in (
+                "limit_query_param",
+                "offset_query_param",
+                "page_query_param",
+                "cursor_query_param",
+            ):
+                if getattr(paginator, attribute, None):
+                    params.add(getattr(paginator, attribute))
+        return params
+
+    def get_cache_key_parts(self, request):
+        ordering_params = {
+            backend.ordering_param
+            for backend in getattr(self, "filter_backends", ())
+            if hasattr(backend, "ordering_param")
+        }
+        params = []
+        for name in sorted(self.get_cache_query_params()):
+            values = [value for value in request.query_params.getlist(name) if value]
+            if not values:
+                continue
+            if name in ordering_params:
+                # The order of ordering fields matters
+                params.append((name, tuple(values)))
+            else:
+                # Filters and search terms are order-insensitive lists, separated
+                # by commas (or whitespace, for search)
+                terms = set()
+                for value in values:
+                    terms.update(term for term in re.split(r"[\s,]+", value) if term)
+                params.append((name, tuple(sorted(terms))))
+        return (request.get_host(), request.path, tuple(params))
+
+    @staticmethod
+    def make_etag(data):
+        rendered = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+        return quote_etag(hashlib.md5(rendered.encode("utf-8")).hexdigest())
+
+    @staticmethod
+    def etag_matches(request, etag):
+        etags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+        return "*" in etags or etag in etags
+
+    def conditional_response(self, request, response, etag, cache_status):
+        """
+        Replace the response with a 304 if the client already has it, and add the
+        caching headers.
+        """
+        if self.etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response["ETag"] = etag
+        response["X-Cache"] = cache_status
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def cached_response(self, request, get_response):
+        """
+        Return the cached response for this request if there is one. Otherwise,
+        call ``get_response`` and cache its data if it was successful.
+        """
+        # Entries are the ETag and the data of the response, kept apart from the
+        # entries of only the data cached before ETags
+        key_parts = ("etag", *self.get_cache_key_parts(request))
+        entry = self.response_cache.get(*key_parts)
+        if entry is not None:
+            etag, data = entry
+            return self.conditional_response(request, Response(data), etag, "HIT")
+
+        # Cached responses must be read from the primary. A replica lagging behind
+        # the changes that invalidated the cache would have them cached as new.
+        with primary_reads():
+            response = get_response()
+        if response.status_code != 200:
+            response["X-Cache"] = "MISS"
+            return response
+
+        etag = self.make_etag(response.data)
+        self.response_cache.set((etag, response.data), *key_parts)
+        return self.conditional_response(request, response, etag, "MISS")
@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework import mixins
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_DB_ALIAS = "replica"
+
+# Apps whose data is read back right after being written in another request, so
+# replication lag would show up as e.g. being logged out after logging in
+PRIMARY_ONLY_APP_LABELS = {"sessions"}
+
+
+class _RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.pinned_to_primary = False
+
+
+_routing_state = ContextVar("db_routing_state", default=None)
+
+
+@contextmanager
+def _routing(use_replica):
+    outer_state = _routing_state.get()
+    state = _RoutingState(use_replica)
+    state.pinned_to_primary = outer_state is not None and outer_state.pinned_to_primary
+    token = _routing_state.set(state)
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+        if outer_state is not None and state.pinned_to_primary:
+            outer_state.pinned_to_primary = True
+
+
+def replica_reads():
+    """
+    Send reads made in this context to the read replica, until the first write.
+    """
+    return _routing(use_replica=True)
+
+
+def primary_reads():
+    """
+    Send reads made in this context to the primary database.
+    """
+    return _routing(use_replica=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in connections.databases
+
+
+class ReplicaRouter:
+    """
+    Route reads to the read replica inside replica_reads(), when one is
+    configured. Every other query goes to the primary database.
+
+    Reads that follow a write stay on the primary, so that a request always sees
+    its own changes, as do reads inside transactions on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if (
+            state is None
+            or not state.use_replica
+            or state.pinned_to_primary
+            or not replica_configured()
+            or model._meta.app_label in PRIMARY_ONLY_APP_LABELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.pinned_to_primary = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
+
+
+class ReplicaReadMiddleware:
+    """
+    Send the reads of GET and HEAD requests to DRF list and detail views to the
+    read replica. The routing state is reset for every request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with primary_reads():
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        if (
+            request.method in SAFE_METHODS
+            and view_class is not None
+            and issubclass(
+                view_class, (mixins.ListModelMixin, mixins.RetrieveModelMixin)
+            )
+        ):
+            _routing_state.get().use_replica = True
+        return None
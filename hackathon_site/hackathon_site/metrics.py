@@ -0,0 +1,314 @@
+"""
+Lightweight per-request instrumentation, which unlike debug_toolbar is safe to
+run in production.
+
+RequestMetricsMiddleware records the number of queries, the time spent in the
+database, rendering templates and queueing emails, and the response cache hits
+and misses of every request. They are logged, sent back in a Server-Timing
+header, and aggregated per view by ViewMetricsStore.
+"""
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+import logging
+from math import ceil
+from statistics import mean
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from django.template.backends.jinja2 import Jinja2 as BaseJinja2
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+TIMED_CATEGORIES = ("db", "template", "email")
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # {category: seconds}
+        self.durations = dict.fromkeys(TIMED_CATEGORIES, 0.0)
+        # Categories being timed, so that nested timings are only counted once
+        self._timing = set()
+
+    def as_dict(self):
+        return {
+            "queries": self.queries,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            **{
+                f"{category}_ms": round(duration * 1000, 3)
+                for category, duration in self.durations.items()
+            },
+        }
+
+
+_current_metrics = ContextVar("request_metrics", default=None)
+
+
+@contextmanager
+def timed(category):
+    """
+    Add the time spent in this context to the given category of the current
+    request's metrics. Does nothing outside of a request.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None or category in metrics._timing:
+        yield
+        return
+
+    metrics._timing.add(category)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[category] += time.perf_counter() - start
+        metrics._timing.discard(category)
+
+
+def record_cache_lookup(hit):
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.queries += 1
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+class _TimedTemplate:
+    """
+    Wrap a template of a template backend, timing its renders.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def render(self, context=None, request=None):
+        with timed("template"):
+            return self.template.render(context, request)
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+
+class TimedTemplatesMixin:
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class Jinja2(TimedTemplatesMixin, BaseJinja2):
+    pass
+
+
+class DjangoTemplates(TimedTemplatesMixin, BaseDjangoTemplates):
+    pass
+
+
+def percentile(sorted_values, p):
+    """
+    The nearest-rank percentile of a sorted list of values.
+    """
+    rank = max(ceil(len(sorted_values) * p / 100), 1)
+    return sorted_values[rank - 1]
+
+
+class ViewMetricsStore:
+    """
+    Keep the metrics of the latest requests to every view, from which percentiles
+    are computed. With the Redis cache, samples are pushed onto a capped list per
+    view in a single round trip, so requests served by different processes can
+    record at the same time. Other caches, used in development and testing, store
+    the lists with plain gets and sets.
+    """
+
+    SAMPLE_FIELDS = (
+        "duration_ms",
+        "queries",
+        "db_ms",
+        "template_ms",
+        "email_ms",
+        "cache_hits",
+        "cache_misses",
+    )
+    PERCENTILE_FIELDS = ("duration_ms", "queries")
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, prefix="request_metrics", max_samples=1000):
+        self.prefix = prefix
+        self.max_samples = max_samples
+
+    @property
+    def views_key(self):
+        return f"{self.prefix}:views"
+
+    def samples_key(self, view_name):
+        return f"{self.prefix}:samples:{view_name}"
+
+    @staticmethod
+    def get_redis():
+        try:
+            return get_redis_connection("default")
+        except NotImplementedError:
+            # Not the Redis cache
+            return None
+
+    def record(self, view_name, sample):
+        encoded = ",".join(str(sample[field]) for field in self.SAMPLE_FIELDS)
+        redis = self.get_redis()
+        if redis is not None:
+            pipeline = redis.pipeline(transaction=False)
+            pipeline.lpush(self.samples_key(view_name), encoded)
+            pipeline.ltrim(self.samples_key(view_name), 0, self.max_samples - 1)
+            pipeline.sadd(self.views_key, view_name)
+            pipeline.execute()
+        else:
+            samples = cache.get(self.samples_key(view_name), [])
+            cache.set(
+                self.samples_key(view_name),
+                [encoded] + samples[: self.max_samples - 1],
+                timeout=None,
+            )
+            views = cache.get(self.views_key, set())
+            if view_name not in views:
+                cache.set(self.views_key, views | {view_name}, timeout=None)
+
+    def get_samples(self):
+        """
+        Return {view_name: [sample]} with the samples as dicts, newest first.
+        """
+        redis = self.get_redis()
+        if redis is not None:
+            view_names = sorted(
+                name.decode() for name in redis.smembers(self.views_key)
+            )
+            pipeline = redis.pipeline(transaction=False)
+            for view_name in view_names:
+                pipeline.lrange(self.samples_key(view_name), 0, -1)
+            encoded_samples = [
+                [sample.decode() for sample in samples]
+                for samples in pipeline.execute()
+            ]
+        else:
+            view_names = sorted(cache.get(self.views_key, set()))
+            encoded_samples = [
+                cache.get(self.samples_key(view_name), []) for view_name in view_names
+            ]
+
+        return {
+            view_name: [
+                dict(zip(self.SAMPLE_FIELDS, map(float, sample.split(","))))
+                for sample in samples
+            ]
+            for view_name, samples in zip(view_names, encoded_samples)
+            if samples
+        }
+
+    def summary(self):
+        """
+        The number of recent requests to every view, with percentiles of their
+        duration and number of queries, and the mean of the other metrics.
+        """
+        views = {}
+        for view_name, samples in self.get_samples().items():
+            view_metrics = {"count": len(samples)}
+            for field in self.SAMPLE_FIELDS:
+                values = sorted(sample[field] for sample in samples)
+                if field in self.PERCENTILE_FIELDS:
+                    view_metrics[field] = {
+                        **{f"p{p}": percentile(values, p) for p in self.PERCENTILES},
+                        "max": values[-1],
+                    }
+                else:
+                    view_metrics[f"mean_{field}"] = round(mean(values), 3)
+            views[view_name] = view_metrics
+        return views
+
+    def reset(self):
+        redis = self.get_redis()
+        if redis is not None:
+            view_names = [name.decode() for name in redis.smembers(self.views_key)]
+            redis.delete(
+                self.views_key, *(self.samples_key(name) for name in view_names)
+            )
+        else:
+            view_names = cache.get(self.views_key, set())
+            cache.delete_many(
+                [self.views_key, *(self.samples_key(name) for name in view_names)]
+            )
+
+
+view_metrics_store = ViewMetricsStore()
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure every request, see the module docstring. Should be the first
+    middleware, so that the time spent in the others is included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        response["Server-Timing"] = self.server_timing(metrics, duration_ms)
+
+        resolver_match = getattr(request, "resolver_match", None)
+        view_name = resolver_match.view_name if resolver_match else None
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "view": view_name,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 3),
+            **metrics.as_dict(),
+        }
+        logger.info(
+            " ".join(f"{name}={value}" for name, value in fields.items()),
+            extra={"request_metrics": fields},
+        )
+        if view_name is not None:
+            try:
+                view_metrics_store.record(view_name, fields)
+            except Exception:
+                # Metrics must never fail the request, e.g. while Redis is down
+                logger.warning("Could not record request metrics", exc_info=True)
+        return response
+
+    @staticmethod
+    def server_timing(metrics, duration_ms):
+        entries = [
+            f'db;dur={metrics.durations["db"] * 1000:.3f};desc="{metrics.queries} queries"',
+            f'template;dur={metrics.durations["template"] * 1000:.3f}',
+            f'email;dur={metrics.durations["email"] * 1000:.3f}',
+            f'cache;desc="{metrics.cache_hits} hits / {metrics.cache_misses} misses"',
+            f"total;dur={duration_ms:.3f}",
+        ]
+        return ", ".join(entries)
@@ -0,0 +1,172 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+import binascii
+import json
+
+import coreapi
+import coreschema
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class LimitOffsetOrCursorPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination, with an opt-in cursor mode for large tables that
+    keep growing during the event.
+
+    Clients opt in by passing the cursor query parameter, left empty for the
+    first page. Pages are then keyed on (created_at, id) rather than an OFFSET,
+    and no count query is made, so deep pages are as fast as the first one.
+    Cursor responses contain the next and previous links and the results.
+
+    Results are ordered by cursor_ordering, newest first, unless the queryset is
+    already ordered by its first field in ascending order (e.g. ?ordering=created_at).
+    """
+
+    cursor_query_param = "cursor"
+    cursor_query_description = (
+        "The pagination cursor value. Pass an empty value to start paginating "
+        "by cursor instead of offset."
+    )
+    invalid_cursor_message = "Invalid cursor"
+    # A datetime field followed by a unique integer field
+    cursor_ordering = ("created_at", "id")
+
+    use_cursor = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.use_cursor = True
+        self.request = request
+        self.limit = self.get_limit(request)
+        position, reverse = self.decode_cursor(request)
+
+        ascending = queryset.query.order_by[:1] == (self.cursor_ordering[0],)
+        # Walking backwards from a previous link reads the rows in the opposite order
+        query_ascending = ascending != reverse
+        prefix = "" if query_ascending else "-"
+        queryset = queryset.order_by(
+            *(f"{prefix}{field}" for field in self.cursor_ordering)
+        )
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(position, query_ascending)
+            )
+
+        results = list(queryset[: self.limit + 1])
+        has_following = len(results) > self.limit
+        results = results[: self.limit]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next, self.has_previous = has_following, position is not None
+
+        self.next_position = self.get_position(results[-1]) if results else None
+        self.previous_position = self.get_position(results[0]) if results else position
+        return results
+
+    def get_position_filter(self, position, query_ascending):
+        """
+        Filter for the rows strictly after a (created_at, id) position, in the
+        order the query reads them.
+        """
+        lookup = "gt" if query_ascending else "lt"
+        created_at_field, id_field = self.cursor_ordering
+        created_at, pk = position
+        return Q(**{f"{created_at_field}__{lookup}": created_at}) | Q(
+            **{created_at_field: created_at, f"{id_field}__{lookup}": pk}
+        )
+
+    def get_position(self, instance):
+        values = []
+        for field in self.cursor_ordering:
+            value = instance
+            for attr in field.split("__"):
+                value = getattr(value, attr)
+            values.append(value)
+        return tuple(values)
+
+    def decode_cursor(self, request):
+        """
+        Return the (position, reverse) of the cursor in the request. The position
+        is None on the first page.
+        """
+        encoded = request.query_params[self.cursor_query_param]
+        if not encoded:
+            return None, False
+
+        try:
+            created_at, pk, reverse = json.loads(urlsafe_b64decode(encoded.encode()))
+            position = (parse_datetime(created_at), int(pk))
+        except (binascii.Error, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(reverse)
+
+    def encode_cursor(self, position, reverse):
+        created_at, pk = position
+        cursor = json.dumps([created_at.isoformat(), pk, int(reverse)])
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.offset_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, urlsafe_b64encode(cursor.encode()).decode()
+        )
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_schema_fields(self, view):
+        return super().get_schema_fields(view) + [
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.String(
+                    title="Cursor", description=self.cursor_query_description
+                ),
+            )
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": self.cursor_query_description,
+                "schema": {"type": "string"},
+            }
+        ]
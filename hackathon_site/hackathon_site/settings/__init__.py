@@ -97,9 +97,11 @@ INSTALLED_APPS = [
     "event",
     "hardware",
     "review",
+    "outbox",
 ]
 
 MIDDLEWARE = [
+    "hackathon_site.metrics.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -108,6 +110,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "hackathon_site.db_router.ReplicaReadMiddleware",
 ]
 
 if DEBUG:
@@ -118,13 +121,16 @@ ROOT_URLCONF = "hackathon_site.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.jinja2.Jinja2",
+        # Template backends which time their renders, see hackathon_site/metrics.py
+        "BACKEND": "hackathon_site.metrics.Jinja2",
+        "NAME": "jinja2",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {"environment": "hackathon_site.jinja2.environment"},
     },
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "hackathon_site.metrics.DjangoTemplates",
+        "NAME": "django",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -161,6 +167,24 @@ DATABASES = {
     }
 }
 
+# Optional read replica. Reads of GET requests to API list and detail views, and
+# of admin exports, are sent to it. See hackathon_site/db_router.py
+if os.environ.get("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ.get("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "USER": os.environ.get("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.environ.get(
+            "DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]
+        ),
+        "HOST": os.environ["DB_REPLICA_HOST"],
+        "PORT": os.environ.get("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        # Tests run against the primary only
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["hackathon_site.db_router.ReplicaRouter"]
+
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 
 # Cache
@@ -263,6 +287,7 @@ LOGGING = {
             "class": "logging.StreamHandler",
             "filters": ["require_debug_false"],
         },
+        "request_metrics": {"level": "INFO", "class": "logging.StreamHandler"},
         "mail_admins": {
             "level": "ERROR",
             "filters": ["require_debug_false"],
@@ -280,6 +305,12 @@ LOGGING = {
             "propagate": False,
         },
         "review": {"handlers": ["console", "console_errors"], "propagate": False},
+        # One line per request, with the fields of RequestMetricsMiddleware
+        "hackathon_site.metrics": {
+            "handlers": ["request_metrics"],
+            "level": os.environ.get("REQUEST_METRICS_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
         "hardware": {
             "handlers": ["console", "console_errors", "mail_admins"],
             "level": "ERROR",
@@ -294,6 +325,13 @@ DEFAULT_FROM_EMAIL = "webmaster@localhost"
 CONTACT_EMAIL = DEFAULT_FROM_EMAIL
 HSS_ADMIN_EMAIL = "hardware@newhacks.ca"
 
+# Email outbox. Emails are queued in the database and sent by the
+# send_queued_emails management command.
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+# Seconds to wait before retrying a failed email, doubled after every attempt
+OUTBOX_RETRY_BACKOFF = 60
+
 REGISTRATION_OPEN_DATE = datetime(2020, 9, 1, tzinfo=TZ_INFO)
 REGISTRATION_CLOSE_DATE = datetime(2023, 9, 30, tzinfo=TZ_INFO)
 EVENT_START_DATE = datetime(2023, 10, 10, 10, 0, 0, tzinfo=TZ_INFO)
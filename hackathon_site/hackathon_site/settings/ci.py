@@ -23,7 +23,16 @@ from hackathon_site.settings import *
 # Convenient for some methods to test, since DEBUG=0 in testing
 IN_TESTING = True
 
-DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
+DATABASES = {
+    "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+    # A stand-in for the read replica, so that routing to it is tested. Tests use
+    # the same database for both.
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+        "TEST": {"MIRROR": "default"},
+    },
+}
 
 CACHES = {
     "default": {
@@ -44,3 +53,6 @@ if not os.path.isdir(MEDIA_ROOT):
 RECAPTCHA_PUBLIC_KEY = "6LeIxAcTAAAAAJcZVRqyHh71UMIEGNQ_MXjiZKhI"
 RECAPTCHA_PRIVATE_KEY = "6LeIxAcTAAAAAGG-vFI1TnRWxMZNFuojJ4WifJWe"
 SILENCED_SYSTEM_CHECKS = ["captcha.recaptcha_test_key_error"]
+
+# Don't log the metrics of every request made by the tests
+LOGGING["loggers"]["hackathon_site.metrics"]["level"] = "WARNING"
@@ -1,11 +1,13 @@
 from pathlib import Path
 
 from django.conf import settings
-from django.contrib.auth.models import Permission
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 
+from hackathon_site.metrics import view_metrics_store
 from hackathon_site.tests import SetupUserMixin
 
 
@@ -50,3 +52,48 @@ class ResumeViewTestCase(SetupUserMixin, TestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.get("Content-Type"), "text/plain")
+
+
+class RequestMetricsViewTestCase(SetupUserMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse("api:request-metrics")
+
+    def _login_as_admin(self):
+        self.user.groups.add(Group.objects.get(name="Hardware Site Admins"))
+        self._login()
+
+    def test_user_not_admin(self):
+        self._login()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_not_admin(self):
+        self.user.is_staff = True
+        self.user.save()
+        self._login()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_get_summary(self):
+        self._login_as_admin()
+        self.client.get(reverse("api:hardware:hardware-list"))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["api:hardware:hardware-list"]["count"], 1)
+        self.assertEqual(
+            set(data["api:hardware:hardware-list"]["duration_ms"]),
+            {"p50", "p95", "p99", "max"},
+        )
+
+    def test_delete_resets_metrics(self):
+        self._login_as_admin()
+        self.client.get(reverse("api:hardware:hardware-list"))
+
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        # Only the delete request itself is left
+        self.assertEqual(list(view_metrics_store.summary()), ["api:request-metrics"])
@@ -1,12 +1,42 @@
 from datetime import date, datetime
+from unittest import skipUnless
 from unittest.mock import patch
 from uuid import uuid4
 
 from django.conf import settings
-from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.contrib.sessions.models import Session
+from django.db import OperationalError, connection, connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
 from event.models import User, Team as EventTeam, Profile
-from hackathon_site.utils import is_registration_open
+from hackathon_site.cache import VersionedCache
+from hackathon_site.metrics import (
+    RequestMetricsMiddleware,
+    ViewMetricsStore,
+    view_metrics_store,
+)
+from hackathon_site.db_router import (
+    REPLICA_DB_ALIAS,
+    ReplicaReadMiddleware,
+    ReplicaRouter,
+    primary_reads,
+    replica_configured,
+    replica_reads,
+)
+from hackathon_site.utils import atomic_with_retry, is_registration_open
+from hardware.models import Hardware
+from hardware.views import HardwareListView
+from outbox.utils import queue_mail
 from registration.models import Application, Team as RegistrationTeam
 from review.models import Review
 
@@ -221,3 +251,308 @@ class IsRegistrationOpenTestCase(TestCase):
             2020, 1, 2, tzinfo=settings.TZ_INFO
         )
         self.assertFalse(is_registration_open())
+
+
+class VersionedCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.versioned_cache = VersionedCache("test")
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.versioned_cache.get("a", 1))
+        self.versioned_cache.set({"foo": "bar"}, "a", 1)
+        self.assertEqual(self.versioned_cache.get("a", 1), {"foo": "bar"})
+        self.assertIsNone(self.versioned_cache.get("a", 2))
+
+    def test_invalidate(self):
+        self.versioned_cache.set("value", "a")
+        other_cache = VersionedCache("other")
+        other_cache.set("other value", "a")
+
+        self.versioned_cache.invalidate()
+        self.assertIsNone(self.versioned_cache.get("a"))
+        self.assertEqual(other_cache.get("a"), "other value")
+
+    def test_invalidate_after_version_evicted(self):
+        self.versioned_cache.set("value", "a")
+        cache.delete(self.versioned_cache.version_key)
+
+        self.versioned_cache.invalidate()
+        self.assertIsNotNone(cache.get(self.versioned_cache.version_key))
+
+
+class AtomicWithRetryTestCase(TestCase):
+    @staticmethod
+    def _operational_error(pgcode):
+        cause = Exception()
+        cause.pgcode = pgcode
+        error = OperationalError()
+        error.__cause__ = cause
+        return error
+
+    @patch("hackathon_site.utils.connection")
+    def test_retries_serialization_failures(self, mock_connection):
+        mock_connection.in_atomic_block = False
+        attempts = []
+
+        def func():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise self._operational_error("40001")
+            return "done"
+
+        self.assertEqual(atomic_with_retry(func, backoff=0), "done")
+        self.assertEqual(len(attempts), 3)
+
+    @patch("hackathon_site.utils.connection")
+    def test_gives_up_after_attempts(self, mock_connection):
+        mock_connection.in_atomic_block = False
+
+        def func():
+            raise self._operational_error("40P01")
+
+        with self.assertRaises(OperationalError):
+            atomic_with_retry(func, attempts=2, backoff=0)
+
+    @patch("hackathon_site.utils.connection")
+    def test_does_not_retry_other_errors(self, mock_connection):
+        mock_connection.in_atomic_block = False
+        attempts = []
+
+        def func():
+            attempts.append(1)
+            raise self._operational_error(None)
+
+        with self.assertRaises(OperationalError):
+            atomic_with_retry(func, backoff=0)
+        self.assertEqual(len(attempts), 1)
+
+    def test_does_not_retry_in_transaction(self):
+        attempts = []
+
+        def func():
+            attempts.append(1)
+            raise self._operational_error("40001")
+
+        # Tests run in a transaction
+        with self.assertRaises(OperationalError):
+            atomic_with_retry(func, backoff=0)
+        self.assertEqual(len(attempts), 1)
+
+
+@patch("hackathon_site.db_router.replica_configured", return_value=True)
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_primary_by_default(self, _):
+        self.assertEqual(self.router.db_for_read(Hardware), "default")
+
+    def test_replica_reads(self, _):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Hardware), REPLICA_DB_ALIAS)
+            # Sessions are read back right after being written
+            self.assertEqual(self.router.db_for_read(Session), "default")
+            with primary_reads():
+                self.assertEqual(self.router.db_for_read(Hardware), "default")
+            self.assertEqual(self.router.db_for_read(Hardware), REPLICA_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(Hardware), "default")
+
+    def test_reads_after_write_stay_on_primary(self, _):
+        with replica_reads():
+            with primary_reads():
+                self.assertEqual(self.router.db_for_write(Hardware), "default")
+            self.assertEqual(self.router.db_for_read(Hardware), "default")
+
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Hardware), REPLICA_DB_ALIAS)
+
+    def test_reads_in_transaction_stay_on_primary(self, _):
+        with replica_reads(), patch.object(
+            connections["default"], "in_atomic_block", True
+        ):
+            self.assertEqual(self.router.db_for_read(Hardware), "default")
+
+    def test_no_replica_configured(self, mock_replica_configured):
+        mock_replica_configured.return_value = False
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Hardware), "default")
+
+    def test_no_migrations_on_replica(self, _):
+        self.assertTrue(self.router.allow_migrate("default", "hardware"))
+        self.assertFalse(self.router.allow_migrate(REPLICA_DB_ALIAS, "hardware"))
+
+
+@patch("hackathon_site.db_router.replica_configured", return_value=True)
+class ReplicaReadMiddlewareTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def _read_database(self, request, view_func):
+        """
+        Process the request like Django would, returning the database read from
+        by the view.
+        """
+
+        def get_response(request):
+            middleware.process_view(request, view_func, (), {})
+            return self.router.db_for_read(Hardware)
+
+        middleware = ReplicaReadMiddleware(get_response)
+        return middleware(request)
+
+    def test_list_view_reads_from_replica(self, _):
+        request = self.factory.get("/")
+        self.assertEqual(
+            self._read_database(request, HardwareListView.as_view()), REPLICA_DB_ALIAS,
+        )
+        # The routing state does not outlive the request
+        self.assertEqual(self.router.db_for_read(Hardware), "default")
+
+    def test_unsafe_method_reads_from_primary(self, _):
+        request = self.factory.post("/")
+        self.assertEqual(
+            self._read_database(request, HardwareListView.as_view()), "default"
+        )
+
+    def test_other_views_read_from_primary(self, _):
+        request = self.factory.get("/")
+        self.assertEqual(self._read_database(request, lambda r: None), "default")
+
+
+@skipUnless(replica_configured(), "Requires a replica database")
+class ReplicaRoutingTestCase(SetupUserMixin, TransactionTestCase):
+    databases = {"default", REPLICA_DB_ALIAS}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user.is_staff = True
+        self.user.is_superuser = True
+        self.user.save()
+        self._login()
+
+    def test_list_view_reads_from_replica(self):
+        self._make_profile(self.user)
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as queries:
+            response = self.client.get(reverse("api:event:team-orders"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any("hardware_order" in query["sql"] for query in queries))
+
+    def test_cached_view_reads_from_primary(self):
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as queries:
+            response = self.client.get(reverse("api:hardware:hardware-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("hardware_hardware" in query["sql"] for query in queries))
+
+    def test_export_reads_from_replica(self):
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as queries:
+            response = self.client.post(
+                reverse("admin:auth_user_export"), {"file_format": 0}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any("auth_user" in query["sql"] for query in queries))
+
+
+class RequestMetricsMiddlewareTestCase(SetupUserMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    @staticmethod
+    def _server_timing(response):
+        """
+        Parse the Server-Timing header into {name: {param: value}}.
+        """
+        metrics = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            metrics[name] = dict(param.split("=", 1) for param in params)
+        return metrics
+
+    def test_records_queries_and_cache_lookups(self):
+        self._login()
+        url = reverse("api:hardware:hardware-list")
+        with self.assertLogs("hackathon_site.metrics", "INFO") as logs, (
+            CaptureQueriesContext(connection)
+        ) as queries:
+            response = self.client.get(url)
+
+        server_timing = self._server_timing(response)
+        self.assertEqual(server_timing["db"]["desc"], f'"{len(queries)} queries"')
+        self.assertGreater(float(server_timing["db"]["dur"]), 0)
+        self.assertEqual(server_timing["cache"]["desc"], '"0 hits / 1 misses"')
+        self.assertIn("total", server_timing)
+
+        fields = logs.records[0].request_metrics
+        self.assertEqual(fields["view"], "api:hardware:hardware-list")
+        self.assertEqual(fields["status"], 200)
+        self.assertEqual(fields["queries"], len(queries))
+
+        response = self.client.get(url)
+        self.assertEqual(
+            self._server_timing(response)["cache"]["desc"], '"1 hits / 0 misses"'
+        )
+
+    def test_records_template_time(self):
+        response = self.client.get(reverse("event:index"))
+        self.assertGreater(float(self._server_timing(response)["template"]["dur"]), 0)
+
+    def test_records_email_time(self):
+        def get_response(request):
+            queue_mail("Subject", "Message", ["foo@bar.com"])
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(get_response)
+        with self.assertLogs("hackathon_site.metrics", "INFO"):
+            response = middleware(RequestFactory().get("/"))
+        self.assertGreater(float(self._server_timing(response)["email"]["dur"]), 0)
+
+    def test_aggregates_per_view(self):
+        self._login()
+        with self.assertLogs("hackathon_site.metrics", "INFO"):
+            for _ in range(3):
+                self.client.get(reverse("api:hardware:hardware-list"))
+            self.client.get(reverse("api:hardware:category-list"))
+
+        summary = view_metrics_store.summary()
+        self.assertEqual(summary["api:hardware:hardware-list"]["count"], 3)
+        self.assertEqual(summary["api:hardware:category-list"]["count"], 1)
+
+
+class ViewMetricsStoreTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = ViewMetricsStore(prefix="test_metrics", max_samples=100)
+
+    def _record(self, view_name, duration_ms, **fields):
+        sample = dict.fromkeys(ViewMetricsStore.SAMPLE_FIELDS, 0)
+        self.store.record(view_name, {**sample, "duration_ms": duration_ms, **fields})
+
+    def test_summary(self):
+        for i in range(1, 101):
+            self._record("view", i, queries=i % 2, db_ms=2)
+
+        summary = self.store.summary()["view"]
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(
+            summary["duration_ms"], {"p50": 50, "p95": 95, "p99": 99, "max": 100}
+        )
+        self.assertEqual(summary["queries"], {"p50": 0, "p95": 1, "p99": 1, "max": 1})
+        self.assertEqual(summary["mean_db_ms"], 2)
+        self.assertEqual(summary["mean_cache_hits"], 0)
+
+    def test_keeps_latest_samples(self):
+        for i in range(1, 151):
+            self._record("view", i)
+
+        summary = self.store.summary()["view"]
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(summary["duration_ms"]["p50"], 100)
+
+    def test_reset(self):
+        self._record("view", 1)
+        self._record("other_view", 1)
+        self.store.reset()
+        self.assertEqual(self.store.summary(), {})
@@ -1,6 +1,16 @@
 from datetime import datetime
+import logging
+import random
+import time
 
 from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, router, transaction
+
+logger = logging.getLogger(__name__)
+
+# Postgres error codes for serialization failures and deadlocks. Transactions
+# rolled back for these reasons can safely be retried.
+RETRYABLE_PGCODES = ("40001", "40P01")
 
 
 def is_registration_open():
@@ -15,3 +25,84 @@ def is_registration_open():
     # is configured to match TIME_ZONE. We then make the datetime object timezone-aware.
     now = datetime.now().replace(tzinfo=settings.TZ_INFO)
     return settings.REGISTRATION_OPEN_DATE <= now < settings.REGISTRATION_CLOSE_DATE
+
+
+def atomic_with_retry(func, attempts=3, backoff=0.05):
+    """
+    Run func in a transaction and return its result. If the database rolls the
+    transaction back because of a serialization failure or a deadlock, run it
+    again after a short randomized delay, up to the given number of attempts.
+
+    func must be safe to run more than once, and should not have side effects
+    outside of the database (like sending emails).
+    """
+    # Retrying inside an outer transaction would only retry a savepoint
+    can_retry = not connection.in_atomic_block
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return func()
+        except OperationalError as e:
+            pgcode = getattr(e.__cause__, "pgcode", None)
+            if pgcode not in RETRYABLE_PGCODES or attempt == attempts or not can_retry:
+                raise
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+
+def lock_teams(model, *team_ids):
+    """
+    Lock the rows of the given teams until the end of the current transaction, so
+    that their members can be counted and changed without racing other joins,
+    leaves and deletions. Rows are locked in order of id, so that transactions
+    locking the same teams can't deadlock. Lock the member's row before its
+    teams, as every team change does.
+
+    Returns {team_id: team} of the teams that still exist.
+    """
+    return {
+        team.id: team
+        for team in model.objects.select_for_update()
+        .filter(id__in=team_ids)
+        .order_by("id")
+    }
+
+
+class UniqueTeamCodeMixin:
+    """
+    Mixin for team models with a unique team_code, which defaults to a random
+    code. Rather than checking that a code is free before saving, which takes a
+    query and can still collide with a concurrent save, a new team is inserted
+    right away and, if the unique index rejects its code, inserted again with
+    another one.
+
+    Codes that were given explicitly are never replaced.
+    """
+
+    TEAM_CODE_ATTEMPTS = 10
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Instances loaded from the database are created with positional args
+        self._team_code_is_default = not args and "team_code" not in kwargs
+
+    def save(self, *args, **kwargs):
+        if not (self._state.adding and self._team_code_is_default):
+            return super().save(*args, **kwargs)
+
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        for attempt in range(1, self.TEAM_CODE_ATTEMPTS + 1):
+            try:
+                # A savepoint, so that the transaction can go on after a collision
+                with transaction.atomic(using=using):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if (
+                    attempt == self.TEAM_CODE_ATTEMPTS
+                    or not type(self)
+                    ._default_manager.using(using)
+                    .filter(team_code=self.team_code)
+                    .exists()
+                ):
+                    raise
+                logger.info("Team code %s is taken, retrying", self.team_code)
+                self.team_code = self._meta.get_field("team_code").get_default()
@@ -0,0 +1,28 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from event.permissions import UserIsAdmin
+from hackathon_site.metrics import view_metrics_store
+
+
+class RequestMetricsView(APIView):
+    permission_classes = [UserIsAdmin]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Summarize the metrics of recent requests, per view
+
+        For every view, the number of recent requests with the percentiles and
+        maximum of their duration (in milliseconds) and number of queries, and the
+        mean time spent in the database, rendering templates and queueing emails,
+        and the mean number of response cache hits and misses.
+        """
+        return Response(view_metrics_store.summary())
+
+    def delete(self, request, *args, **kwargs):
+        """
+        Clear the metrics of every view
+        """
+        view_metrics_store.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
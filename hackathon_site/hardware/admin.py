@@ -5,9 +5,11 @@ import requests
 from client_side_image_cropping import ClientsideCroppingWidget, DcsicAdminMixin
 from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.core.files.base import ContentFile
 from django.db import models
-from django.utils.html import mark_safe
+from django.db.models import Prefetch
+from django.utils.html import format_html_join, mark_safe
 from import_export import resources
 from import_export.admin import ImportMixin
 from import_export.widgets import ManyToManyWidget
@@ -38,7 +40,13 @@ class HardwareCategoryInline(admin.TabularInline):
     )
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related("hardware")
+        # Hardware.objects annotates quantity_remaining, which the default
+        # manager used to prefetch the relation does not
+        return (
+            super()
+            .get_queryset(request)
+            .prefetch_related(Prefetch("hardware", queryset=Hardware.objects.all()))
+        )
 
     @staticmethod
     def name(obj):
@@ -70,10 +78,42 @@ class HardwareCategoryInline(admin.TabularInline):
         return obj.hardware.max_per_team
 
 
+class HardwareAutocompleteSelect(AutocompleteSelect):
+    """
+    Autocomplete for the hardware of an order item. The selected option of an
+    existing order item is rendered from its hardware, which the inline has
+    already fetched, instead of being fetched again for every row.
+    """
+
+    selected_hardware = None
+
+    def optgroups(self, name, value, attr=None):
+        hardware = self.selected_hardware
+        if hardware is None or [str(v) for v in value] != [str(hardware.pk)]:
+            return super().optgroups(name, value, attr)
+
+        option = self.create_option(
+            name,
+            hardware.pk,
+            self.choices.field.label_from_instance(hardware),
+            {str(hardware.pk)},
+            0,
+        )
+        return [(None, [option], 0)]
+
+
 class OrderItemForm(forms.ModelForm):
     class Meta:
         model = OrderItem
-        fields = ("hardware", "part_returned_health")
+        fields = ("hardware", "quantity", *OrderItem.RETURNED_HEALTH_FIELDS.values())
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields["hardware"].widget
+        # The admin wraps the widget to add the related object links
+        widget = getattr(widget, "widget", widget)
+        if self.instance.pk and isinstance(widget, HardwareAutocompleteSelect):
+            widget.selected_hardware = self.instance.hardware
 
     def clean_hardware(self):
         value = self.cleaned_data["hardware"]
@@ -84,6 +124,18 @@ class OrderItemForm(forms.ModelForm):
             )
         return value
 
+    def clean(self):
+        cleaned_data = super().clean()
+        quantity_returned = sum(
+            cleaned_data.get(field) or 0
+            for field in OrderItem.RETURNED_HEALTH_FIELDS.values()
+        )
+        if quantity_returned > (cleaned_data.get("quantity") or 0):
+            raise forms.ValidationError(
+                "Cannot return more items than the quantity ordered."
+            )
+        return cleaned_data
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -102,12 +154,24 @@ class OrderItemInline(admin.TabularInline):
         "categories",
     )
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "hardware":
+            kwargs["widget"] = HardwareAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get("using")
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
     def get_queryset(self, request):
         return (
             super()
             .get_queryset(request)
-            .select_related("hardware", "order__team")
-            .prefetch_related("hardware__categories")
+            .select_related("order__team")
+            .prefetch_related(
+                Prefetch(
+                    "hardware",
+                    queryset=Hardware.objects.prefetch_related("categories"),
+                )
+            )
         )
 
     @staticmethod
@@ -134,15 +198,11 @@ class OrderItemInline(admin.TabularInline):
     @staticmethod
     def quantity_remaining(obj: OrderItem):
         """
-        Get the quantity remaining by querying the Hardware model, which has the
-        necessary annotations.
-
-        This is quite inefficient, as every order item will generate a database
-        hit. That admin site should not be used heavily, so that's fine. If
-        performance becomes an issue, the hardware queryset can be cached on
-        a per-request basis to use here (probably in OrderAdmin.get_queryset).
+        The hardware of all the order items on the page is fetched in a single
+        query through Hardware.objects, which annotates quantity_remaining (see
+        get_queryset).
         """
-        return Hardware.objects.get(id=obj.hardware_id).quantity_remaining
+        return obj.hardware.quantity_remaining
 
     @staticmethod
     def max_per_team(obj: OrderItem):
@@ -158,27 +218,33 @@ class IncidentInline(admin.TabularInline):
     verbose_name = "Incident"
     verbose_name_plural = "Incidents"
     extra = 0
-    readonly_fields = ("hardware", "state", "description", "time_occurred")
-    exclude = ("part_returned_health",)
+    fields = ("hardware", "state", "description", "time_occurred")
+    readonly_fields = fields
 
     @staticmethod
-    def state(obj: OrderItem):
-        return obj.incident.state
+    def _join_incidents(obj: OrderItem, attr):
+        return format_html_join(
+            mark_safe("<br>"),
+            "{}",
+            ((getattr(incident, attr),) for incident in obj.incidents.all()),
+        )
 
-    @staticmethod
-    def description(obj: OrderItem):
-        return obj.incident.description
+    def state(self, obj: OrderItem):
+        return self._join_incidents(obj, "state")
 
-    @staticmethod
-    def time_occurred(obj: OrderItem):
-        return obj.incident.time_occurred
+    def description(self, obj: OrderItem):
+        return self._join_incidents(obj, "description")
+
+    def time_occurred(self, obj: OrderItem):
+        return self._join_incidents(obj, "time_occurred")
 
     def get_queryset(self, request):
         return (
             super()
             .get_queryset(request)
-            .select_related("incident")
-            .filter(incident__isnull=False)
+            .filter(incidents__isnull=False)
+            .distinct()
+            .prefetch_related("incidents")
         )
 
     def has_add_permission(self, request, obj):
@@ -219,6 +285,8 @@ class HardwareResource(resources.ModelResource):
             "created_at",
             "updated_at",
             "picture",
+            "quantity_checked_out",
+            "search_document",
         )
         import_id_fields = (
             "name",
@@ -243,6 +311,7 @@ class HardwareAdmin(DcsicAdminMixin, ImportMixin, admin.ModelAdmin):
     list_display_links = ("id", "name")
     search_fields = ("id", "name", "model_number", "manufacturer")
     autocomplete_fields = ("categories",)
+    readonly_fields = ("quantity_checked_out",)
     formfield_overrides = {
         models.ImageField: {
             "widget": ClientsideCroppingWidget(
@@ -292,7 +361,8 @@ class OrderItemAdmin(admin.ModelAdmin):
         "id",
         "order_id",
         "hardware_id",
-        "part_returned_health",
+        "quantity",
+        *OrderItem.RETURNED_HEALTH_FIELDS.values(),
     )
     search_fields = ("id", "order__team__team_code", "hardware__name")
 
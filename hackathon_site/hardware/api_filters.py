@@ -1,6 +1,13 @@
+import re
+
 from django import forms
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
 from django_filters import rest_framework as filters, widgets
+from rest_framework.filters import SearchFilter
 
+from event.models import Team
 from hardware.models import Hardware, Order, Incident, OrderItem
 from hardware.serializers import (
     HardwareSerializer,
@@ -63,9 +70,90 @@ class HardwareFilter(filters.FilterSet):
         field_name="categories",
         label="Comma separated list of category IDs",
         help_text="Comma separated list of category IDs",
+        distinct=True,
     )
 
 
+class HardwareSearchFilter(SearchFilter):
+    """
+    Search hardware by the fields in the view's search_fields, which should be the
+    fields of Hardware.search_document.
+
+    On PostgreSQL, this is a full-text search on the indexed search_document. Every
+    word of the search must start a word of the hardware, and the results are
+    ranked by relevance unless another ordering is requested. Other databases fall
+    back to SearchFilter, matching each word anywhere in the fields, so a search
+    for the middle of a word only finds hardware off PostgreSQL.
+    """
+
+    word_re = re.compile(r"\w+")
+
+    def get_search_words(self, request):
+        """
+        The words of the search. Only word characters are kept, so that they are
+        always valid in a tsquery.
+        """
+        return [
+            word
+            for term in self.get_search_terms(request)
+            for word in self.word_re.findall(term)
+        ]
+
+    @staticmethod
+    def get_prefix_query(words):
+        """
+        A tsquery on Hardware.search_document that matches every word as a prefix.
+        """
+        return SearchQuery(
+            " & ".join(f"{word}:*" for word in words),
+            search_type="raw",
+            config=Hardware.SEARCH_CONFIG,
+        )
+
+    def filter_queryset(self, request, queryset, view):
+        if connections[queryset.db].vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+
+        words = self.get_search_words(request)
+        if not words:
+            return queryset
+
+        query = self.get_prefix_query(words)
+        return (
+            queryset.filter(search_document=query)
+            .annotate(search_rank=SearchRank(F("search_document"), query))
+            .order_by("-search_rank", "id")
+        )
+
+
+class IncidentSearchFilter(HardwareSearchFilter):
+    """
+    Search incidents by their state, their team code and the hardware of their
+    order item, as listed in the view's search_fields.
+
+    On PostgreSQL, every word of the search must start the state, the team code or
+    a word of the hardware's indexed search_document, so the model number and
+    notes of the hardware are searched too. Other databases fall back to
+    SearchFilter, matching each word anywhere in the fields.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if connections[queryset.db].vendor != "postgresql":
+            return SearchFilter.filter_queryset(self, request, queryset, view)
+
+        for word in self.get_search_words(request):
+            hardware = Hardware.objects.filter(
+                search_document=self.get_prefix_query([word])
+            )
+            teams = Team.objects.filter(team_code__istartswith=word)
+            queryset = queryset.filter(
+                Q(state__istartswith=word)
+                | Q(order_item__order__team__in=teams)
+                | Q(order_item__hardware__in=hardware)
+            )
+        return queryset
+
+
 class OrderFilter(filters.FilterSet):
     queryset = Order
     serializer_class = OrderListSerializer
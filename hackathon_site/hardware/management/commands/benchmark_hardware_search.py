@@ -0,0 +1,126 @@
+from statistics import mean, quantiles
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from hardware.api_filters import HardwareSearchFilter
+from hardware.models import Hardware
+from hardware.views import HardwareListView
+
+PARTS = [
+    "Arduino",
+    "Raspberry Pi",
+    "ESP32",
+    "Servo Motor",
+    "Stepper Motor",
+    "Ultrasonic Sensor",
+    "Temperature Sensor",
+    "LED Strip",
+    "Camera Module",
+    "Motor Driver",
+    "Breadboard",
+    "Jumper Wires",
+    "USB Cable",
+    "Battery Pack",
+    "LCD Display",
+    "Accelerometer",
+]
+VARIANTS = ["Mini", "Nano", "Pro", "Uno", "Mega", "Lite", "Plus", "Max", "Zero"]
+MANUFACTURERS = ["Adafruit", "SparkFun", "Seeed", "DFRobot", "Pololu", "Espressif"]
+NOTES = [
+    "Comes with headers soldered.",
+    "Return with all the cables in the box.",
+    "Needs an external 5V power supply.",
+    "Ask the tech team for the charger.",
+    None,
+]
+SEARCHES = ["arduino", "servo motor", "sensor", "sparkfun", "esp32 pro", "zzz"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure hardware search latency on a generated catalog, comparing the "
+        "previous case-insensitive containment search with the full-text search. "
+        "The catalog is created in a transaction that is rolled back, so the "
+        "database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--catalog-size",
+            type=int,
+            default=5000,
+            help="Number of hardware in the generated catalog (default: 5000).",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Number of times each search is run (default: 20).",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            self.stdout.write(
+                self.style.WARNING(
+                    "Full-text search requires PostgreSQL, both searches will use "
+                    f"the fallback on {connection.vendor}."
+                )
+            )
+
+        with transaction.atomic():
+            self.create_catalog(options["catalog_size"])
+            for label, backend in (
+                ("Containment", SearchFilter()),
+                ("Full-text", HardwareSearchFilter()),
+            ):
+                self.benchmark(label, backend, options["iterations"])
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def create_catalog(size):
+        rng = random.Random(0)
+        Hardware.objects.bulk_create(
+            [
+                Hardware(
+                    name=f"{rng.choice(PARTS)} {rng.choice(VARIANTS)} {i}",
+                    model_number=f"{rng.choice('ABCDEFGH')}{rng.randrange(10000)}",
+                    manufacturer=rng.choice(MANUFACTURERS),
+                    notes=rng.choice(NOTES),
+                    quantity_available=rng.randrange(1, 50),
+                    max_per_team=4,
+                )
+                for i in range(size)
+            ],
+            batch_size=1000,
+        )
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE hardware_hardware")
+
+    def benchmark(self, label, backend, iterations):
+        view = HardwareListView()
+        factory = APIRequestFactory()
+        timings = []
+        for search in SEARCHES:
+            request = Request(factory.get("/", {"search": search}))
+            for _ in range(iterations):
+                start = time.perf_counter()
+                # What the list view runs: a count and the first page
+                queryset = backend.filter_queryset(
+                    request, Hardware.objects.all(), view
+                )
+                queryset.count()
+                list(queryset[:20])
+                timings.append((time.perf_counter() - start) * 1000)
+
+        percentiles = quantiles(timings, n=100)
+        self.stdout.write(
+            f"{label}: mean {mean(timings):.3f} ms, p50 {percentiles[49]:.3f} ms, "
+            f"p95 {percentiles[94]:.3f} ms per search"
+        )
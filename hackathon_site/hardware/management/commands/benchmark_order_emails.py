@@ -0,0 +1,106 @@
+from statistics import mean, quantiles
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from hardware.views import ORDER_STATUS_MSG, ORDER_STATUS_CLOSING_MSG, OrderDetailView
+from outbox.models import OutboxEmail
+from outbox.utils import NotificationComposer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the time spent rendering the emails of a single order status "
+        "change, comparing the notification composer with rendering the subject "
+        "and both bodies, greeting included, for every recipient. The emails are "
+        "built but not queued, so nothing is written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=500,
+            help="Number of status changes to render (default: 500).",
+        )
+        parser.add_argument(
+            "--team-size",
+            type=int,
+            default=4,
+            help="Number of team members receiving the email (default: 4).",
+        )
+
+    def handle(self, *args, **options):
+        recipients = [("Hardware Inventory Admins", settings.HSS_ADMIN_EMAIL)] + [
+            (f"Member{i}", f"member{i}@example.com")
+            for i in range(options["team_size"])
+        ]
+        context = {
+            "order": {"id": 1, "team_code": "ABCDE", "status": "Ready for Pickup"},
+            "order_status_message": ORDER_STATUS_MSG["Ready for Pickup"],
+            "order_status_closing_message": ORDER_STATUS_CLOSING_MSG[
+                "Ready for Pickup"
+            ],
+        }
+
+        def render_greeted_body(body_template, name):
+            greeting = render_to_string(
+                NotificationComposer.greeting_template, {"name": name}
+            )
+            return f"{greeting}\n\n{render_to_string(body_template, context)}"
+
+        def render_per_recipient():
+            for i, (name, email) in enumerate(recipients):
+                body_template = (
+                    OrderDetailView.update_order_email_template_admin
+                    if i == 0
+                    else OrderDetailView.update_order_email_template_participant
+                )
+                # The same greeting and body the composer renders, rendered for
+                # both parts of every email
+                OutboxEmail(
+                    subject=render_to_string(
+                        OrderDetailView.update_order_email_subject_template, context,
+                    ),
+                    message=render_greeted_body(body_template, name),
+                    html_message=render_greeted_body(body_template, name),
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=[email],
+                )
+
+        def render_with_composer():
+            composer = NotificationComposer(
+                OrderDetailView.update_order_email_subject_template, context
+            )
+            for i, (name, email) in enumerate(recipients):
+                composer.add(
+                    OrderDetailView.update_order_email_template_admin
+                    if i == 0
+                    else OrderDetailView.update_order_email_template_participant,
+                    name,
+                    email,
+                )
+
+        self.stdout.write(
+            f"Rendering {options['iterations']} status changes for "
+            f"{len(recipients)} recipients (admins and {options['team_size']} members)"
+        )
+        for label, render in (
+            ("Per recipient", render_per_recipient),
+            ("Composer", render_with_composer),
+        ):
+            # Warm up the template cache
+            render()
+            timings = []
+            for _ in range(options["iterations"]):
+                start = time.perf_counter()
+                render()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            percentiles = quantiles(timings, n=100)
+            self.stdout.write(
+                f"{label}: mean {mean(timings):.3f} ms, p50 {percentiles[49]:.3f} ms, "
+                f"p95 {percentiles[94]:.3f} ms per status change"
+            )
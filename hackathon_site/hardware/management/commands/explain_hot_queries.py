@@ -0,0 +1,124 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Sum
+
+from event.models import Team
+from hardware.models import Hardware, Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plans of the queries run most often while orders are "
+        "placed, returned and teams are changed, so that missing or unused indexes "
+        "are easy to spot. The queries use an existing team and hardware, or ids "
+        "that match nothing on an empty database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run the queries and show actual timings (PostgreSQL only).",
+        )
+        parser.add_argument(
+            "--team", type=int, help="Id of the team to use in the queries."
+        )
+        parser.add_argument(
+            "--hardware", type=int, help="Id of the hardware to use in the queries."
+        )
+
+    def get_queries(self, team_id, hardware_id):
+        """
+        The hot queries as (description, queryset) pairs. They mirror the queries
+        of the views and serializers named in each description.
+        """
+        team_unreturned_items = (
+            OrderItem.objects.filter(order__team_id=team_id)
+            .exclude(order__status="Cancelled")
+            .unreturned()
+        )
+        queries = [
+            (
+                "Team usage per hardware (order creation)",
+                team_unreturned_items.filter(hardware_id__in=[hardware_id])
+                .values("hardware_id")
+                .annotate(count=Sum("quantity_unreturned")),
+            ),
+            (
+                "Team usage per category (order creation)",
+                team_unreturned_items.filter(hardware__categories__isnull=False)
+                .values("hardware__categories")
+                .annotate(count=Sum("quantity_unreturned")),
+            ),
+            (
+                "Team active orders (team leave, join and delete)",
+                Order.objects.filter(team_id=team_id).exclude(
+                    status__in=("Cancelled", "Returned")
+                )[:1],
+            ),
+            (
+                "Team orders with unreturned items (batch returns)",
+                Order.objects.filter(team_id=team_id)
+                .exclude(status="Cancelled")
+                .filter(
+                    Exists(OrderItem.objects.filter(order=OuterRef("pk")).unreturned())
+                ),
+            ),
+            (
+                "Unreturned items of the team's orders (returns)",
+                OrderItem.objects.filter(
+                    order__in=Order.objects.filter(team_id=team_id).values("id")
+                ).unreturned(),
+            ),
+            (
+                "Orders holding a hardware",
+                OrderItem.objects.filter(hardware_id=hardware_id).values("order_id"),
+            ),
+            (
+                "Checked out per hardware (reconcile_hardware_stock)",
+                OrderItem.objects.exclude(order__status="Cancelled")
+                .values("hardware_id")
+                .annotate(count=Sum(F("quantity") - F("quantity_returned_healthy"))),
+            ),
+        ]
+        if connection.vendor == "postgresql":
+            search_query = SearchQuery(
+                "arduino:*", search_type="raw", config=Hardware.SEARCH_CONFIG
+            )
+            queries.append(
+                (
+                    "Hardware search (hardware list)",
+                    Hardware.objects.filter(search_document=search_query)
+                    .annotate(
+                        search_rank=SearchRank(F("search_document"), search_query)
+                    )
+                    .order_by("-search_rank", "id")[:20],
+                )
+            )
+        return queries
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options["analyze"]:
+            if connection.vendor != "postgresql":
+                raise CommandError("--analyze is only supported on PostgreSQL.")
+            explain_options = {"analyze": True, "buffers": True}
+
+        team_id = options["team"]
+        if team_id is None:
+            team_id = (
+                Team.objects.filter(order__isnull=False)
+                .values_list("id", flat=True)
+                .first()
+                or 0
+            )
+        hardware_id = options["hardware"]
+        if hardware_id is None:
+            hardware_id = Hardware.objects.values_list("id", flat=True).first() or 0
+        self.stdout.write(f"Team {team_id}, hardware {hardware_id}")
+
+        for description, queryset in self.get_queries(team_id, hardware_id):
+            self.stdout.write("")
+            self.stdout.write(self.style.MIGRATE_HEADING(description))
+            self.stdout.write(queryset.explain(**explain_options))
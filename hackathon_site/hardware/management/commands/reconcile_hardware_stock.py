@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hardware.models import Hardware
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the quantity_checked_out counter of every hardware from its order "
+        "items, reporting any hardware where the stored counter had drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drift, without fixing the stored counters.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Lock the hardware so orders can't change the counters while they
+            # are being rebuilt
+            hardware_list = list(
+                Hardware.objects.select_for_update()
+                .order_by("id")
+                .only("id", "name", "quantity_checked_out")
+            )
+            actual = Hardware.objects.compute_quantity_checked_out()
+
+            drifted = []
+            for hardware in hardware_list:
+                expected = actual.get(hardware.id, 0)
+                if hardware.quantity_checked_out != expected:
+                    self.stdout.write(
+                        f"Hardware {hardware.id} ({hardware.name}): stored "
+                        f"quantity_checked_out is {hardware.quantity_checked_out}, "
+                        f"expected {expected}"
+                    )
+                    hardware.quantity_checked_out = expected
+                    drifted.append(hardware)
+
+            if not drifted:
+                self.stdout.write(self.style.SUCCESS("No drift found."))
+                return
+
+            if options["dry_run"]:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Found drift in {len(drifted)} hardware, not fixed (dry run)."
+                    )
+                )
+                return
+
+            Hardware.objects.bulk_update(drifted, ["quantity_checked_out"])
+            self.stdout.write(
+                self.style.SUCCESS(f"Fixed drift in {len(drifted)} hardware.")
+            )
@@ -0,0 +1,396 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, F
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from event.models import Profile, Team
+from hackathon_site.metrics import percentile
+from hardware.models import Hardware, Order
+
+STEPS = ("login", "browse", "order", "poll", "cancel")
+RUSH_STEPS = ("order", "poll", "cancel")
+
+
+class StepResults:
+    """
+    The outcome of the requests made by one simulated team, which are merged once
+    every team is done. Responses with a 4xx status are rejections, e.g. hardware
+    that ran out of stock, and 5xx responses or exceptions are errors.
+    """
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.rejected = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.error_messages = []
+        # {order_id: {hardware_id: quantity}} of the orders that were created
+        self.orders = {}
+        self.cancelled_order_ids = set()
+
+    def record(self, step, duration, response=None, exception=None):
+        self.durations[step].append(duration)
+        if exception is not None or response.status_code >= 500:
+            self.errors[step] += 1
+            self.error_messages.append(
+                f"{step}: {exception!r}"
+                if exception is not None
+                else f"{step}: {response.status_code}"
+            )
+        elif response.status_code >= 400:
+            self.rejected[step] += 1
+
+    def merge(self, other):
+        for step, durations in other.durations.items():
+            self.durations[step] += durations
+        for step, count in other.rejected.items():
+            self.rejected[step] += count
+        for step, count in other.errors.items():
+            self.errors[step] += count
+        self.error_messages += other.error_messages
+        self.orders.update(other.orders)
+        self.cancelled_order_ids |= other.cancelled_order_ids
+
+
+class LockWaitMonitor(threading.Thread):
+    """
+    Sample the number of connections to the database waiting on a lock, until
+    stopped.
+    """
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopped.is_set():
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+                    )
+                    self.samples.append(cursor.fetchone()[0])
+                    self.stopped.wait(self.interval)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def deadlock_count():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()"
+        )
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate the opening of hardware sign out, when every team orders at once. "
+        "Each team is a thread with its own database connection, which logs in, "
+        "browses the catalog, and waits until every team is ready. All teams then "
+        "order at the same time, poll the status of their orders and cancel some of "
+        "them. Throughput, latency, errors, lock waits and deadlocks are reported, "
+        "and the stock is checked for overselling and drift afterwards. Requires "
+        "PostgreSQL, and a database seeded with seed_event, since the orders are "
+        "kept. max_connections must be greater than the number of teams."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--teams",
+            type=int,
+            default=200,
+            help="Number of teams ordering at the same time (default: 200).",
+        )
+        parser.add_argument(
+            "--password",
+            default="hackathon",
+            help="Password of the seeded users (default: hackathon).",
+        )
+        parser.add_argument(
+            "--polls",
+            type=int,
+            default=3,
+            help="Number of times each team polls its orders (default: 3).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.5,
+            help="Seconds between polls (default: 0.5).",
+        )
+        parser.add_argument(
+            "--cancel-rate",
+            type=float,
+            default=0.2,
+            help="Proportion of orders cancelled by their team (default: 0.2).",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The simulation requires PostgreSQL")
+        cache_backend = settings.CACHES["default"]["BACKEND"]
+        if "redis" not in cache_backend.lower():
+            self.stdout.write(
+                self.style.WARNING(f"The cache is not Redis, but {cache_backend}")
+            )
+
+        users = self.get_team_users(options["teams"])
+        if len(users) < options["teams"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Only {len(users)} teams can order, seed more users with "
+                    "seed_event"
+                )
+            )
+        # Hardware in stock, the lowest ids being the most popular
+        hardware_ids = list(
+            Hardware.objects.filter(quantity_remaining__gt=0)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if not users or not hardware_ids:
+            raise CommandError("Seed the database with seed_event first")
+
+        now = datetime.now(settings.TZ_INFO)
+        # All teams order once every one of them is ready, as when sign out opens
+        barrier = threading.Barrier(len(users) + 1)
+        results = [StepResults() for _ in users]
+        threads = [
+            threading.Thread(
+                target=self.simulate_team,
+                args=(
+                    user,
+                    hardware_ids,
+                    barrier,
+                    team_results,
+                    random.Random(options["seed"] * 100_003 + i),
+                    options,
+                ),
+            )
+            for i, (user, team_results) in enumerate(zip(users, results))
+        ]
+
+        monitor = LockWaitMonitor(interval=0.01)
+        deadlocks_before = deadlock_count()
+        with override_settings(
+            # The test client uses the testserver host
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            HARDWARE_SIGN_OUT_START_DATE=now - timedelta(days=1),
+            HARDWARE_SIGN_OUT_END_DATE=now + timedelta(days=1),
+        ):
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            self.stdout.write(
+                f"{len(users)} teams ready after {time.perf_counter() - start:.2f} s, "
+                "ordering"
+            )
+            rush_start = time.perf_counter()
+            monitor.start()
+            for thread in threads:
+                thread.join()
+            monitor.stop()
+            rush_duration = time.perf_counter() - rush_start
+
+        total = StepResults()
+        for team_results in results:
+            total.merge(team_results)
+        self.report(
+            total, rush_duration, monitor.samples, deadlock_count() - deadlocks_before
+        )
+        violations = self.check_consistency(total)
+        for violation in violations:
+            self.stdout.write(self.style.ERROR(violation))
+        if violations:
+            raise CommandError(f"Found {len(violations)} consistency violations")
+        self.stdout.write(self.style.SUCCESS("No consistency violations found."))
+
+    @staticmethod
+    def get_team_users(count):
+        """
+        One member of each team which is large enough to order.
+        """
+        teams = (
+            Team.objects.annotate(members=Count("profiles"))
+            .filter(
+                members__gte=settings.MIN_MEMBERS, members__lte=settings.MAX_MEMBERS
+            )
+            .order_by("id")[:count]
+        )
+        profiles = {}
+        for profile in (
+            Profile.objects.filter(team__in=teams)
+            .select_related("user")
+            .order_by("-id")
+        ):
+            profiles[profile.team_id] = profile
+        return [profile.user for profile in profiles.values()]
+
+    def simulate_team(self, user, hardware_ids, barrier, results, rng, options):
+        client = Client()
+
+        def request(step, method, path, data=None):
+            start = time.perf_counter()
+            response = exception = None
+            try:
+                response = getattr(client, method)(
+                    path, data, content_type="application/json"
+                )
+            except Exception as e:
+                exception = e
+            results.record(step, time.perf_counter() - start, response, exception)
+            return response
+
+        try:
+            try:
+                request(
+                    "login",
+                    "post",
+                    reverse("api:rest_login"),
+                    {"username": user.username, "password": options["password"]},
+                )
+                offset = rng.randrange(max(len(hardware_ids) - 20, 1))
+                request(
+                    "browse",
+                    "get",
+                    f"{reverse('api:hardware:hardware-list')}?limit=20&offset={offset}",
+                )
+                request("browse", "get", reverse("api:hardware:category-list"))
+            finally:
+                barrier.wait()
+
+            # A few items, picked with a Zipf distribution so that the teams
+            # compete for the popular ones
+            weights = [1 / rank for rank in range(1, len(hardware_ids) + 1)]
+            cart = set(rng.choices(hardware_ids, weights, k=rng.randint(1, 3)))
+            order = {hardware_id: rng.randint(1, 2) for hardware_id in cart}
+            response = request(
+                "order",
+                "post",
+                reverse("api:hardware:order-list"),
+                {
+                    "hardware": [
+                        {"id": hardware_id, "quantity": quantity}
+                        for hardware_id, quantity in order.items()
+                    ]
+                },
+            )
+            if response is None or response.status_code != 201:
+                return
+            response_data = response.json()
+            order_id = response_data["order_id"]
+            if order_id is None:
+                return
+            results.orders[order_id] = {
+                item["hardware_id"]: item["quantity_fulfilled"]
+                for item in response_data["hardware"]
+                if item["quantity_fulfilled"] > 0
+            }
+
+            for i in range(options["polls"]):
+                time.sleep(options["poll_interval"])
+                request("poll", "get", reverse("api:event:team-orders"))
+
+            if rng.random() < options["cancel_rate"]:
+                response = request(
+                    "cancel",
+                    "patch",
+                    reverse("api:event:team-order-detail", args=[order_id]),
+                    {"status": "Cancelled"},
+                )
+                if response is not None and response.status_code == 200:
+                    results.cancelled_order_ids.add(order_id)
+        finally:
+            connections.close_all()
+
+    def report(self, results, rush_duration, lock_wait_samples, deadlocks):
+        # Requests made once sign out opened
+        requests = sum(len(results.durations[step]) for step in RUSH_STEPS)
+        orders = len(results.orders)
+        self.stdout.write(
+            f"Rush: {requests} requests in {rush_duration:.2f} s "
+            f"({requests / rush_duration:.1f} per second), {orders} orders created "
+            f"({orders / rush_duration:.1f} per second)"
+        )
+        for step in STEPS:
+            durations = sorted(results.durations[step])
+            if not durations:
+                continue
+            count = len(durations)
+            self.stdout.write(
+                f"{step}: {count} requests, p50 {percentile(durations, 50) * 1000:.1f} "
+                f"ms, p95 {percentile(durations, 95) * 1000:.1f} ms, max "
+                f"{durations[-1] * 1000:.1f} ms, {results.rejected[step]} rejected "
+                f"({results.rejected[step] / count:.1%}), {results.errors[step]} "
+                f"errors ({results.errors[step] / count:.1%})"
+            )
+        for message in sorted(set(results.error_messages))[:10]:
+            self.stdout.write(self.style.ERROR(f"Error: {message}"))
+
+        waiting = [sample for sample in lock_wait_samples if sample]
+        if lock_wait_samples:
+            self.stdout.write(
+                f"Lock waits: connections waiting in {len(waiting)} of "
+                f"{len(lock_wait_samples)} samples, at most {max(lock_wait_samples)} "
+                "at once"
+            )
+        self.stdout.write(f"Deadlocks: {deadlocks}")
+
+    @staticmethod
+    def check_consistency(results):
+        violations = []
+
+        checked_out = Hardware.objects.compute_quantity_checked_out()
+        for hardware in Hardware.objects.order_by("id"):
+            expected = checked_out.get(hardware.id, 0)
+            if hardware.quantity_checked_out != expected:
+                violations.append(
+                    f"Hardware {hardware.id}: stored quantity_checked_out is "
+                    f"{hardware.quantity_checked_out}, expected {expected}"
+                )
+            if expected > hardware.quantity_available:
+                violations.append(
+                    f"Hardware {hardware.id}: oversold, {expected} checked out of "
+                    f"{hardware.quantity_available}"
+                )
+
+        stored_orders = defaultdict(dict)
+        statuses = {}
+        for order in Order.objects.filter(id__in=results.orders).annotate(
+            hardware_id=F("items__hardware_id"), quantity=F("items__quantity")
+        ):
+            statuses[order.id] = order.status
+            stored_orders[order.id][order.hardware_id] = (
+                stored_orders[order.id].get(order.hardware_id, 0) + order.quantity
+            )
+        for order_id, order in results.orders.items():
+            if stored_orders.get(order_id) != order:
+                violations.append(
+                    f"Order {order_id}: created with {order}, stored as "
+                    f"{stored_orders.get(order_id)}"
+                )
+            cancelled = order_id in results.cancelled_order_ids
+            if cancelled != (statuses.get(order_id) == "Cancelled"):
+                violations.append(
+                    f"Order {order_id}: status is {statuses.get(order_id)}, "
+                    f"{'' if cancelled else 'not '}cancelled by its team"
+                )
+        return violations
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:30
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_quantity_checked_out(apps, schema_editor):
+    Hardware = apps.get_model("hardware", "Hardware")
+    OrderItem = apps.get_model("hardware", "OrderItem")
+
+    checked_out = (
+        OrderItem.objects.exclude(part_returned_health="Healthy")
+        .exclude(order__status="Cancelled")
+        .values("hardware_id")
+        .annotate(count=Count("id"))
+        .values_list("hardware_id", "count")
+    )
+    for hardware_id, count in checked_out:
+        Hardware.objects.filter(id=hardware_id).update(quantity_checked_out=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hardware", "0011_alter_order_team"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="hardware",
+            name="quantity_checked_out",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_quantity_checked_out, migrations.RunPython.noop),
+    ]
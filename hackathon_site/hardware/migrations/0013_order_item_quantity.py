@@ -0,0 +1,170 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:08
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.migrations.exceptions import IrreversibleError
+import django.db.models.deletion
+import django.db.models.expressions
+
+RETURNED_HEALTH_FIELDS = {
+    "Healthy": "quantity_returned_healthy",
+    "Heavily Used": "quantity_returned_heavily_used",
+    "Broken": "quantity_returned_broken",
+    "Lost": "quantity_returned_lost",
+}
+
+
+def merge_order_items(apps, schema_editor):
+    """
+    Merge the order items of each order and hardware, which used to be one row
+    per unit, into a single row with a quantity and returned counts. Incidents
+    are moved to the merged row.
+    """
+    OrderItem = apps.get_model("hardware", "OrderItem")
+    Incident = apps.get_model("hardware", "Incident")
+
+    lines = {}
+    merged_ids = defaultdict(list)
+    for order_item in OrderItem.objects.order_by("id").iterator():
+        key = (order_item.order_id, order_item.hardware_id)
+        if key not in lines:
+            lines[key] = order_item
+            order_item.quantity = 0
+        else:
+            merged_ids[key].append(order_item.id)
+
+        line = lines[key]
+        line.quantity += 1
+        if order_item.part_returned_health:
+            field = RETURNED_HEALTH_FIELDS[order_item.part_returned_health]
+            setattr(line, field, getattr(line, field) + 1)
+
+    OrderItem.objects.bulk_update(
+        lines.values(), ["quantity", *RETURNED_HEALTH_FIELDS.values()], batch_size=500,
+    )
+    for key, ids in merged_ids.items():
+        Incident.objects.filter(order_item_id__in=ids).update(
+            order_item_id=lines[key].id
+        )
+        OrderItem.objects.filter(id__in=ids).delete()
+
+
+def split_order_items(apps, schema_editor):
+    """
+    Split every order item back into one row per unit, spreading its incidents
+    over the units. Each unit used to have at most one incident, so items with
+    more incidents than units can't be split.
+    """
+    OrderItem = apps.get_model("hardware", "OrderItem")
+    Incident = apps.get_model("hardware", "Incident")
+
+    crowded_ids = list(
+        OrderItem.objects.annotate(incident_count=models.Count("incidents"))
+        .filter(incident_count__gt=models.F("quantity"))
+        .values_list("id", flat=True)
+    )
+    if crowded_ids:
+        raise IrreversibleError(
+            "Order items %s have more incidents than units and can't be split back "
+            "into one row per unit." % ", ".join(map(str, crowded_ids))
+        )
+
+    for line in OrderItem.objects.order_by("id").iterator():
+        healths = []
+        for health, field in RETURNED_HEALTH_FIELDS.items():
+            healths += [health] * getattr(line, field)
+        healths += [None] * (line.quantity - len(healths))
+
+        line.part_returned_health = healths[0] if healths else None
+        line.save(update_fields=["part_returned_health"])
+        units = [line] + [
+            OrderItem.objects.create(
+                order_id=line.order_id,
+                hardware_id=line.hardware_id,
+                part_returned_health=health,
+            )
+            for health in healths[1:]
+        ]
+        for unit, incident in zip(
+            units, Incident.objects.filter(order_item_id=line.id).order_by("id")
+        ):
+            if unit is not line:
+                incident.order_item_id = unit.id
+                incident.save(update_fields=["order_item"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hardware", "0012_hardware_quantity_checked_out"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderitem",
+            name="quantity",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="quantity_returned_healthy",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="quantity_returned_heavily_used",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="quantity_returned_broken",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="quantity_returned_lost",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="incident",
+            name="order_item",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="incidents",
+                to="hardware.orderitem",
+            ),
+        ),
+        migrations.RunPython(merge_order_items, split_order_items),
+        migrations.RemoveField(model_name="orderitem", name="part_returned_health",),
+        migrations.AddConstraint(
+            model_name="orderitem",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    (
+                        "quantity__gte",
+                        django.db.models.expressions.CombinedExpression(
+                            django.db.models.expressions.CombinedExpression(
+                                django.db.models.expressions.CombinedExpression(
+                                    django.db.models.expressions.F(
+                                        "quantity_returned_healthy"
+                                    ),
+                                    "+",
+                                    django.db.models.expressions.F(
+                                        "quantity_returned_heavily_used"
+                                    ),
+                                ),
+                                "+",
+                                django.db.models.expressions.F(
+                                    "quantity_returned_broken"
+                                ),
+                            ),
+                            "+",
+                            django.db.models.expressions.F("quantity_returned_lost"),
+                        ),
+                    )
+                ),
+                name="order_item_returned_lte_quantity",
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:26
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Must match Hardware.SEARCH_CONFIG and the weights documented on
+# Hardware.search_document
+CREATE_SEARCH_DOCUMENT_TRIGGER = """
+CREATE FUNCTION hardware_search_document_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_document :=
+        setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A')
+        || setweight(
+            to_tsvector(
+                'simple',
+                coalesce(NEW.model_number, '') || ' ' || coalesce(NEW.manufacturer, '')
+            ),
+            'B'
+        )
+        || setweight(to_tsvector('simple', coalesce(NEW.notes, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER hardware_search_document_update
+BEFORE INSERT OR UPDATE OF name, model_number, manufacturer, notes, search_document
+ON hardware_hardware
+FOR EACH ROW EXECUTE FUNCTION hardware_search_document_update();
+
+UPDATE hardware_hardware SET search_document = NULL;
+
+CREATE INDEX hardware_search_document_idx ON hardware_hardware
+USING gin (search_document);
+"""
+
+DROP_SEARCH_DOCUMENT_TRIGGER = """
+DROP INDEX hardware_search_document_idx;
+DROP TRIGGER hardware_search_document_update ON hardware_hardware;
+DROP FUNCTION hardware_search_document_update();
+"""
+
+
+def create_search_document_trigger(apps, schema_editor):
+    # Full-text search is specific to PostgreSQL, other databases leave the
+    # search document empty and fall back to unindexed searches
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_SEARCH_DOCUMENT_TRIGGER)
+
+
+def drop_search_document_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEARCH_DOCUMENT_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hardware", "0013_order_item_quantity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="hardware",
+            name="search_document",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(
+            create_search_document_trigger, drop_search_document_trigger
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:32
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hardware", "0014_hardware_search_document"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["team", "status"], name="order_team_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(
+                fields=["hardware", "order"], name="order_item_hardware_order_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(
+                condition=models.Q(
+                    (
+                        "quantity__gt",
+                        django.db.models.expressions.CombinedExpression(
+                            django.db.models.expressions.CombinedExpression(
+                                django.db.models.expressions.CombinedExpression(
+                                    django.db.models.expressions.F(
+                                        "quantity_returned_healthy"
+                                    ),
+                                    "+",
+                                    django.db.models.expressions.F(
+                                        "quantity_returned_heavily_used"
+                                    ),
+                                ),
+                                "+",
+                                django.db.models.expressions.F(
+                                    "quantity_returned_broken"
+                                ),
+                            ),
+                            "+",
+                            django.db.models.expressions.F("quantity_returned_lost"),
+                        ),
+                    )
+                ),
+                fields=["order", "hardware"],
+                name="order_item_outstanding_idx",
+            ),
+        ),
+    ]
@@ -1,13 +1,45 @@
+from functools import reduce
+from operator import add
+
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.db.models import Count, F, Q
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 
 from event.models import Team as TeamEvent
+from hackathon_site.cache import VersionedCache
+
+# Cached responses of the hardware list and detail APIs. Invalidated whenever
+# hardware, categories or stock change, see hardware/signals.py.
+hardware_catalog_cache = VersionedCache("hardware:catalog")
+# Cached responses of the category list API. Invalidated whenever categories or
+# the hardware in them change, see hardware/signals.py.
+category_list_cache = VersionedCache("hardware:categories")
+
+
+def team_holdings_cache(team_id):
+    """
+    Cached holdings of a team. Invalidated whenever the team's orders or their
+    items change, see hardware/signals.py and return_order_items.
+    """
+    return VersionedCache(f"hardware:team_holdings:{team_id}")
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_hardware_count(self):
+        """
+        Annotate each category with the number of hardware in it, counted in the
+        same query.
+        """
+        return self.annotate(unique_hardware_count=Count("hardware"))
 
 
 class Category(models.Model):
     class Meta:
         verbose_name_plural = "categories"
 
+    objects = CategoryQuerySet.as_manager()
+
     name = models.CharField(max_length=255, null=False)
     max_per_team = models.IntegerField(null=True)
 
@@ -23,20 +55,55 @@ class AnnotatedHardwareManager(models.Manager):
         return (
             super()
             .get_queryset()
-            .annotate(
-                quantity_checked_out=Count(
-                    "order_items",
-                    filter=(
-                        ~Q(order_items__part_returned_health="Healthy")
-                        & ~Q(order_items__order__status="Cancelled")
-                    ),
-                    distinct=True,
-                )
-            )
             .annotate(
                 quantity_remaining=(F("quantity_available") - F("quantity_checked_out"))
             )
+            # Only used to search, there is no need to load it
+            .defer("search_document")
+        )
+
+    def update_quantity_checked_out(self, deltas):
+        """
+        Apply a mapping of {hardware_id: delta} to the stored quantity_checked_out
+        counters in a single UPDATE.
+
+        The new value is computed by the database from the current column value,
+        so concurrent adjustments never overwrite each other.
+        """
+        deltas = {hardware_id: delta for hardware_id, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+
+        hardware_catalog_cache.invalidate()
+        return self.filter(id__in=deltas.keys()).update(
+            quantity_checked_out=F("quantity_checked_out")
+            + Case(
+                *(
+                    When(id=hardware_id, then=Value(delta))
+                    for hardware_id, delta in deltas.items()
+                ),
+                default=Value(0),
+                output_field=models.IntegerField(),
+            )
+        )
+
+    def compute_quantity_checked_out(self):
+        """
+        Count the units currently checked out for each hardware, straight from the
+        order items. This is the source of truth for the stored
+        quantity_checked_out counters.
+
+        Returns a dictionary of {hardware_id: quantity_checked_out}, excluding
+        hardware with nothing checked out.
+        """
+        checked_out = (
+            OrderItem.objects.exclude(order__status="Cancelled")
+            .values("hardware_id")
+            .annotate(count=Sum(F("quantity") - F("quantity_returned_healthy")))
+            .filter(count__gt=0)
+            .values_list("hardware_id", "count")
         )
+        return dict(checked_out)
 
 
 class Hardware(models.Model):
@@ -46,7 +113,7 @@ class Hardware(models.Model):
         verbose_name_plural = "hardware"
 
     class Config:
-        annotated_fields = ("quantity_checked_out", "quantity_remaining")
+        annotated_fields = ("quantity_remaining",)
 
     name = models.CharField(max_length=255, null=False)
     model_number = models.CharField(max_length=255, null=True, blank=True)
@@ -60,6 +127,14 @@ class Hardware(models.Model):
     )
     image_url = models.CharField(max_length=500, null=True, blank=True)
     categories = models.ManyToManyField(Category)
+    # Number of units that are part of a non-cancelled order and have not been
+    # returned in a healthy condition. Maintained by the order and return flows,
+    # see hardware.signals and the reconcile_hardware_stock management command.
+    quantity_checked_out = models.IntegerField(default=0, null=False, editable=False)
+    # Full-text search document of the name (weighted A), model number and
+    # manufacturer (B) and notes (C). On PostgreSQL, it is kept up to date by a
+    # trigger and indexed, see migration 0014. It is always empty elsewhere.
+    search_document = SearchVectorField(null=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True, null=False)
     updated_at = models.DateTimeField(auto_now=True, null=False)
@@ -78,26 +153,167 @@ class Hardware(models.Model):
     def __str__(self):
         return f"{self.name} | {self.manufacturer}"
 
+    # Text search configuration of search_document. The simple configuration
+    # doesn't stem or drop words, which suits part names and model numbers.
+    SEARCH_CONFIG = "simple"
+
+
+class OrderItemQuerySet(models.QuerySet):
+    def unreturned(self):
+        """
+        Order items with units that have not been returned yet, annotated with
+        their quantity_unreturned.
+        """
+        quantity_returned = OrderItem.quantity_returned_expression()
+        # Filtered in the same form as the condition of order_item_outstanding_idx,
+        # so that the database can use the index
+        return self.filter(quantity__gt=quantity_returned).annotate(
+            quantity_unreturned=F("quantity") - quantity_returned
+        )
+
+    def holdings(self):
+        """
+        Group the order items by hardware, with the number of units waiting to be
+        picked up, checked out, and returned in each condition. Items of cancelled
+        orders are left out.
+        """
+        unreturned = F("quantity") - OrderItem.quantity_returned_expression()
+        pending = Q(order__status__in=Order.PENDING_STATUSES)
+
+        def total(expression, **kwargs):
+            return Coalesce(
+                Sum(expression, **kwargs), 0, output_field=models.IntegerField()
+            )
+
+        return (
+            self.exclude(order__status="Cancelled")
+            .values("hardware_id")
+            .annotate(
+                pending=total(unreturned, filter=pending),
+                checked_out=total(unreturned, filter=~pending),
+                # e.g. returned_healthy, as quantity_returned_healthy is taken
+                **{
+                    field[len("quantity_") :]: total(field)
+                    for field in OrderItem.RETURNED_HEALTH_FIELDS.values()
+                },
+            )
+            .order_by("hardware_id")
+        )
+
 
 class OrderItem(models.Model):
+    """
+    A line of an order: some quantity of a single hardware, and how many of those
+    units have been returned in each condition.
+    """
+
     HEALTH_CHOICES = [
         ("Healthy", "Healthy"),
         ("Heavily Used", "Heavily Used"),
         ("Broken", "Broken"),
         ("Lost", "Lost"),
     ]
+    # The field counting the units returned with each health
+    RETURNED_HEALTH_FIELDS = {
+        "Healthy": "quantity_returned_healthy",
+        "Heavily Used": "quantity_returned_heavily_used",
+        "Broken": "quantity_returned_broken",
+        "Lost": "quantity_returned_lost",
+    }
+
+    objects = OrderItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=Q(
+                    quantity__gte=(
+                        F("quantity_returned_healthy")
+                        + F("quantity_returned_heavily_used")
+                        + F("quantity_returned_broken")
+                        + F("quantity_returned_lost")
+                    )
+                ),
+                name="order_item_returned_lte_quantity",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["hardware", "order"], name="order_item_hardware_order_idx"
+            ),
+            # Order items with units that have not been returned yet, see
+            # OrderItemQuerySet.unreturned()
+            models.Index(
+                fields=["order", "hardware"],
+                condition=Q(
+                    quantity__gt=(
+                        F("quantity_returned_healthy")
+                        + F("quantity_returned_heavily_used")
+                        + F("quantity_returned_broken")
+                        + F("quantity_returned_lost")
+                    )
+                ),
+                name="order_item_outstanding_idx",
+            ),
+        ]
+
     order = models.ForeignKey(
         "Order", null=False, on_delete=models.CASCADE, related_name="items"
     )
     hardware = models.ForeignKey(
         Hardware, null=False, on_delete=models.CASCADE, related_name="order_items"
     )
-    part_returned_health = models.CharField(
-        max_length=64, choices=HEALTH_CHOICES, null=True, blank=True
-    )
+    quantity = models.PositiveIntegerField(default=1, null=False)
+    quantity_returned_healthy = models.PositiveIntegerField(default=0, null=False)
+    quantity_returned_heavily_used = models.PositiveIntegerField(default=0, null=False)
+    quantity_returned_broken = models.PositiveIntegerField(default=0, null=False)
+    quantity_returned_lost = models.PositiveIntegerField(default=0, null=False)
+
+    @classmethod
+    def quantity_returned_expression(cls):
+        return reduce(add, (F(field) for field in cls.RETURNED_HEALTH_FIELDS.values()))
+
+    @property
+    def quantity_returned(self):
+        return sum(
+            getattr(self, field) for field in self.RETURNED_HEALTH_FIELDS.values()
+        )
+
+    def stock_consumed(self, order_status=None):
+        """
+        How many units of this item count towards its hardware's
+        quantity_checked_out. Units which have been returned healthy go back into
+        stock, and items in cancelled orders were never handed out.
+        """
+        if order_status is None:
+            order_status = self.order.status
+        if order_status == "Cancelled":
+            return 0
+        return self.quantity - self.quantity_returned_healthy
+
+    @property
+    def part_returned_health(self):
+        """
+        The health the returned units of this item came back in, the worst one if
+        they differ. None while no unit has been returned.
+        """
+        for health, field in reversed(self.RETURNED_HEALTH_FIELDS.items()):
+            if getattr(self, field):
+                return health
+        return None
+
+    def get_units(self):
+        """
+        The health of every unit of this item, None for units which have not been
+        returned.
+        """
+        units = []
+        for health, field in self.RETURNED_HEALTH_FIELDS.items():
+            units += [health] * getattr(self, field)
+        return units + [None] * (self.quantity - len(units))
 
     def __str__(self):
-        return f"{self.id} | {self.hardware.name} | Team {self.order.team.team_code if self.order.team else None}"
+        return f"{self.id} | {self.quantity} x {self.hardware.name} | Team {self.order.team.team_code if self.order.team else None}"
 
 
 class Order(models.Model):
@@ -108,6 +324,13 @@ class Order(models.Model):
         ("Cancelled", "Cancelled"),
         ("Returned", "Returned"),
     ]
+    # Orders with hardware that has not been handed out yet
+    PENDING_STATUSES = ("Submitted", "Ready for Pickup")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["team", "status"], name="order_team_status_idx")
+        ]
 
     hardware = models.ManyToManyField(Hardware, through=OrderItem)
     team = models.ForeignKey(TeamEvent, on_delete=models.SET_NULL, null=True)
@@ -135,8 +358,8 @@ class Incident(models.Model):
     state = models.CharField(max_length=64, choices=STATE_CHOICES, null=False)
     time_occurred = models.DateTimeField(auto_now=False, auto_now_add=False, null=False)
     description = models.TextField(null=False)
-    order_item = models.OneToOneField(
-        OrderItem, related_name="incident", null=False, on_delete=models.CASCADE
+    order_item = models.ForeignKey(
+        OrderItem, related_name="incidents", null=False, on_delete=models.CASCADE
     )
 
     created_at = models.DateTimeField(auto_now_add=True, null=False)
@@ -1,14 +1,23 @@
-from collections import Counter
-import functools
+from collections import Counter, defaultdict
 from datetime import datetime
 
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Sum
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.conf import settings
+from drf_yasg.utils import swagger_serializer_method
 from rest_framework import serializers
 
-from event.models import Profile
-from hardware.models import Hardware, Category, OrderItem, Order, Incident
+from event.models import Profile, Team
+from event.permissions import get_permission_snapshot
+from hardware.models import (
+    Hardware,
+    Category,
+    OrderItem,
+    Order,
+    Incident,
+    team_holdings_cache,
+)
 
 
 class HardwareSerializer(serializers.ModelSerializer):
@@ -41,13 +50,28 @@ class CategorySerializer(serializers.ModelSerializer):
 
     @staticmethod
     def get_unique_hardware_count(obj: Category) -> int:
-        return obj.hardware_set.annotate(Count("id", distinct=True)).count()
+        # Annotated by Category.objects.with_hardware_count() in list views
+        if hasattr(obj, "unique_hardware_count"):
+            return obj.unique_hardware_count
+        return obj.hardware_set.count()
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    part_returned_health = serializers.CharField(read_only=True, allow_null=True)
+
     class Meta:
         model = OrderItem
-        fields = ("id", "hardware", "order", "part_returned_health")
+        fields = (
+            "id",
+            "hardware",
+            "order",
+            "part_returned_health",
+            "quantity",
+            "quantity_returned_healthy",
+            "quantity_returned_heavily_used",
+            "quantity_returned_broken",
+            "quantity_returned_lost",
+        )
 
 
 class IncidentCreateSerializer(serializers.ModelSerializer):
@@ -98,14 +122,38 @@ class IncidentPatchSerializer(serializers.ModelSerializer):
         return obj.order_item.order.team.id if obj.order_item.order.team else None
 
 
-class OrderItemInOrderSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = OrderItem
-        fields = (
-            "id",
-            "hardware_id",
-            "part_returned_health",
-        )
+class OrderItemInOrderSerializer(serializers.Serializer):
+    """
+    A single unit of an order item. The items of an order are listed one unit at
+    a time, keyed by the id of the order item they are part of and their position
+    in it.
+    """
+
+    id = serializers.CharField()
+    order_item_id = serializers.IntegerField()
+    hardware_id = serializers.IntegerField()
+    part_returned_health = serializers.CharField(allow_null=True)
+
+
+class TeamHoldingSerializer(serializers.Serializer):
+    """
+    The units of a hardware held by a team, as grouped by
+    OrderItemQuerySet.holdings().
+    """
+
+    hardware_id = serializers.IntegerField()
+    quantity_pending = serializers.IntegerField(
+        source="pending", help_text="Units in orders that have not been picked up."
+    )
+    quantity_checked_out = serializers.IntegerField(
+        source="checked_out", help_text="Units picked up and not returned yet."
+    )
+    quantity_returned_healthy = serializers.IntegerField(source="returned_healthy")
+    quantity_returned_heavily_used = serializers.IntegerField(
+        source="returned_heavily_used"
+    )
+    quantity_returned_broken = serializers.IntegerField(source="returned_broken")
+    quantity_returned_lost = serializers.IntegerField(source="returned_lost")
 
 
 class OrderItemListSerializer(serializers.ModelSerializer):
@@ -114,6 +162,7 @@ class OrderItemListSerializer(serializers.ModelSerializer):
 
     created_at = serializers.CharField(source="order.created_at")
     updated_at = serializers.CharField(source="order.updated_at")
+    part_returned_health = serializers.CharField(read_only=True, allow_null=True)
 
     class Meta:
         model = OrderItem
@@ -124,6 +173,11 @@ class OrderItemListSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "part_returned_health",
+            "quantity",
+            "quantity_returned_healthy",
+            "quantity_returned_heavily_used",
+            "quantity_returned_broken",
+            "quantity_returned_lost",
             "hardware",
         )
 
@@ -137,7 +191,7 @@ class OrderItemListSerializer(serializers.ModelSerializer):
 
 
 class OrderListSerializer(serializers.ModelSerializer):
-    items = OrderItemInOrderSerializer(many=True, read_only=True)
+    items = serializers.SerializerMethodField()
     team_code = serializers.SerializerMethodField()
 
     class Meta:
@@ -157,6 +211,20 @@ class OrderListSerializer(serializers.ModelSerializer):
     def get_team_code(obj: Order):
         return obj.team.team_code if obj.team else None
 
+    @staticmethod
+    @swagger_serializer_method(OrderItemInOrderSerializer(many=True))
+    def get_items(obj: Order):
+        return [
+            {
+                "id": f"{order_item.id}-{unit}",
+                "order_item_id": order_item.id,
+                "hardware_id": order_item.hardware_id,
+                "part_returned_health": health,
+            }
+            for order_item in obj.items.all()
+            for unit, health in enumerate(order_item.get_units())
+        ]
+
 
 class OrderChangeSerializer(OrderListSerializer):
     change_options = {
@@ -191,6 +259,12 @@ class OrderChangeSerializer(OrderListSerializer):
             )
         return data
 
+    def update(self, instance, validated_data):
+        # Cancelling an order puts its items back into stock, which is done by
+        # hardware.signals when the order is saved. Keep both in one transaction.
+        with transaction.atomic():
+            return super().update(instance, validated_data)
+
 
 class TeamOrderChangeSerializer(OrderChangeSerializer):
     change_options = {
@@ -198,11 +272,40 @@ class TeamOrderChangeSerializer(OrderChangeSerializer):
     }
 
 
+def resolve_hardware_requests(hardware_requests, queryset):
+    """
+    Replace the hardware id in each request with its Hardware object from queryset,
+    loading all of them in a single query. Ids that don't exist get the same errors
+    as a PrimaryKeyRelatedField on each request.
+    """
+    hardware_ids = {hardware_request["id"] for hardware_request in hardware_requests}
+    hardware_by_id = {
+        hardware.id: hardware for hardware in queryset.filter(id__in=hardware_ids)
+    }
+
+    does_not_exist = serializers.PrimaryKeyRelatedField.default_error_messages[
+        "does_not_exist"
+    ]
+    errors = [
+        {}
+        if hardware_request["id"] in hardware_by_id
+        else {"id": [does_not_exist.format(pk_value=hardware_request["id"])]}
+        for hardware_request in hardware_requests
+    ]
+    if any(errors):
+        raise serializers.ValidationError(errors)
+
+    return [
+        {**hardware_request, "id": hardware_by_id[hardware_request["id"]]}
+        for hardware_request in hardware_requests
+    ]
+
+
 class OrderCreateSerializer(serializers.Serializer):
     class OrderCreateHardwareSerializer(serializers.Serializer):
-        id = serializers.PrimaryKeyRelatedField(
-            queryset=Hardware.objects.all(), many=False, required=True
-        )
+        # Resolved to a Hardware object for the whole cart at once in
+        # validate_hardware, instead of one query per item
+        id = serializers.IntegerField(required=True)
         quantity = serializers.IntegerField(required=True)
 
     hardware = OrderCreateHardwareSerializer(many=True, required=True)
@@ -213,18 +316,30 @@ class OrderCreateSerializer(serializers.Serializer):
         # with key value pairs
         # "id": <Hardware Object>, and
         # "quantity": <Int>
-        return functools.reduce(
-            lambda x, y: x + y,
-            [Counter({e["id"]: e["quantity"]}) for e in hardware_requests],
-            Counter(),
+        requested_hardware = Counter()
+        for hardware_request in hardware_requests:
+            requested_hardware[hardware_request["id"]] += hardware_request["quantity"]
+        # Drop hardware with a total quantity of zero or less
+        return +requested_hardware
+
+    def validate_hardware(self, hardware_requests):
+        """
+        Load and lock the requested hardware. The rows stay locked until the order
+        is created, so that concurrent orders can't both take the last items in
+        stock. Rows are locked in order of id to avoid deadlocks between orders.
+        This must be run in a transaction.
+        """
+        return resolve_hardware_requests(
+            hardware_requests,
+            Hardware.objects.select_for_update()
+            .order_by("id")
+            .prefetch_related("categories"),
         )
 
     # check that the requests are within per-team constraints
     def validate(self, data):
-        if (
-            not self.context["request"]
-            .user.groups.filter(name=settings.TEST_USER_GROUP)
-            .exists()
+        if not get_permission_snapshot(self.context["request"].user).in_group(
+            settings.TEST_USER_GROUP
         ):
             # time restrictions
             if datetime.now(settings.TZ_INFO) < settings.HARDWARE_SIGN_OUT_START_DATE:
@@ -251,27 +366,38 @@ class OrderCreateSerializer(serializers.Serializer):
         requested_hardware = self.merge_requests(hardware_requests=data["hardware"])
         if not requested_hardware:
             raise serializers.ValidationError("No hardware submitted")
-        hardware_query = (
-            Hardware.objects.filter(
-                id__in=[hardware.id for hardware in requested_hardware.keys()],
+
+        # Team usage per hardware and per category, each in a single query
+        team_unreturned_items = (
+            OrderItem.objects.filter(order__team=user_profile.team)
+            .exclude(order__status="Cancelled")
+            .unreturned()
+        )
+        team_hardware_counts = dict(
+            team_unreturned_items.filter(
+                hardware_id__in=[hardware.id for hardware in requested_hardware]
             )
-            .all()
-            .prefetch_related("categories", "order_items")
+            .values("hardware_id")
+            .annotate(count=Sum("quantity_unreturned"))
+            .values_list("hardware_id", "count")
         )
-        team_unreturned_orders = hardware_query.annotate(
-            past_order_count=Count(
-                "order_items",
-                filter=Q(order_items__part_returned_health__isnull=True)
-                & ~Q(order_items__order__status="Cancelled")
-                & Q(order_items__order__team=user_profile.team),
-                distinct=True,
+        categories = {
+            category.id: category
+            for hardware in requested_hardware
+            for category in hardware.categories.all()
+        }
+        category_counts = Counter(
+            dict(
+                team_unreturned_items.filter(hardware__categories__in=categories)
+                .values("hardware__categories")
+                .annotate(count=Sum("quantity_unreturned"))
+                .values_list("hardware__categories", "count")
             )
         )
-        category_counts = dict()
+
         error_messages = []
         for (hardware, requested_quantity) in requested_hardware.items():
-            team_hardware = team_unreturned_orders.get(id=hardware.id)
-            team_hardware_count = getattr(team_hardware, "past_order_count", 0)
+            team_hardware_count = team_hardware_counts.get(hardware.id, 0)
             if hardware.quantity_remaining - requested_quantity < 0:
                 error_messages.append(
                     f"Unable to order Hardware {hardware.name} because there are not enough items in stock"
@@ -283,12 +409,9 @@ class OrderCreateSerializer(serializers.Serializer):
                     )
                 )
             for category in hardware.categories.all():
-                category_counts[category] = (
-                    category_counts.get(category, 0)
-                    + team_hardware_count
-                    + requested_quantity
-                )
-        for (category, count) in category_counts.items():
+                category_counts[category.id] += requested_quantity
+        for (category_id, count) in category_counts.items():
+            category = categories[category_id]
             if count > category.max_per_team:
                 error_messages.append(
                     "Maximum number of items for the Category {} is reached (limit of {} items per team)".format(
@@ -336,10 +459,9 @@ class OrderCreateSerializer(serializers.Serializer):
                     request=serialized_requested_hardware,
                 )
                 response_data["order_id"] = new_order.id
-            order_items += [
-                OrderItem(order=new_order, hardware=hardware)
-                for _ in range(num_order_items)
-            ]
+            order_items.append(
+                OrderItem(order=new_order, hardware=hardware, quantity=num_order_items)
+            )
             response_data["hardware"].append(
                 {"hardware_id": hardware.id, "quantity_fulfilled": num_order_items}
             )
@@ -354,20 +476,20 @@ class OrderCreateSerializer(serializers.Serializer):
                 )
         if order_items:
             OrderItem.objects.bulk_create(order_items)
+            # bulk_create does not send signals, so update the stock here
+            Hardware.objects.update_quantity_checked_out(
+                {item.hardware_id: item.quantity for item in order_items}
+            )
         return response_data
 
 
 class OrderCreateResponseSerializer(serializers.Serializer):
     class OrderCreateResponseQuantitySerializer(serializers.Serializer):
-        hardware_id = serializers.PrimaryKeyRelatedField(
-            queryset=Hardware.objects.all(), many=False, required=True
-        )
+        hardware_id = serializers.IntegerField(required=True)
         quantity_fulfilled = serializers.IntegerField(required=True)
 
     class OrderCreateResponseErrorSerializer(serializers.Serializer):
-        hardware_id = serializers.PrimaryKeyRelatedField(
-            queryset=Hardware.objects.all(), many=False, required=True
-        )
+        hardware_id = serializers.IntegerField(required=True)
         message = serializers.CharField(
             max_length=None, min_length=None, allow_blank=False
         )
@@ -382,17 +504,19 @@ class OrderCreateResponseSerializer(serializers.Serializer):
 class OrderItemReturnSerializer(serializers.Serializer):
     class HardwareItemReturnSerializer(serializers.Serializer):
         HEALTH_CHOICES = ["Healthy", "Heavily Used", "Broken", "Lost"]
-        id = serializers.PrimaryKeyRelatedField(
-            queryset=Hardware.objects.all(), many=False, required=True
-        )
+        # Resolved to a Hardware object for all items at once in validate_hardware
+        id = serializers.IntegerField(required=True)
         quantity = serializers.IntegerField(required=True)
         part_returned_health = serializers.CharField(max_length=64, required=True)
 
     hardware = HardwareItemReturnSerializer(many=True, required=True)
     order = serializers.PrimaryKeyRelatedField(
-        queryset=Order.objects.all(), many=False, required=True
+        queryset=Order.objects.all().select_related("team"), many=False, required=True,
     )
 
+    def validate_hardware(self, hardware_requests):
+        return resolve_hardware_requests(hardware_requests, Hardware.objects.all())
+
     def validate(self, data):
         # get array of hardware and order id from data parameter
         hardware_array = data["hardware"]
@@ -401,91 +525,302 @@ class OrderItemReturnSerializer(serializers.Serializer):
         return data
 
     def create(self, validated_data):
-        hardware = validated_data["hardware"]
-        order = validated_data["order"]
-        order_items_in_order = OrderItem.objects.filter(order=order)
-
-        response_data = {
-            "order_id": order.id,
-            "returned_items": [],
-            "team_code": order.team.team_code,
-            "errors": [],
+        return return_order_items(
+            [(validated_data["order"], validated_data["hardware"])]
+        )[0]
+
+
+class OrderItemBatchReturnSerializer(serializers.Serializer):
+    class OrderReturnSerializer(serializers.Serializer):
+        # Resolved to Order and Hardware objects for all returns at once in
+        # validate_orders
+        order = serializers.IntegerField(required=True)
+        hardware = OrderItemReturnSerializer.HardwareItemReturnSerializer(
+            many=True, required=True
+        )
+
+    class TeamReturnSerializer(serializers.Serializer):
+        team_code = serializers.CharField(required=True)
+        part_returned_health = serializers.ChoiceField(
+            choices=OrderItemReturnSerializer.HardwareItemReturnSerializer.HEALTH_CHOICES,
+            required=True,
+        )
+
+    orders = OrderReturnSerializer(many=True, required=False)
+    teams = TeamReturnSerializer(many=True, required=False)
+
+    def validate_orders(self, order_returns):
+        orders_by_id = Order.objects.select_related("team").in_bulk(
+            {order_return["order"] for order_return in order_returns}
+        )
+        hardware_by_id = Hardware.objects.in_bulk(
+            {
+                hardware_request["id"]
+                for order_return in order_returns
+                for hardware_request in order_return["hardware"]
+            }
+        )
+
+        does_not_exist = serializers.PrimaryKeyRelatedField.default_error_messages[
+            "does_not_exist"
+        ]
+        errors = []
+        for order_return in order_returns:
+            error = {}
+            if order_return["order"] not in orders_by_id:
+                error["order"] = [does_not_exist.format(pk_value=order_return["order"])]
+            if len(order_return["hardware"]) < 1:
+                error["hardware"] = ["No hardware specified in return request"]
+            hardware_errors = [
+                {}
+                if hardware_request["id"] in hardware_by_id
+                else {"id": [does_not_exist.format(pk_value=hardware_request["id"])]}
+                for hardware_request in order_return["hardware"]
+            ]
+            if any(hardware_errors):
+                error["hardware"] = hardware_errors
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return [
+            {
+                "order": orders_by_id[order_return["order"]],
+                "hardware": [
+                    {**hardware_request, "id": hardware_by_id[hardware_request["id"]]}
+                    for hardware_request in order_return["hardware"]
+                ],
+            }
+            for order_return in order_returns
+        ]
+
+    def validate_teams(self, team_returns):
+        teams_by_code = {
+            team.team_code: team
+            for team in Team.objects.filter(
+                team_code__in=[team_return["team_code"] for team_return in team_returns]
+            )
         }
 
-        for hardware_item in hardware:
-            if (
-                hardware_item["part_returned_health"]
-                not in OrderItemReturnSerializer.HardwareItemReturnSerializer.HEALTH_CHOICES
-            ):
-                response_data["errors"].append(
-                    {
-                        "hardware_id": hardware_item["id"].id,
-                        "message": f"Invalid part health return status for hardware item {hardware_item['id'].name}",
-                    }
-                )
-                continue
+        errors = [
+            {}
+            if team_return["team_code"] in teams_by_code
+            else {"team_code": [f"Team {team_return['team_code']} does not exist."]}
+            for team_return in team_returns
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
 
-            order_items_with_hardware = list(
-                order_items_in_order.filter(
-                    hardware=hardware_item["id"], part_returned_health__isnull=True
-                )
+        return [
+            {**team_return, "team": teams_by_code[team_return["team_code"]]}
+            for team_return in team_returns
+        ]
+
+    def validate(self, data):
+        if not data.get("orders") and not data.get("teams"):
+            raise ValidationError("No orders or teams specified in return request")
+        return data
+
+    def create(self, validated_data):
+        order_returns = [
+            (order_return["order"], order_return["hardware"])
+            for order_return in validated_data.get("orders", [])
+        ]
+
+        # Return everything still checked out by the teams, across all of their
+        # orders which weren't cancelled
+        health_by_team_id = {
+            team_return["team"].id: team_return["part_returned_health"]
+            for team_return in validated_data.get("teams", [])
+        }
+        team_orders = (
+            Order.objects.filter(
+                Exists(OrderItem.objects.filter(order=OuterRef("pk")).unreturned()),
+                team_id__in=health_by_team_id.keys(),
+            )
+            .exclude(status="Cancelled")
+            .select_related("team")
+            .order_by("id")
+        )
+        full_returns = [
+            (order, health_by_team_id[order.team_id]) for order in team_orders
+        ]
+
+        return {"results": return_order_items(order_returns, full_returns)}
+
+
+def return_order_items(order_returns, full_returns=()):
+    """
+    Mark checked out order items as returned, for any number of orders at once.
+    This must be run in a transaction.
+
+    order_returns is a list of (order, hardware_requests) pairs, with the hardware
+    requests as validated by OrderItemReturnSerializer. full_returns is a list of
+    (order, part_returned_health) pairs, returning everything still checked out in
+    the order with the given health.
+
+    Every order item of the orders with units still checked out is fetched in one
+    query, and all of the returns are written with one bulk_update. Returns one
+    summary per order, in the format of OrderItemReturnResponseSerializer.
+    """
+    orders = [order for order, _ in order_returns] + [
+        order for order, _ in full_returns
+    ]
+
+    # Fetch every item with units still checked out in the orders at once,
+    # grouped by order and hardware. Items are taken off these lists once all of
+    # their units are returned.
+    checked_out_order_items = defaultdict(list)
+    for order_item in (
+        OrderItem.objects.filter(order__in=orders)
+        .unreturned()
+        .select_related("hardware")
+        .select_for_update(of=("self",))
+        .order_by("id")
+    ):
+        checked_out_order_items[(order_item.order_id, order_item.hardware_id)].append(
+            order_item
+        )
+    # {order_item_id: order_item} of the items with returned units
+    returned_order_items = {}
+    # {hardware_id: number of units} returned healthy in orders which are not
+    # cancelled, so go back into stock
+    stock_deltas = Counter()
+    order_statuses = {order.id: order.status for order in orders}
+
+    def return_units(order_item, quantity, part_returned_health):
+        field = OrderItem.RETURNED_HEALTH_FIELDS[part_returned_health]
+        setattr(order_item, field, getattr(order_item, field) + quantity)
+        order_item.quantity_unreturned -= quantity
+        returned_order_items[order_item.id] = order_item
+        if (
+            part_returned_health == "Healthy"
+            and order_statuses[order_item.order_id] != "Cancelled"
+        ):
+            stock_deltas[order_item.hardware_id] -= quantity
+
+    results = [
+        _return_order(order, hardware_requests, checked_out_order_items, return_units)
+        for order, hardware_requests in order_returns
+    ]
+    for order, part_returned_health in full_returns:
+        hardware_requests = [
+            {
+                "id": order_items[0].hardware,
+                "quantity": sum(item.quantity_unreturned for item in order_items),
+                "part_returned_health": part_returned_health,
+            }
+            for (order_id, _), order_items in checked_out_order_items.items()
+            if order_id == order.id and order_items
+        ]
+        results.append(
+            _return_order(
+                order, hardware_requests, checked_out_order_items, return_units
             )
-            num_checked_out_order_items = len(order_items_with_hardware)
+        )
 
-            if num_checked_out_order_items == 0 and hardware_item["quantity"] > 0:
-                response_data["errors"].append(
-                    {
-                        "hardware_id": hardware_item["id"].id,
-                        "message": f"There are no checked out items for hardware item {hardware_item['id'].name} for order #{order}.",
-                    }
-                )
+    if returned_order_items:
+        OrderItem.objects.bulk_update(
+            returned_order_items.values(), OrderItem.RETURNED_HEALTH_FIELDS.values()
+        )
+        # bulk_update does not send signals, so update the stock and invalidate
+        # the holdings of the teams here
+        Hardware.objects.update_quantity_checked_out(stock_deltas)
+        for team_id in {order.team_id for order in orders}:
+            team_holdings_cache(team_id).invalidate()
+
+    return results
+
+
+def _return_order(order, hardware_requests, checked_out_order_items, return_units):
+    """
+    Return the requested units of a single order, calling
+    return_units(order_item, quantity, part_returned_health) for each order item
+    they are taken from. Order items are taken off checked_out_order_items once
+    all of their units are returned.
+    """
+    response_data = {
+        "order_id": order.id,
+        "returned_items": [],
+        "team_code": order.team.team_code,
+        "errors": [],
+    }
 
-            max_available_quantity = hardware_item["quantity"]
-            if num_checked_out_order_items < hardware_item["quantity"]:
-                max_available_quantity = num_checked_out_order_items
-                if num_checked_out_order_items > 0:
-                    response_data["errors"].append(
-                        {
-                            "hardware_id": hardware_item["id"].id,
-                            "message": f"Requested quantity of {hardware_item['quantity']} for hardware {hardware_item['id'].name} was higher than available. {max_available_quantity} {'was' if max_available_quantity == 1 else 'were'} returned.",
-                        }
-                    )
+    for hardware_item in hardware_requests:
+        if (
+            hardware_item["part_returned_health"]
+            not in OrderItemReturnSerializer.HardwareItemReturnSerializer.HEALTH_CHOICES
+        ):
+            response_data["errors"].append(
+                {
+                    "hardware_id": hardware_item["id"].id,
+                    "message": f"Invalid part health return status for hardware item {hardware_item['id'].name}",
+                }
+            )
+            continue
 
-            for quantity_idx in range(max_available_quantity):
-                order_items_with_hardware[
-                    quantity_idx
-                ].part_returned_health = hardware_item["part_returned_health"]
-                order_items_with_hardware[quantity_idx].save()
+        order_items_with_hardware = checked_out_order_items[
+            (order.id, hardware_item["id"].id)
+        ]
+        num_checked_out = sum(
+            order_item.quantity_unreturned for order_item in order_items_with_hardware
+        )
 
-            if max_available_quantity > 0:
-                response_data["returned_items"].append(
+        if num_checked_out == 0 and hardware_item["quantity"] > 0:
+            response_data["errors"].append(
+                {
+                    "hardware_id": hardware_item["id"].id,
+                    "message": f"There are no checked out items for hardware item {hardware_item['id'].name} for order #{order}.",
+                }
+            )
+
+        max_available_quantity = hardware_item["quantity"]
+        if num_checked_out < hardware_item["quantity"]:
+            max_available_quantity = num_checked_out
+            if num_checked_out > 0:
+                response_data["errors"].append(
                     {
                         "hardware_id": hardware_item["id"].id,
-                        "quantity": max_available_quantity,
+                        "message": f"Requested quantity of {hardware_item['quantity']} for hardware {hardware_item['id'].name} was higher than available. {max_available_quantity} {'was' if max_available_quantity == 1 else 'were'} returned.",
                     }
                 )
 
-        return response_data
+        remaining = max_available_quantity
+        while remaining > 0:
+            order_item = order_items_with_hardware[0]
+            quantity = min(remaining, order_item.quantity_unreturned)
+            return_units(order_item, quantity, hardware_item["part_returned_health"])
+            if order_item.quantity_unreturned == 0:
+                order_items_with_hardware.pop(0)
+            remaining -= quantity
+
+        if max_available_quantity > 0:
+            response_data["returned_items"].append(
+                {
+                    "hardware_id": hardware_item["id"].id,
+                    "quantity": max_available_quantity,
+                }
+            )
+
+    return response_data
 
 
 class OrderItemReturnResponseSerializer(serializers.Serializer):
     class OrderReturnResponseErrorSerializer(serializers.Serializer):
-        hardware_id = serializers.PrimaryKeyRelatedField(
-            queryset=Hardware.objects.all(), many=False, required=True
-        )
+        hardware_id = serializers.IntegerField(required=True)
         message = serializers.CharField(
             max_length=None, min_length=None, allow_blank=False
         )
 
     class OrderReturnResponseReturnItemSerializer(serializers.Serializer):
-        hardware_id = serializers.PrimaryKeyRelatedField(
-            queryset=Hardware.objects.all(), many=False, required=True
-        )
+        hardware_id = serializers.IntegerField(required=True)
         quantity = serializers.IntegerField(required=True)
 
-    order_id = serializers.PrimaryKeyRelatedField(
-        queryset=Order.objects.all(), many=False, required=True
-    )
+    order_id = serializers.IntegerField(required=True)
     team_code = serializers.CharField(required=True)
     returned_items = OrderReturnResponseReturnItemSerializer(many=True, required=True)
     errors = OrderReturnResponseErrorSerializer(many=True, required=True)
+
+
+class OrderItemBatchReturnResponseSerializer(serializers.Serializer):
+    results = OrderItemReturnResponseSerializer(many=True, required=True)
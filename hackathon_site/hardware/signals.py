@@ -0,0 +1,166 @@
+from collections import Counter
+
+from django.db.models import F, Sum
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from hardware.models import (
+    Category,
+    Hardware,
+    Order,
+    OrderItem,
+    category_list_cache,
+    hardware_catalog_cache,
+    team_holdings_cache,
+)
+
+
+@receiver(pre_save, sender=OrderItem, dispatch_uid="order_item_stock_pre_save")
+def remember_order_item_stock(sender, instance, raw=False, **kwargs):
+    """
+    Remember what the order item looked like before it was saved, so that the
+    change in stock can be applied to the hardware once the save is done.
+    """
+    instance._previous_stock = None
+    if raw or instance.pk is None:
+        return
+
+    previous = (
+        OrderItem.objects.filter(pk=instance.pk)
+        .select_related("order")
+        .only("hardware_id", "quantity", "quantity_returned_healthy", "order__status")
+        .first()
+    )
+    if previous is not None:
+        instance._previous_stock = (previous.hardware_id, previous.stock_consumed())
+
+
+@receiver(post_save, sender=OrderItem, dispatch_uid="order_item_stock_post_save")
+def update_stock_on_order_item_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    deltas = Counter()
+    previous = getattr(instance, "_previous_stock", None)
+    if previous is not None:
+        previous_hardware_id, previously_consumed = previous
+        deltas[previous_hardware_id] -= previously_consumed
+    deltas[instance.hardware_id] += instance.stock_consumed()
+
+    Hardware.objects.update_quantity_checked_out(deltas)
+
+
+@receiver(post_delete, sender=OrderItem, dispatch_uid="order_item_stock_post_delete")
+def update_stock_on_order_item_delete(sender, instance, **kwargs):
+    order_status = (
+        Order.objects.filter(pk=instance.order_id)
+        .values_list("status", flat=True)
+        .first()
+    )
+    Hardware.objects.update_quantity_checked_out(
+        {instance.hardware_id: -instance.stock_consumed(order_status=order_status)}
+    )
+
+
+@receiver(pre_save, sender=Order, dispatch_uid="order_stock_pre_save")
+def remember_order_status(sender, instance, raw=False, **kwargs):
+    instance._previous_status = None
+    instance._previous_team_id = None
+    if raw or instance.pk is None:
+        return
+
+    previous = (
+        Order.objects.filter(pk=instance.pk).values_list("status", "team_id").first()
+    )
+    if previous is not None:
+        instance._previous_status, instance._previous_team_id = previous
+
+
+@receiver(post_save, sender=Order, dispatch_uid="order_stock_post_save")
+def update_stock_on_order_status_change(sender, instance, raw=False, **kwargs):
+    """
+    Items in a cancelled order do not count as checked out. When an order is
+    cancelled (or un-cancelled from the admin site), move all of its unreturned
+    items back into (or out of) stock.
+    """
+    previous_status = getattr(instance, "_previous_status", None)
+    if raw or previous_status is None:
+        return
+
+    was_cancelled = previous_status == "Cancelled"
+    is_cancelled = instance.status == "Cancelled"
+    if was_cancelled == is_cancelled:
+        return
+
+    sign = 1 if was_cancelled else -1
+    item_counts = (
+        instance.items.values("hardware_id")
+        .annotate(count=Sum(F("quantity") - F("quantity_returned_healthy")))
+        .values_list("hardware_id", "count")
+    )
+    Hardware.objects.update_quantity_checked_out(
+        {hardware_id: sign * count for hardware_id, count in item_counts}
+    )
+
+
+@receiver(post_save, sender=Hardware, dispatch_uid="hardware_catalog_hardware_save")
+@receiver(post_delete, sender=Hardware, dispatch_uid="hardware_catalog_hardware_delete")
+@receiver(post_save, sender=Category, dispatch_uid="hardware_catalog_category_save")
+@receiver(post_delete, sender=Category, dispatch_uid="hardware_catalog_category_delete")
+@receiver(
+    m2m_changed,
+    sender=Hardware.categories.through,
+    dispatch_uid="hardware_catalog_categories_changed",
+)
+def invalidate_hardware_catalog(sender, **kwargs):
+    """
+    Changes in stock invalidate the catalog from
+    Hardware.objects.update_quantity_checked_out, this takes care of
+    everything else shown in the catalog.
+    """
+    hardware_catalog_cache.invalidate()
+
+
+@receiver(post_delete, sender=Hardware, dispatch_uid="category_list_hardware_delete")
+@receiver(post_save, sender=Category, dispatch_uid="category_list_category_save")
+@receiver(post_delete, sender=Category, dispatch_uid="category_list_category_delete")
+@receiver(
+    m2m_changed,
+    sender=Hardware.categories.through,
+    dispatch_uid="category_list_categories_changed",
+)
+def invalidate_category_list(sender, **kwargs):
+    """
+    The category list only shows categories and how much hardware is in them, so
+    changes in stock or to hardware details leave it cached. Deleting hardware
+    removes it from its categories without sending m2m_changed.
+    """
+    category_list_cache.invalidate()
+
+
+@receiver(post_save, sender=Order, dispatch_uid="team_holdings_order_save")
+@receiver(post_delete, sender=Order, dispatch_uid="team_holdings_order_delete")
+def invalidate_team_holdings_on_order_change(sender, instance, **kwargs):
+    """
+    Changes of status move units between pending, checked out and cancelled, and
+    an order moved to another team changes the holdings of both teams.
+    """
+    team_ids = {instance.team_id, getattr(instance, "_previous_team_id", None)}
+    for team_id in team_ids - {None}:
+        team_holdings_cache(team_id).invalidate()
+
+
+@receiver(post_save, sender=OrderItem, dispatch_uid="team_holdings_order_item_save")
+@receiver(post_delete, sender=OrderItem, dispatch_uid="team_holdings_order_item_delete")
+def invalidate_team_holdings_on_order_item_change(sender, instance, **kwargs):
+    """
+    Returns written with bulk_update send no signals, return_order_items
+    invalidates the holdings of their teams itself.
+    """
+    team_id = (
+        Order.objects.filter(pk=instance.order_id)
+        .values_list("team_id", flat=True)
+        .first()
+    )
+    if team_id is not None:
+        team_holdings_cache(team_id).invalidate()
@@ -0,0 +1,77 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from event.models import Team
+from hackathon_site.tests import SetupUserMixin
+from hardware.models import Category, Hardware, Order, OrderItem
+
+
+class HardwareAdminTestMixin(SetupUserMixin):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.is_superuser = True
+        self.user.save()
+
+        self.category = Category.objects.create(name="category", max_per_team=10)
+        self.team = Team.objects.create()
+
+    def _create_hardware(self, i):
+        hardware = Hardware.objects.create(
+            name=f"hardware{i}", quantity_available=10, max_per_team=10,
+        )
+        hardware.categories.add(self.category)
+        return hardware
+
+
+class OrderAdminTestCase(HardwareAdminTestMixin, TestCase):
+    def _create_order(self, size):
+        order = Order.objects.create(
+            status="Picked Up", team=self.team, request={"hardware": []}
+        )
+        for i in range(size):
+            OrderItem.objects.create(
+                order=order, hardware=self._create_hardware(i), quantity=3
+            )
+        return order
+
+    def test_change_view_shows_quantity_remaining(self):
+        self._login()
+        order = self._create_order(1)
+        response = self.client.get(
+            reverse("admin:hardware_order_change", args=[order.id])
+        )
+        self.assertContains(
+            response, '<td class="field-quantity_remaining"><p>7</p></td>', html=True
+        )
+
+    def test_change_view_query_count_does_not_grow_with_order(self):
+        self._login()
+        query_counts = []
+        # The first request warms up the content type cache
+        for size in (1, 1, 10):
+            order = self._create_order(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    reverse("admin:hardware_order_change", args=[order.id])
+                )
+            self.assertEqual(response.status_code, 200)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[1], query_counts[2])
+
+
+class CategoryAdminTestCase(HardwareAdminTestMixin, TestCase):
+    def test_change_view_shows_quantity_remaining(self):
+        self._login()
+        hardware = self._create_hardware(0)
+        Hardware.objects.update_quantity_checked_out({hardware.id: 4})
+
+        response = self.client.get(
+            reverse("admin:hardware_category_change", args=[self.category.id])
+        )
+        self.assertContains(
+            response, '<td class="field-quantity_remaining"><p>6</p></td>', html=True
+        )
@@ -1,15 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import time
+from unittest import skipUnless
 
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.models import Permission, Group
-from django.test import override_settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Sum
+from django.test import override_settings, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.conf import settings
 
 from rest_framework import status, serializers
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 
 from event.models import Team, User, Profile
+from event.permissions import get_permission_snapshot
 from hardware.models import Hardware, Category, Order, OrderItem, Incident
 from hardware.serializers import (
     HardwareSerializer,
@@ -114,6 +124,75 @@ class HardwareListViewTestCase(SetupUserMixin, APITestCase):
         self.assertEqual(len(data["results"]), 1)
         self.assertEqual(data["results"][0]["id"], 2)
 
+    def test_search_by_model_number_manufacturer_and_notes(self):
+        self._login()
+        Hardware.objects.filter(id=self.hardware1.id).update(model_number="ATmega328")
+        Hardware.objects.filter(id=self.hardware2.id).update(manufacturer="Adafruit")
+        Hardware.objects.filter(id=self.hardware3.id).update(notes="Fragile cable")
+
+        for search, expected_id in (
+            ("atmega328", self.hardware1.id),
+            ("adafruit", self.hardware2.id),
+            ("fragile cable", self.hardware3.id),
+        ):
+            response = self.client.get(self._build_filter_url(search=search))
+            self.assertEqual(
+                [res["id"] for res in response.json()["results"]], [expected_id]
+            )
+
+    @skipUnless(connection.vendor == "postgresql", "Full-text search needs Postgres")
+    def test_full_text_search_ranking(self):
+        self._login()
+        Hardware.objects.filter(id=self.hardware1.id).update(notes="Comes with a servo")
+        Hardware.objects.filter(id=self.hardware3.id).update(name="Servo motor")
+
+        # Words are matched as prefixes, and name matches rank above notes
+        response = self.client.get(self._build_filter_url(search="serv"))
+        self.assertEqual(
+            [res["id"] for res in response.json()["results"]],
+            [self.hardware3.id, self.hardware1.id],
+        )
+
+        # An explicit ordering takes precedence over the ranking
+        response = self.client.get(
+            self._build_filter_url(search="serv", ordering="quantity_remaining")
+        )
+        self.assertEqual(
+            [res["id"] for res in response.json()["results"]],
+            [self.hardware1.id, self.hardware3.id],
+        )
+
+        # Characters with a meaning in tsquery syntax are ignored
+        response = self.client.get(self._build_filter_url(search="servo%26!|"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    @skipUnless(connection.vendor == "postgresql", "Full-text search needs Postgres")
+    def test_full_text_search_matches_word_prefixes(self):
+        self._login()
+        Hardware.objects.filter(id=self.hardware3.id).update(name="Servo motor")
+
+        # Unlike the SearchFilter fallback, the middle of a word matches nothing
+        for search, expected_ids in (
+            ("servo", [self.hardware3.id]),
+            ("mot serv", [self.hardware3.id]),
+            ("ervo", []),
+        ):
+            response = self.client.get(self._build_filter_url(search=search))
+            self.assertEqual(
+                [res["id"] for res in response.json()["results"]], expected_ids
+            )
+
+    @skipUnless(connection.vendor != "postgresql", "Tests the SearchFilter fallback")
+    def test_search_fallback_matches_within_words(self):
+        self._login()
+        Hardware.objects.filter(id=self.hardware3.id).update(name="Servo motor")
+
+        response = self.client.get(self._build_filter_url(search="ervo"))
+        self.assertEqual(
+            [res["id"] for res in response.json()["results"]], [self.hardware3.id]
+        )
+
     def test_in_stock_true(self):
         self._login()
         OrderItem.objects.create(hardware=self.hardware1, order=self.order)
@@ -232,6 +311,62 @@ class HardwareListViewTestCase(SetupUserMixin, APITestCase):
             else:
                 self.assertEqual(returned_ids, order_asc[::-1], msg="descending")
 
+    def test_response_is_cached(self):
+        self._login()
+        cache.clear()
+
+        url = self._build_filter_url(category_ids="2,1", ordering="name")
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        # Equivalent filters, and unknown query parameters, share the cache entry
+        equivalent_url = self._build_filter_url(
+            category_ids="1,2", ordering="name", foo="bar"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            cached_response = self.client.get(equivalent_url)
+        self.assertFalse(any("hardware_" in query["sql"] for query in queries))
+        self.assertEqual(cached_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_response["X-Cache"], "HIT")
+        self.assertEqual(cached_response.json(), response.json())
+
+        response = self.client.get(self._build_filter_url(ordering="-name"))
+        self.assertEqual(response["X-Cache"], "MISS")
+
+    def test_cache_invalidated_by_stock_change(self):
+        self._login()
+        self.client.get(self.view)
+
+        OrderItem.objects.create(order=self.order, hardware=self.hardware1)
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        quantities = {
+            res["id"]: res["quantity_remaining"] for res in response.json()["results"]
+        }
+        self.assertEqual(quantities[self.hardware1.id], 0)
+
+    def test_cache_invalidated_by_category_change(self):
+        self._login()
+        url = self._build_filter_url(category_ids=self.category3.id)
+        self.client.get(url)
+
+        self.hardware1.categories.add(self.category3)
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertCountEqual(
+            [res["id"] for res in response.json()["results"]],
+            [self.hardware1.id, self.hardware3.id],
+        )
+
+    def test_errors_are_not_cached(self):
+        self._login()
+        url = self._build_filter_url(category_ids="1,b")
+
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn("X-Cache", response)
+
 
 class HardwareDetailViewTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -287,6 +422,18 @@ class HardwareDetailViewTestCase(SetupUserMixin, APITestCase):
 
         self.assertEqual(expected_response, data)
 
+    def test_cache_invalidated_by_hardware_change(self):
+        self._login()
+        self.client.get(self.view)
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        self.hardware.name = "new name"
+        self.hardware.save()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["name"], "new name")
+
 
 class CategoryListViewTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -337,6 +484,43 @@ class CategoryListViewTestCase(SetupUserMixin, APITestCase):
 
         self.assertEqual(expected_unique_hardware_counts, actual_unique_hardware_counts)
 
+    def test_query_count_does_not_grow_with_categories(self):
+        self._login()
+        hardware = Hardware.objects.create(name="Arduino", quantity_available=2)
+
+        query_counts = []
+        for _ in range(2):
+            for i in range(5):
+                hardware.categories.add(
+                    Category.objects.create(name=f"category{i}", max_per_team=4)
+                )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.view)
+            self.assertEqual(response["X-Cache"], "MISS")
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_cache_invalidated_by_membership_change(self):
+        self._login()
+        hardware = Hardware.objects.create(name="Arduino", quantity_available=2)
+        self.client.get(self.view)
+
+        # Stock changes don't affect the category list
+        Hardware.objects.update_quantity_checked_out({hardware.id: 1})
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        hardware.categories.add(self.category)
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"][0]["unique_hardware_count"], 1)
+
+        hardware.delete()
+        response = self.client.get(self.view)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"][0]["unique_hardware_count"], 0)
+
 
 class IncidentListViewTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -461,6 +645,46 @@ class IncidentListViewTestCase(SetupUserMixin, APITestCase):
         returned_ids = [res["id"] for res in results]
         self.assertCountEqual(returned_ids, [2])
 
+    @skipUnless(connection.vendor == "postgresql", "Full-text search needs Postgres")
+    def test_full_text_search_filter(self):
+        self._login(self.permissions)
+
+        for search, expected_ids in (
+            (self.team.team_code[:3].lower(), [self.incident.id, self.incident2.id]),
+            ("brok", [self.incident.id]),
+            # The whole search document of the hardware is searched
+            ("othermod", [self.incident2.id]),
+            (f"miss {self.team.team_code}", [self.incident2.id]),
+            ("anufacturer", []),
+        ):
+            response = self.client.get(self._build_filter_url(search=search))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertCountEqual(
+                [res["id"] for res in response.json()["results"]], expected_ids
+            )
+
+    def test_cursor_pagination(self):
+        self._login(self.permissions)
+
+        response = self.client.get(self._build_filter_url(cursor="", limit=1))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertNotIn("count", data)
+        self.assertEqual([res["id"] for res in data["results"]], [self.incident2.id])
+
+        data = self.client.get(data["next"]).json()
+        self.assertEqual([res["id"] for res in data["results"]], [self.incident.id])
+        self.assertIsNone(data["next"])
+
+    def test_limit_offset_pagination(self):
+        self._login(self.permissions)
+
+        response = self.client.get(self._build_filter_url(limit=1, offset=1))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(len(data["results"]), 1)
+
 
 class OrderListViewGetTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -652,6 +876,80 @@ class OrderListViewGetTestCase(SetupUserMixin, APITestCase):
         returned_ids = [res["id"] for res in results]
         self.assertCountEqual(returned_ids, [self.order_3.id, self.order_4.id])
 
+    def _get_cursor_pages(self, url):
+        pages = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertNotIn("count", data)
+            pages.append(data)
+            url = data["next"]
+        return pages
+
+    def test_cursor_pagination(self):
+        self._login(self.view_permissions)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self._build_filter_url(cursor="", limit=3))
+        self.assertFalse(any("COUNT(" in query["sql"] for query in queries))
+
+        data = response.json()
+        self.assertEqual(
+            [res["id"] for res in data["results"]],
+            [self.order_4.id, self.order_3.id, self.order_2.id],
+        )
+        self.assertIsNone(data["previous"])
+
+        data = self.client.get(data["next"]).json()
+        self.assertEqual([res["id"] for res in data["results"]], [self.order.id])
+        self.assertIsNone(data["next"])
+
+        data = self.client.get(data["previous"]).json()
+        self.assertEqual(
+            [res["id"] for res in data["results"]],
+            [self.order_4.id, self.order_3.id, self.order_2.id],
+        )
+        self.assertIsNone(data["previous"])
+
+    def test_cursor_pagination_ascending(self):
+        self._login(self.view_permissions)
+
+        pages = self._get_cursor_pages(
+            self._build_filter_url(cursor="", limit=1, ordering="created_at")
+        )
+        self.assertEqual(
+            [res["id"] for page in pages for res in page["results"]],
+            [self.order.id, self.order_2.id, self.order_3.id, self.order_4.id],
+        )
+
+    def test_cursor_pagination_same_created_at(self):
+        Order.objects.update(created_at=datetime(2022, 8, 8, tzinfo=settings.TZ_INFO))
+        self._login(self.view_permissions)
+
+        pages = self._get_cursor_pages(self._build_filter_url(cursor="", limit=1))
+        self.assertEqual(
+            [res["id"] for page in pages for res in page["results"]],
+            [self.order_4.id, self.order_3.id, self.order_2.id, self.order.id],
+        )
+
+    def test_cursor_pagination_with_filter(self):
+        self._login(self.view_permissions)
+
+        pages = self._get_cursor_pages(
+            self._build_filter_url(cursor="", limit=1, team_code="ABCDE")
+        )
+        self.assertEqual(
+            [res["id"] for page in pages for res in page["results"]],
+            [self.order_4.id, self.order_3.id],
+        )
+
+    def test_invalid_cursor(self):
+        self._login(self.view_permissions)
+
+        response = self.client.get(self._build_filter_url(cursor="foo"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class OrderItemListViewGetTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -804,6 +1102,32 @@ class OrderItemListViewGetTestCase(SetupUserMixin, APITestCase):
             returned_ids, [self.order_item_5.id, self.order_item_6.id]
         )
 
+    def test_cursor_pagination(self):
+        self._login(self.view_permissions)
+
+        returned_ids = []
+        url = self._build_filter_url(cursor="", limit=4)
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertNotIn("count", data)
+            returned_ids += [res["id"] for res in data["results"]]
+            url = data["next"]
+
+        # Newest orders first, then by id
+        self.assertEqual(
+            returned_ids,
+            [
+                self.order_item_6.id,
+                self.order_item_5.id,
+                self.order_item_4.id,
+                self.order_item_3.id,
+                self.order_item_2.id,
+                self.order_item_1.id,
+            ],
+        )
+
 
 class IncidentListViewPostTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -1182,7 +1506,7 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
 
         order = Order.objects.get(pk=1)
         self.assertEqual(order.items.count(), 1, "More than 1 order item created")
-        self.assertCountEqual(order.hardware.all(), [simple_hardware])
+        self.assertCountEqual(order.hardware.distinct(), [simple_hardware])
 
     @override_settings(HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO))
     def test_create_simple_order(self):
@@ -1215,7 +1539,7 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
 
         order = Order.objects.get(pk=1)
         self.assertEqual(order.items.count(), 1, "More than 1 order item created")
-        self.assertCountEqual(order.hardware.all(), [simple_hardware])
+        self.assertCountEqual(order.hardware.distinct(), [simple_hardware])
 
     @override_settings(HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO))
     def test_invalid_input_hardware_limit(self):
@@ -1329,16 +1653,16 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
             request={"hardware": [{"id": 1, "quantity": 2}]},
         )
         healthy_order_item = OrderItem.objects.create(
-            order=order, hardware=hardware, part_returned_health="Healthy"
+            order=order, hardware=hardware, quantity_returned_healthy=1
         )
         used_order_item = OrderItem.objects.create(
-            order=order, hardware=hardware, part_returned_health="Heavily Used"
+            order=order, hardware=hardware, quantity_returned_heavily_used=1
         )
         broken_order_item = OrderItem.objects.create(
-            order=order, hardware=hardware, part_returned_health="Broken"
+            order=order, hardware=hardware, quantity_returned_broken=1
         )
         lost_order_item = OrderItem.objects.create(
-            order=order, hardware=hardware, part_returned_health="Lost"
+            order=order, hardware=hardware, quantity_returned_lost=1
         )
 
         request_data = {"hardware": [{"id": hardware.id, "quantity": 4}]}
@@ -1355,8 +1679,8 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
         self.assertEqual(response.json(), expected_response)
 
         order = Order.objects.get(pk=2)
-        self.assertEqual(order.items.count(), 4)
-        self.assertCountEqual(order.hardware.all(), [hardware])
+        self.assertEqual(order.items.get().quantity, 4)
+        self.assertCountEqual(order.hardware.distinct(), [hardware])
 
     @override_settings(HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO))
     def test_hardware_limit_cancelled_orders(self):
@@ -1397,7 +1721,7 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
 
         order = Order.objects.get(pk=2)
         self.assertEqual(order.items.all().count(), 1)
-        self.assertCountEqual(order.hardware.all(), [hardware])
+        self.assertCountEqual(order.hardware.distinct(), [hardware])
 
     @override_settings(HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO))
     def test_invalid_input_category_limit(self):
@@ -1511,16 +1835,16 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
             request={"hardware": [{"id": 1, "quantity": 2}, {"id": 2, "quantity": 3}]},
         )
         healthy_order_item = OrderItem.objects.create(
-            order=order, hardware=hardware, part_returned_health="Healthy"
+            order=order, hardware=hardware, quantity_returned_healthy=1
         )
         used_order_item = OrderItem.objects.create(
-            order=order, hardware=hardware, part_returned_health="Heavily Used"
+            order=order, hardware=hardware, quantity_returned_heavily_used=1
         )
         broken_order_item = OrderItem.objects.create(
-            order=order, hardware=hardware, part_returned_health="Broken"
+            order=order, hardware=hardware, quantity_returned_broken=1
         )
         lost_order_item = OrderItem.objects.create(
-            order=order, hardware=hardware, part_returned_health="Lost"
+            order=order, hardware=hardware, quantity_returned_lost=1
         )
 
         request_data = {"hardware": [{"id": hardware.id, "quantity": 4}]}
@@ -1537,8 +1861,8 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
         self.assertEqual(response.json(), expected_response)
 
         order = Order.objects.get(pk=2)
-        self.assertEqual(order.items.count(), 4)
-        self.assertCountEqual(order.hardware.all(), [hardware])
+        self.assertEqual(order.items.get().quantity, 4)
+        self.assertCountEqual(order.hardware.distinct(), [hardware])
 
     @override_settings(HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO))
     def test_category_limit_cancelled_orders(self):
@@ -1579,7 +1903,7 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
 
         order = Order.objects.get(pk=2)
         self.assertEqual(order.items.count(), 1)
-        self.assertCountEqual(order.hardware.all(), [hardware])
+        self.assertCountEqual(order.hardware.distinct(), [hardware])
 
     @override_settings(HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO))
     def test_invalid_inputs_multiple_hardware(self):
@@ -1696,12 +2020,12 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
         self.assertEqual(response_json.get("errors"), [])
 
         order = Order.objects.get(pk=order_id)
-        self.assertCountEqual(order.hardware.all(), [hardware_1, hardware_2])
+        self.assertCountEqual(order.hardware.distinct(), [hardware_1, hardware_2])
         self.assertEqual(
-            order.items.filter(hardware=hardware_1).count(), num_hardware_1_requested
+            order.items.get(hardware=hardware_1).quantity, num_hardware_1_requested
         )
         self.assertEqual(
-            order.items.filter(hardware=hardware_2).count(), num_hardware_2_requested
+            order.items.get(hardware=hardware_2).quantity, num_hardware_2_requested
         )
 
     @override_settings(HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO))
@@ -1747,8 +2071,8 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
         self.assertEqual(response.json(), expected_response)
 
         order = Order.objects.get(pk=1)
-        self.assertEqual(order.items.all().count(), num_hardware_requested)
-        self.assertCountEqual(order.hardware.all(), [hardware])
+        self.assertEqual(order.items.get().quantity, num_hardware_requested)
+        self.assertCountEqual(order.hardware.distinct(), [hardware])
 
     @override_settings(HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO))
     def test_limited_by_remaining_quantities(self):
@@ -1779,12 +2103,8 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
             status="Submitted",
             request={"hardware": [{"id": 1, "quantity": 2}]},
         )
-        OrderItem.objects.bulk_create(
-            [
-                OrderItem(order=order, hardware=hardware)
-                for _ in range(num_existing_orders)
-            ]
-        )
+        for _ in range(num_existing_orders):
+            OrderItem.objects.create(order=order, hardware=hardware)
 
         request_data = {
             "hardware": [{"id": hardware.id, "quantity": num_hardware_requested}]
@@ -1893,6 +2213,182 @@ class OrderListViewPostTestCase(SetupUserMixin, APITestCase):
             {"non_field_errors": ["User's team does not meet team size criteria"]},
         )
 
+    def _create_cart(self, size):
+        hardware_list = []
+        for i in range(size):
+            hardware = Hardware.objects.create(
+                name=f"hardware{i}",
+                model_number="model",
+                manufacturer="manufacturer",
+                datasheet="/datasheet/location/",
+                quantity_available=10,
+                max_per_team=10,
+                picture="/picture/location",
+            )
+            hardware.categories.add(
+                Category.objects.create(name=f"category{i}", max_per_team=10)
+            )
+            hardware_list.append(hardware)
+        return {
+            "hardware": [
+                {"id": hardware.id, "quantity": 1} for hardware in hardware_list
+            ]
+        }
+
+    @override_settings(
+        HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO),
+        HARDWARE_SIGN_OUT_END_DATE=datetime.now(settings.TZ_INFO)
+        + relativedelta(days=1),
+    )
+    def test_query_count_does_not_grow_with_cart(self):
+        self._login()
+        self.create_min_number_of_profiles()
+        # Cache the permissions of the user ahead of time
+        get_permission_snapshot(self.user)
+
+        query_counts = []
+        for size in (1, 10):
+            request_data = self._create_cart(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.view, request_data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    @override_settings(
+        HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO),
+        HARDWARE_SIGN_OUT_END_DATE=datetime.now(settings.TZ_INFO)
+        + relativedelta(days=1),
+    )
+    def test_hardware_does_not_exist(self):
+        self._login()
+        self.create_min_number_of_profiles()
+        request_data = self._create_cart(1)
+        request_data["hardware"].append({"id": 1000, "quantity": 1})
+
+        response = self.client.post(self.view, request_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            {"hardware": [{}, {"id": ['Invalid pk "1000" - object does not exist.']}]},
+        )
+
+    @override_settings(
+        HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO),
+        HARDWARE_SIGN_OUT_END_DATE=datetime.now(settings.TZ_INFO)
+        + relativedelta(days=1),
+    )
+    def test_category_limit_counts_other_hardware_in_category(self):
+        self._login()
+        self.create_min_number_of_profiles()
+
+        hardware_list = []
+        for i in range(2):
+            hardware = Hardware.objects.create(
+                name=f"hardware{i}",
+                model_number="model",
+                manufacturer="manufacturer",
+                datasheet="/datasheet/location/",
+                quantity_available=10,
+                max_per_team=10,
+                picture="/picture/location",
+            )
+            hardware.categories.add(self.category_limit_1)
+            hardware_list.append(hardware)
+
+        order = Order.objects.create(
+            team=self.team,
+            status="Submitted",
+            request={"hardware": [{"id": hardware_list[0].id, "quantity": 1}]},
+        )
+        OrderItem.objects.create(order=order, hardware=hardware_list[0])
+
+        request_data = {"hardware": [{"id": hardware_list[1].id, "quantity": 1}]}
+        response = self.client.post(self.view, request_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            {
+                "non_field_errors": [
+                    "Maximum number of items for the Category {} is reached (limit of {} items per team)".format(
+                        self.category_limit_1.name, self.category_limit_1.max_per_team
+                    )
+                ]
+            },
+        )
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Concurrent orders need row locking, run against Postgres",
+)
+@override_settings(
+    HARDWARE_SIGN_OUT_START_DATE=datetime.now(settings.TZ_INFO),
+    HARDWARE_SIGN_OUT_END_DATE=datetime.now(settings.TZ_INFO) + relativedelta(days=1),
+)
+class OrderListViewPostConcurrencyTestCase(TransactionTestCase):
+    number_of_teams = 40
+    quantity_available = 10
+
+    def setUp(self):
+        self.hardware = Hardware.objects.create(
+            name="name",
+            model_number="model",
+            manufacturer="manufacturer",
+            datasheet="/datasheet/location/",
+            quantity_available=self.quantity_available,
+            max_per_team=1,
+            picture="/picture/location",
+        )
+        self.view = reverse("api:hardware:order-list")
+
+        self.users = []
+        for i in range(self.number_of_teams):
+            team = Team.objects.create()
+            for j in range(settings.MIN_MEMBERS):
+                user = User.objects.create_user(
+                    username=f"user{i}-{j}@example.com",
+                    email=f"user{i}-{j}@example.com",
+                    password="foobar123",
+                )
+                Profile.objects.create(user=user, team=team, phone_number="1234567890")
+            self.users.append(user)
+
+    def _place_order(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        try:
+            response = client.post(
+                self.view,
+                {"hardware": [{"id": self.hardware.id, "quantity": 1}]},
+                format="json",
+            )
+            return response.status_code
+        finally:
+            # Each thread has its own database connection
+            connections.close_all()
+
+    def test_concurrent_orders_do_not_oversell(self):
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            status_codes = list(executor.map(self._place_order, self.users))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(status_codes.count(201), self.quantity_available)
+        self.assertEqual(
+            status_codes.count(400), self.number_of_teams - self.quantity_available
+        )
+        self.hardware.refresh_from_db()
+        self.assertEqual(self.hardware.quantity_checked_out, self.quantity_available)
+        self.assertEqual(
+            OrderItem.objects.filter(hardware=self.hardware).count(),
+            self.quantity_available,
+        )
+        # A generous bound, meant to catch orders stuck waiting on locks rather
+        # than to benchmark
+        self.assertLess(elapsed, 30)
+
 
 class OrderListPatchTestCase(SetupUserMixin, APITestCase):
     def setUp(self):
@@ -1940,6 +2436,45 @@ class OrderListPatchTestCase(SetupUserMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(request_data["status"], Order.objects.get(id=self.pk).status)
 
+    def test_status_change_emails(self):
+        self._make_event_team(team=self.team)
+        self._login(self.change_permissions)
+        request_data = {"status": "Ready for Pickup"}
+        response = self.client.patch(self._build_view(self.pk), request_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        call_command("send_queued_emails", verbosity=0)
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(len({message.subject for message in mail.outbox}), 1)
+        self.assertIn(f"Order #{self.pk}", mail.outbox[0].subject)
+
+        greetings = {
+            message.to[0]: message.body.split("\n")[0] for message in mail.outbox
+        }
+        self.assertEqual(
+            greetings,
+            {
+                settings.HSS_ADMIN_EMAIL: "Hello Hardware Inventory Admins,",
+                self.user.email: f"Hello {self.user.first_name},",
+                self.user2.email: f"Hello {self.user2.first_name},",
+                self.user3.email: f"Hello {self.user3.first_name},",
+                self.user4.email: f"Hello {self.user4.first_name},",
+            },
+        )
+
+        participant_email = next(
+            message for message in mail.outbox if message.to == [self.user.email]
+        )
+        html_message = participant_email.alternatives[0][0]
+        self.assertIn(f"<p>Hello {self.user.first_name},</p>", html_message)
+        self.assertIn("is Ready for Pickup!", html_message)
+        # The plaintext part is derived from the html
+        self.assertNotIn("<p>", participant_email.body)
+        self.assertIn("is Ready for Pickup!", participant_email.body)
+        self.assertIn(
+            f"here ({settings.HSS_URL}#order{self.pk})", participant_email.body
+        )
+
     def test_unallowed_status_change(self):
         self._login(self.change_permissions)
         request_data = {"status": "Picked Up"}
@@ -2021,6 +2556,133 @@ class OrderItemReturnViewTestCase(SetupUserMixin, APITestCase):
         response = self.client.post(self.view, self.request_data)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def _login_as_admin(self):
+        self.user.groups.add(Group.objects.get(name="Hardware Site Admins"))
+        self._login()
+
+    def _create_kit(self, size):
+        order = Order.objects.create(
+            status="Picked Up",
+            team=self.team,
+            request={"hardware": [{"id": 1, "quantity": 2}]},
+        )
+        request_data = {"hardware": [], "order": order.id}
+        for i in range(size):
+            hardware = Hardware.objects.create(
+                name=f"hardware{i}",
+                model_number="model",
+                manufacturer="manufacturer",
+                datasheet="/datasheet/location/",
+                quantity_available=4,
+                max_per_team=4,
+                picture="/picture/location",
+            )
+            OrderItem.objects.create(order=order, hardware=hardware, quantity=2)
+            request_data["hardware"].append(
+                {"id": hardware.id, "quantity": 2, "part_returned_health": "Healthy"}
+            )
+        return order, request_data
+
+    def test_return_items(self):
+        self._login_as_admin()
+        order, request_data = self._create_kit(2)
+        hardware_ids = [line["id"] for line in request_data["hardware"]]
+        # The same hardware can be returned over multiple lines
+        request_data["hardware"] = [
+            {"id": hardware_ids[0], "quantity": 1, "part_returned_health": "Healthy"},
+            {"id": hardware_ids[0], "quantity": 1, "part_returned_health": "Broken"},
+            {"id": hardware_ids[1], "quantity": 3, "part_returned_health": "Lost"},
+        ]
+
+        response = self.client.post(self.view, request_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.json(),
+            {
+                "order_id": order.id,
+                "team_code": self.team.team_code,
+                "returned_items": [
+                    {"hardware_id": hardware_ids[0], "quantity": 1},
+                    {"hardware_id": hardware_ids[0], "quantity": 1},
+                    {"hardware_id": hardware_ids[1], "quantity": 2},
+                ],
+                "errors": [
+                    {
+                        "hardware_id": hardware_ids[1],
+                        "message": "Requested quantity of 3 for hardware hardware1 was higher than available. 2 were returned.",
+                    }
+                ],
+            },
+        )
+        self.assertCountEqual(
+            order.items.values_list(
+                "hardware_id",
+                "quantity",
+                "quantity_returned_healthy",
+                "quantity_returned_broken",
+                "quantity_returned_lost",
+            ),
+            [(hardware_ids[0], 2, 1, 1, 0), (hardware_ids[1], 2, 0, 0, 2)],
+        )
+        self.assertEqual(
+            dict(Hardware.objects.values_list("id", "quantity_checked_out")),
+            {self.hardware.id: 1, hardware_ids[0]: 1, hardware_ids[1]: 2},
+        )
+
+    def test_return_items_over_multiple_lines(self):
+        self._login_as_admin()
+        order, request_data = self._create_kit(1)
+        hardware_id = request_data["hardware"][0]["id"]
+        partly_returned = order.items.get()
+        partly_returned.quantity_returned_heavily_used = 1
+        partly_returned.save()
+        OrderItem.objects.create(order=order, hardware_id=hardware_id, quantity=2)
+        request_data["hardware"][0]["quantity"] = 3
+
+        response = self.client.post(self.view, request_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["errors"], [])
+        self.assertCountEqual(
+            order.items.values_list(
+                "quantity",
+                "quantity_returned_healthy",
+                "quantity_returned_heavily_used",
+            ),
+            [(2, 1, 1), (2, 2, 0)],
+        )
+        self.assertEqual(
+            Hardware.objects.get(id=hardware_id).quantity_checked_out, 1,
+        )
+
+    def test_return_hardware_does_not_exist(self):
+        self._login_as_admin()
+        order, request_data = self._create_kit(1)
+        request_data["hardware"].append(
+            {"id": 1000, "quantity": 1, "part_returned_health": "Healthy"}
+        )
+
+        response = self.client.post(self.view, request_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            {"hardware": [{}, {"id": ['Invalid pk "1000" - object does not exist.']}]},
+        )
+
+    def test_return_query_count_does_not_grow_with_kit(self):
+        self._login_as_admin()
+        # Cache the permissions of the admin ahead of time
+        get_permission_snapshot(self.user)
+
+        query_counts = []
+        for size in (1, 10):
+            order, request_data = self._create_kit(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.view, request_data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
     # TODO: https://ieeeuoft.atlassian.net/browse/IEEE-224
     # def test_successful_status_change(self):
     #     self._login(self.permissions)
@@ -2045,3 +2707,215 @@ class OrderItemReturnViewTestCase(SetupUserMixin, APITestCase):
     #     del final_response["id"]
     #     for attribute in similar_attributes:
     #         self.assertEqual(final_response[attribute], self.request_data[attribute])
+
+
+class OrderItemBatchReturnViewTestCase(SetupUserMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.view = reverse("api:hardware:order-return-batch")
+
+        self.hardware = Hardware.objects.create(
+            name="name",
+            model_number="model",
+            manufacturer="manufacturer",
+            datasheet="/datasheet/location/",
+            quantity_available=10,
+            max_per_team=10,
+            picture="/picture/location",
+        )
+
+        self.team1 = Team.objects.create()
+        self.team2 = Team.objects.create()
+        self._make_profile(self.user, self.team1)
+        self.user2 = User.objects.create_user(
+            username="frank@johnston.com",
+            password="hellothere31415",
+            email="frank@johnston.com",
+            first_name="Frank",
+            last_name="Johnston",
+        )
+        self._make_profile(self.user2, self.team2)
+
+        self.team1_orders = [self._create_order(self.team1, 2) for _ in range(2)]
+        self.team2_order = self._create_order(self.team2, 3)
+
+    def _create_order(self, team, quantity, status="Picked Up"):
+        order = Order.objects.create(
+            status=status,
+            team=team,
+            request={"hardware": [{"id": self.hardware.id, "quantity": quantity}]},
+        )
+        OrderItem.objects.create(order=order, hardware=self.hardware, quantity=quantity)
+        return order
+
+    def _login_as_admin(self):
+        self.user.groups.add(Group.objects.get(name="Hardware Site Admins"))
+        self._login()
+
+    def test_user_not_logged_in(self):
+        response = self.client.post(self.view, {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_not_admin(self):
+        self._login()
+        response = self.client.post(self.view, {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_nothing_to_return(self):
+        self._login_as_admin()
+        response = self.client.post(self.view, {"orders": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            {"non_field_errors": ["No orders or teams specified in return request"]},
+        )
+
+    def test_order_and_team_do_not_exist(self):
+        self._login_as_admin()
+        request_data = {
+            "orders": [
+                {
+                    "order": 1000,
+                    "hardware": [
+                        {"id": 1000, "quantity": 1, "part_returned_health": "Healthy"}
+                    ],
+                }
+            ],
+            "teams": [{"team_code": "ZZZZZ", "part_returned_health": "Healthy"}],
+        }
+        response = self.client.post(self.view, request_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            {
+                "orders": [
+                    {
+                        "order": ['Invalid pk "1000" - object does not exist.'],
+                        "hardware": [
+                            {"id": ['Invalid pk "1000" - object does not exist.']}
+                        ],
+                    }
+                ],
+                "teams": [{"team_code": ["Team ZZZZZ does not exist."]}],
+            },
+        )
+
+    def test_return_orders(self):
+        self._login_as_admin()
+        request_data = {
+            "orders": [
+                {
+                    "order": order.id,
+                    "hardware": [
+                        {
+                            "id": self.hardware.id,
+                            "quantity": 2,
+                            "part_returned_health": "Healthy",
+                        }
+                    ],
+                }
+                for order in (*self.team1_orders, self.team2_order)
+            ]
+        }
+
+        response = self.client.post(self.view, request_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        call_command("send_queued_emails", verbosity=0)
+        self.assertEqual(
+            response.json(),
+            {
+                "results": [
+                    {
+                        "order_id": order.id,
+                        "team_code": order.team.team_code,
+                        "returned_items": [
+                            {"hardware_id": self.hardware.id, "quantity": 2}
+                        ],
+                        "errors": [],
+                    }
+                    for order in (*self.team1_orders, self.team2_order)
+                ]
+            },
+        )
+        self.hardware.refresh_from_db()
+        self.assertEqual(self.hardware.quantity_checked_out, 1)
+
+        # Notifications are sent once per team, to the admins and the team
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertCountEqual(
+            [message.to for message in mail.outbox],
+            [
+                [settings.HSS_ADMIN_EMAIL],
+                [settings.HSS_ADMIN_EMAIL],
+                [self.user.email],
+                [self.user2.email],
+            ],
+        )
+        team1_subject = (
+            f"Returning Items in Orders #{self.team1_orders[0].id}, "
+            f"#{self.team1_orders[1].id} for Team #{self.team1.team_code} - "
+            f"{settings.HACKATHON_NAME}"
+        )
+        self.assertEqual(
+            [message.subject for message in mail.outbox].count(team1_subject), 2
+        )
+
+    def test_return_teams(self):
+        self._login_as_admin()
+        cancelled_order = self._create_order(self.team1, 1, status="Cancelled")
+        request_data = {
+            "teams": [
+                {"team_code": self.team1.team_code, "part_returned_health": "Lost"}
+            ]
+        }
+
+        response = self.client.post(self.view, request_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        call_command("send_queued_emails", verbosity=0)
+        self.assertEqual(
+            [result["order_id"] for result in response.json()["results"]],
+            [order.id for order in self.team1_orders],
+        )
+        self.assertFalse(
+            OrderItem.objects.filter(order__in=self.team1_orders).unreturned().exists()
+        )
+        self.assertEqual(
+            OrderItem.objects.filter(order__in=self.team1_orders).aggregate(
+                lost=Sum("quantity_returned_lost")
+            )["lost"],
+            4,
+        )
+        self.assertEqual(cancelled_order.items.get().quantity_returned, 0)
+        self.assertEqual(self.team2_order.items.get().quantity_returned, 0)
+        # Lost items stay checked out
+        self.hardware.refresh_from_db()
+        self.assertEqual(self.hardware.quantity_checked_out, 7)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_return_orders_and_teams(self):
+        self._login_as_admin()
+        request_data = {
+            "orders": [
+                {
+                    "order": self.team1_orders[0].id,
+                    "hardware": [
+                        {
+                            "id": self.hardware.id,
+                            "quantity": 1,
+                            "part_returned_health": "Broken",
+                        }
+                    ],
+                }
+            ],
+            "teams": [
+                {"team_code": self.team1.team_code, "part_returned_health": "Healthy"}
+            ],
+        }
+
+        response = self.client.post(self.view, request_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order_item = self.team1_orders[0].items.get()
+        self.assertEqual(order_item.quantity_returned_broken, 1)
+        self.assertEqual(order_item.quantity_returned_healthy, 1)
+        self.hardware.refresh_from_db()
+        self.assertEqual(self.hardware.quantity_checked_out, 4)
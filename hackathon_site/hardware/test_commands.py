@@ -0,0 +1,144 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from event.models import Team
+from hardware.models import Hardware, Order, OrderItem
+
+
+class ReconcileHardwareStockTestCase(TestCase):
+    def setUp(self):
+        self.hardware = Hardware.objects.create(
+            name="name", quantity_available=4, max_per_team=4,
+        )
+        self.other_hardware = Hardware.objects.create(
+            name="other", quantity_available=4, max_per_team=4,
+        )
+        order = Order.objects.create(
+            status="Picked Up",
+            team=Team.objects.create(),
+            request={"hardware": [{"id": 1, "quantity": 2}]},
+        )
+        OrderItem.objects.create(order=order, hardware=self.hardware)
+        OrderItem.objects.create(order=order, hardware=self.hardware)
+
+    def _call_command(self, *args):
+        out = StringIO()
+        call_command("reconcile_hardware_stock", *args, stdout=out)
+        return out.getvalue()
+
+    def _introduce_drift(self):
+        Hardware.objects.filter(id=self.hardware.id).update(quantity_checked_out=5)
+        Hardware.objects.filter(id=self.other_hardware.id).update(
+            quantity_checked_out=1
+        )
+
+    def test_no_drift(self):
+        output = self._call_command()
+        self.assertIn("No drift found", output)
+
+    def test_fixes_drift(self):
+        self._introduce_drift()
+        output = self._call_command()
+
+        self.assertIn(
+            f"Hardware {self.hardware.id} (name): stored quantity_checked_out is 5, "
+            "expected 2",
+            output,
+        )
+        self.assertIn("Fixed drift in 2 hardware", output)
+        self.hardware.refresh_from_db()
+        self.other_hardware.refresh_from_db()
+        self.assertEqual(self.hardware.quantity_checked_out, 2)
+        self.assertEqual(self.other_hardware.quantity_checked_out, 0)
+
+    def test_dry_run(self):
+        self._introduce_drift()
+        output = self._call_command("--dry-run")
+
+        self.assertIn("not fixed (dry run)", output)
+        self.hardware.refresh_from_db()
+        self.assertEqual(self.hardware.quantity_checked_out, 5)
+
+
+class BenchmarkOrderEmailsTestCase(TestCase):
+    def test_benchmark(self):
+        out = StringIO()
+        with self.assertNumQueries(0):
+            call_command(
+                "benchmark_order_emails", "--iterations=2", "--team-size=4", stdout=out
+            )
+
+        output = out.getvalue()
+        self.assertIn("for 5 recipients (admins and 4 members)", output)
+        self.assertIn("Per recipient: mean", output)
+        self.assertIn("Composer: mean", output)
+
+
+class BenchmarkHardwareSearchTestCase(TestCase):
+    def test_benchmark(self):
+        out = StringIO()
+        call_command(
+            "benchmark_hardware_search",
+            "--catalog-size=50",
+            "--iterations=2",
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn("Containment: mean", output)
+        self.assertIn("Full-text: mean", output)
+        # The generated catalog is rolled back
+        self.assertFalse(Hardware.objects.exists())
+
+
+class ExplainHotQueriesTestCase(TestCase):
+    def test_explain(self):
+        team = Team.objects.create()
+        hardware = Hardware.objects.create(name="name", quantity_available=4)
+        order = Order.objects.create(team=team, status="Picked Up", request={})
+        OrderItem.objects.create(order=order, hardware=hardware, quantity=2)
+
+        out = StringIO()
+        call_command("explain_hot_queries", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn(f"Team {team.id}, hardware {hardware.id}", output)
+        self.assertIn("Team active orders (team leave, join and delete)", output)
+        self.assertIn("Unreturned items of the team's orders (returns)", output)
+
+    @skipUnless(connection.vendor != "postgresql", "Tests the non-Postgres error")
+    def test_analyze_requires_postgres(self):
+        with self.assertRaises(CommandError):
+            call_command("explain_hot_queries", "--analyze", stdout=StringIO())
+
+
+class SimulateOrderRushTestCase(TransactionTestCase):
+    @skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+    def test_simulation(self):
+        call_command("seed_event", users=100, hardware=10, stdout=StringIO())
+
+        out = StringIO()
+        call_command(
+            "simulate_order_rush",
+            "--teams=5",
+            "--polls=1",
+            "--poll-interval=0",
+            "--cancel-rate=0.5",
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn("5 teams ready", output)
+        self.assertIn("order: 5 requests", output)
+        self.assertIn("Deadlocks: 0", output)
+        self.assertIn("No consistency violations found.", output)
+        self.assertTrue(Order.objects.filter(status="Submitted").exists())
+
+    @skipUnless(connection.vendor != "postgresql", "Tests the non-Postgres error")
+    def test_requires_postgres(self):
+        with self.assertRaisesMessage(CommandError, "requires PostgreSQL"):
+            call_command("simulate_order_rush", stdout=StringIO())
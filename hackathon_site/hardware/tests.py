@@ -1,3 +1,4 @@
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from rest_framework import serializers
 
@@ -87,7 +88,7 @@ class HardwareSerializerTestCase(TestCase):
             request={"hardware": [{"id": 1, "quantity": 2}]},
         )
         order_item_1 = OrderItem.objects.create(
-            order=order, hardware=self.hardware, part_returned_health="Healthy"
+            order=order, hardware=self.hardware, quantity_returned_healthy=1
         )
         order_item_2 = OrderItem.objects.create(order=order, hardware=self.hardware,)
         self.hardware.refresh_from_db()
@@ -150,7 +151,7 @@ class HardwareQuantityRemainingTestCase(TestCase):
             request={"hardware": [{"id": 1, "quantity": 2}]},
         )
         order_item_1 = OrderItem.objects.create(
-            order=order, hardware=self.hardware, part_returned_health="Healthy"
+            order=order, hardware=self.hardware, quantity_returned_healthy=1
         )
         order_item_2 = OrderItem.objects.create(order=order, hardware=self.hardware,)
         self.hardware.refresh_from_db()
@@ -165,7 +166,7 @@ class HardwareQuantityRemainingTestCase(TestCase):
             request={"hardware": [{"id": 1, "quantity": 2}]},
         )
         OrderItem.objects.create(
-            order=order, hardware=self.hardware, part_returned_health="Broken"
+            order=order, hardware=self.hardware, quantity_returned_broken=1
         )
         OrderItem.objects.create(
             order=order, hardware=self.hardware,
@@ -188,6 +189,144 @@ class HardwareQuantityRemainingTestCase(TestCase):
         self.assertEqual(hardware_serializer.data["quantity_remaining"], 4)
 
 
+class HardwareQuantityCheckedOutTestCase(TestCase):
+    def setUp(self):
+        self.hardware = Hardware.objects.create(
+            name="name",
+            model_number="model",
+            manufacturer="manufacturer",
+            datasheet="/datasheet/location/",
+            quantity_available=4,
+            max_per_team=4,
+            picture="/picture/location",
+        )
+        self.team = Team.objects.create()
+        self.order = Order.objects.create(
+            status="Picked Up",
+            team=self.team,
+            request={"hardware": [{"id": 1, "quantity": 2}]},
+        )
+
+    def assertCheckedOut(self, expected):
+        self.hardware.refresh_from_db()
+        self.assertEqual(self.hardware.quantity_checked_out, expected)
+        self.assertEqual(
+            self.hardware.quantity_checked_out,
+            Hardware.objects.compute_quantity_checked_out().get(self.hardware.id, 0),
+        )
+
+    def test_create_order_items(self):
+        OrderItem.objects.create(order=self.order, hardware=self.hardware)
+        OrderItem.objects.create(order=self.order, hardware=self.hardware)
+        self.assertCheckedOut(2)
+
+    def test_return_order_item(self):
+        item = OrderItem.objects.create(
+            order=self.order, hardware=self.hardware, quantity=3
+        )
+
+        item.quantity_returned_healthy = 1
+        item.quantity_returned_broken = 1
+        item.save()
+        self.assertCheckedOut(2)
+
+        item.quantity_returned_healthy = 0
+        item.save()
+        self.assertCheckedOut(3)
+
+    def test_create_order_item_quantity(self):
+        OrderItem.objects.create(order=self.order, hardware=self.hardware, quantity=3)
+        self.assertCheckedOut(3)
+
+    def test_delete_order_item(self):
+        item = OrderItem.objects.create(order=self.order, hardware=self.hardware)
+        OrderItem.objects.create(order=self.order, hardware=self.hardware)
+        item.delete()
+        self.assertCheckedOut(1)
+
+    def test_cancel_and_restore_order(self):
+        OrderItem.objects.create(order=self.order, hardware=self.hardware)
+        OrderItem.objects.create(
+            order=self.order, hardware=self.hardware, quantity_returned_healthy=1
+        )
+        OrderItem.objects.create(
+            order=self.order, hardware=self.hardware, quantity_returned_lost=1
+        )
+        self.assertCheckedOut(2)
+
+        self.order.status = "Cancelled"
+        self.order.save()
+        self.assertCheckedOut(0)
+
+        self.order.status = "Submitted"
+        self.order.save()
+        self.assertCheckedOut(2)
+
+    def test_delete_order(self):
+        OrderItem.objects.create(order=self.order, hardware=self.hardware)
+        OrderItem.objects.create(order=self.order, hardware=self.hardware)
+        self.order.delete()
+        self.assertCheckedOut(0)
+
+    def test_update_quantity_checked_out(self):
+        other_hardware = Hardware.objects.create(
+            name="other", quantity_available=4, max_per_team=4,
+        )
+        Hardware.objects.update_quantity_checked_out(
+            {self.hardware.id: 3, other_hardware.id: 1}
+        )
+        Hardware.objects.update_quantity_checked_out(
+            {self.hardware.id: -1, other_hardware.id: 0}
+        )
+
+        self.hardware.refresh_from_db()
+        other_hardware.refresh_from_db()
+        self.assertEqual(self.hardware.quantity_checked_out, 2)
+        self.assertEqual(self.hardware.quantity_remaining, 2)
+        self.assertEqual(other_hardware.quantity_checked_out, 1)
+
+
+class OrderItemTestCase(TestCase):
+    def setUp(self):
+        self.hardware = Hardware.objects.create(
+            name="name", quantity_available=10, max_per_team=10,
+        )
+        self.order = Order.objects.create(
+            status="Picked Up",
+            team=Team.objects.create(),
+            request={"hardware": [{"id": 1, "quantity": 4}]},
+        )
+        self.order_item = OrderItem.objects.create(
+            order=self.order,
+            hardware=self.hardware,
+            quantity=4,
+            quantity_returned_healthy=1,
+            quantity_returned_lost=1,
+        )
+
+    def test_quantities(self):
+        self.assertEqual(self.order_item.quantity_returned, 2)
+        self.assertEqual(self.order_item.stock_consumed(), 3)
+        self.assertEqual(self.order_item.stock_consumed("Cancelled"), 0)
+        self.assertEqual(
+            self.order_item.get_units(), ["Healthy", "Lost", None, None],
+        )
+        self.assertEqual(self.order_item.part_returned_health, "Lost")
+
+    def test_unreturned(self):
+        order_item = OrderItem.objects.unreturned().get()
+        self.assertEqual(order_item.quantity_unreturned, 2)
+
+        self.order_item.quantity_returned_broken = 2
+        self.order_item.save()
+        self.assertFalse(OrderItem.objects.unreturned().exists())
+
+    def test_cannot_return_more_than_quantity(self):
+        self.order_item.quantity_returned_broken = 3
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.order_item.save()
+
+
 class CategorySerializerTestCase(TestCase):
     def setUp(self):
         self.category = Category.objects.create(name="category", max_per_team=4)
@@ -246,7 +385,7 @@ class IncidentSerializerTestCase(TestCase):
         )
 
         self.order_item_1 = OrderItem.objects.create(
-            order=self.order, hardware=self.hardware, part_returned_health="Healthy"
+            order=self.order, hardware=self.hardware, quantity_returned_healthy=1
         )
         self.incident = Incident.objects.create(
             state="Broken",
@@ -279,6 +418,11 @@ class IncidentSerializerTestCase(TestCase):
                 "hardware": 1,
                 "order": 1,
                 "part_returned_health": "Healthy",
+                "quantity": 1,
+                "quantity_returned_healthy": 1,
+                "quantity_returned_heavily_used": 0,
+                "quantity_returned_broken": 0,
+                "quantity_returned_lost": 0,
             },
             "team_id": 1,
             "created_at": serializers.DateTimeField().to_representation(
@@ -347,7 +491,7 @@ class OrderListSerializerTestCase(TestCase):
             request={"hardware": [{"id": 1, "quantity": 2}, {"id": 2, "quantity": 3}]},
         )
         item_1 = OrderItem.objects.create(
-            order=order, hardware=self.hardware, part_returned_health="Healthy"
+            order=order, hardware=self.hardware, quantity=2, quantity_returned_healthy=1
         )
         item_2 = OrderItem.objects.create(order=order, hardware=self.other_hardware,)
         self.hardware.refresh_from_db()
@@ -360,12 +504,20 @@ class OrderListSerializerTestCase(TestCase):
             "status": "Cart",
             "items": [
                 {
-                    "id": item_1.id,
+                    "id": f"{item_1.id}-0",
+                    "order_item_id": item_1.id,
                     "part_returned_health": "Healthy",
                     "hardware_id": self.hardware.id,
                 },
                 {
-                    "id": item_2.id,
+                    "id": f"{item_1.id}-1",
+                    "order_item_id": item_1.id,
+                    "part_returned_health": None,
+                    "hardware_id": self.hardware.id,
+                },
+                {
+                    "id": f"{item_2.id}-0",
+                    "order_item_id": item_2.id,
                     "part_returned_health": None,
                     "hardware_id": self.other_hardware.id,
                 },
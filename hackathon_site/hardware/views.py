@@ -1,27 +1,39 @@
+from collections import defaultdict
 import logging
 
 from django.conf import settings
-from django.core import mail
-from django.core.mail import send_mail
 from django_filters import rest_framework as filters
 from django.db import transaction
 from django.http import HttpResponseServerError
 from drf_yasg.utils import swagger_auto_schema
-from django.template.loader import render_to_string
 
 from rest_framework import generics, mixins, status, permissions
 from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
 
 from event.models import Profile
+from hackathon_site.cache import CachedResponseMixin
+from hackathon_site.pagination import LimitOffsetOrCursorPagination
+from hackathon_site.utils import atomic_with_retry
+from outbox.utils import NotificationComposer
 from event.permissions import UserHasProfile, FullDjangoModelPermissions, UserIsAdmin
 from hardware.api_filters import (
     HardwareFilter,
+    HardwareSearchFilter,
     OrderFilter,
     IncidentFilter,
+    IncidentSearchFilter,
     OrderItemFilter,
 )
-from hardware.models import Hardware, Category, Order, Incident, OrderItem
+from hardware.models import (
+    Hardware,
+    Category,
+    Order,
+    Incident,
+    OrderItem,
+    category_list_cache,
+    hardware_catalog_cache,
+)
 
 from hardware.serializers import (
     CategorySerializer,
@@ -36,6 +48,8 @@ from hardware.serializers import (
     OrderItemListSerializer,
     OrderItemReturnSerializer,
     OrderItemReturnResponseSerializer,
+    OrderItemBatchReturnSerializer,
+    OrderItemBatchReturnResponseSerializer,
 )
 
 logger = logging.getLogger(__name__)
@@ -55,25 +69,39 @@ ORDER_STATUS_CLOSING_MSG = {
 }
 
 
-class HardwareListView(mixins.ListModelMixin, generics.GenericAPIView):
-    queryset = Hardware.objects.all()
+class HardwareListView(
+    CachedResponseMixin, mixins.ListModelMixin, generics.GenericAPIView
+):
+    queryset = Hardware.objects.all().prefetch_related("categories")
     serializer_class = HardwareSerializer
+    response_cache = hardware_catalog_cache
 
-    filter_backends = (filters.DjangoFilterBackend, SearchFilter, OrderingFilter)
+    filter_backends = (
+        filters.DjangoFilterBackend,
+        HardwareSearchFilter,
+        OrderingFilter,
+    )
     filterset_class = HardwareFilter
-    search_fields = ("name",)
+    search_fields = ("name", "model_number", "manufacturer", "notes")
     ordering_fields = ("name", "quantity_remaining")
 
     def get(self, request, *args, **kwargs):
-        return self.list(request, *args, **kwargs)
+        return self.cached_response(
+            request, lambda: self.list(request, *args, **kwargs)
+        )
 
 
-class HardwareDetailView(mixins.RetrieveModelMixin, generics.GenericAPIView):
+class HardwareDetailView(
+    CachedResponseMixin, mixins.RetrieveModelMixin, generics.GenericAPIView
+):
     queryset = Hardware.objects.all()
     serializer_class = HardwareSerializer
+    response_cache = hardware_catalog_cache
 
     def get(self, request, *args, **kwargs):
-        return self.retrieve(request, *args, **kwargs)
+        return self.cached_response(
+            request, lambda: self.retrieve(request, *args, **kwargs)
+        )
 
 
 class IncidentListView(
@@ -86,10 +114,11 @@ class IncidentListView(
         "order_item__hardware__manufacturer",
     )
 
-    filter_backends = (filters.DjangoFilterBackend, SearchFilter)
+    filter_backends = (filters.DjangoFilterBackend, IncidentSearchFilter)
     filterset_class = IncidentFilter
     permission_classes = [FullDjangoModelPermissions]
     queryset = Incident.objects.all().select_related("order_item__order__team")
+    pagination_class = LimitOffsetOrCursorPagination
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -134,6 +163,11 @@ class IncidentDetailView(
             return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
 
 
+class OrderItemPagination(LimitOffsetOrCursorPagination):
+    # Order items don't have their own timestamps, they are created with their order
+    cursor_ordering = ("order__created_at", "id")
+
+
 class OrderItemListView(mixins.ListModelMixin, generics.GenericAPIView):
     search_fields = ("order__team__team_code", "order__id")
     filter_backends = (filters.DjangoFilterBackend, SearchFilter)
@@ -141,17 +175,23 @@ class OrderItemListView(mixins.ListModelMixin, generics.GenericAPIView):
     permission_classes = [FullDjangoModelPermissions]
     queryset = OrderItem.objects.all().select_related("order__team")
     serializer_class = OrderItemListSerializer
+    pagination_class = OrderItemPagination
 
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
 
 
-class CategoryListView(mixins.ListModelMixin, generics.GenericAPIView):
-    queryset = Category.objects.all().prefetch_related("hardware_set")
+class CategoryListView(
+    CachedResponseMixin, mixins.ListModelMixin, generics.GenericAPIView
+):
+    queryset = Category.objects.with_hardware_count().order_by("id")
     serializer_class = CategorySerializer
+    response_cache = category_list_cache
 
     def get(self, request, *args, **kwargs):
-        return self.list(request, *args, **kwargs)
+        return self.cached_response(
+            request, lambda: self.list(request, *args, **kwargs)
+        )
 
 
 class OrderListView(generics.ListAPIView):
@@ -165,6 +205,7 @@ class OrderListView(generics.ListAPIView):
     filterset_class = OrderFilter
     ordering_fields = ("created_at",)
     search_fields = ("team__team_code", "id")
+    pagination_class = LimitOffsetOrCursorPagination
 
     create_order_email_subject_template = (
         "hardware/emails/create_order/create_order_email_subject.txt"
@@ -192,70 +233,45 @@ class OrderListView(generics.ListAPIView):
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
 
-    @transaction.atomic
-    @swagger_auto_schema(responses={201: OrderCreateResponseSerializer})
-    def post(self, request, *args, **kwargs):
+    def create_order(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         create_response = serializer.save()
         response_serializer = OrderCreateResponseSerializer(data=create_response)
         if not response_serializer.is_valid():
             logger.error(response_serializer.error_messages)
-            return HttpResponseServerError()
+            return None
         response_data = response_serializer.data
 
-        profiles = Profile.objects.filter(team__exact=request.user.profile.team)
-        connection = mail.get_connection(fail_silently=False)
-        connection.open()
-
-        try:
-            render_to_string_context = {
-                "requester": request.user,
-                "recipient": "Hardware Inventory Admins",
-                "order": response_data,
-            }
-            send_mail(
-                subject=render_to_string(
-                    self.create_order_email_subject_template, render_to_string_context
-                ),
-                message=render_to_string(
-                    self.create_order_email_body_template_admin,
-                    render_to_string_context,
-                ),
-                html_message=render_to_string(
-                    self.create_order_email_body_template_admin,
-                    render_to_string_context,
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                connection=connection,
-                recipient_list=[settings.HSS_ADMIN_EMAIL],
+        profiles = Profile.objects.filter(
+            team__exact=request.user.profile.team
+        ).select_related("user")
+        composer = NotificationComposer(
+            self.create_order_email_subject_template,
+            {"requester": request.user, "order": response_data},
+        )
+        composer.add(
+            self.create_order_email_body_template_admin,
+            "Hardware Inventory Admins",
+            settings.HSS_ADMIN_EMAIL,
+        )
+        for profile in profiles:
+            composer.add(
+                self.create_order_email_body_template_participant,
+                profile.user.first_name,
+                profile.user.email,
             )
-            for profile in profiles:
-                render_to_string_context = {
-                    **render_to_string_context,
-                    "recipient": profile.user,
-                }
-                profile.user.email_user(
-                    subject=render_to_string(
-                        self.create_order_email_subject_template,
-                        render_to_string_context,
-                    ),
-                    message=render_to_string(
-                        self.create_order_email_body_template_participant,
-                        render_to_string_context,
-                    ),
-                    html_message=render_to_string(
-                        self.create_order_email_body_template_participant,
-                        render_to_string_context,
-                    ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    connection=connection,
-                )
-        except Exception as e:
-            logger.error(e)
-            raise e
-        finally:
-            connection.close()
+        composer.queue()
+        return response_data
+
+    @swagger_auto_schema(responses={201: OrderCreateResponseSerializer})
+    def post(self, request, *args, **kwargs):
+        # The requested hardware is locked while the order is created, retry if
+        # the transaction is aborted by a deadlock or serialization failure.
+        # Emails are queued in the same transaction.
+        response_data = atomic_with_retry(lambda: self.create_order(request))
+        if response_data is None:
+            return HttpResponseServerError()
         return Response(response_data, status=status.HTTP_201_CREATED)
 
 
@@ -274,66 +290,36 @@ class OrderDetailView(generics.GenericAPIView, mixins.UpdateModelMixin):
         "hardware/emails/order_status_change/order_status_change_email_admin_body.html"
     )
 
+    @transaction.atomic
     def patch(self, request, *args, **kwargs):
         response = self.partial_update(request, *args, **kwargs)
 
         if "status" in request.data:
-            profiles = Profile.objects.filter(team__exact=response.data["team_id"])
-            connection = mail.get_connection(fail_silently=False)
-            connection.open()
-
-            try:
-                render_to_string_context = {
-                    "recipient": "Hardware Inventory Admins",
+            profiles = Profile.objects.filter(
+                team__exact=response.data["team_id"]
+            ).select_related("user")
+            composer = NotificationComposer(
+                self.update_order_email_subject_template,
+                {
                     "order": response.data,
                     "order_status_message": ORDER_STATUS_MSG[response.data["status"]],
-                }
-                send_mail(
-                    subject=render_to_string(
-                        self.update_order_email_subject_template,
-                        render_to_string_context,
-                    ),
-                    message=render_to_string(
-                        self.update_order_email_template_admin,
-                        render_to_string_context,
-                    ),
-                    html_message=render_to_string(
-                        self.update_order_email_template_admin,
-                        render_to_string_context,
-                    ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    connection=connection,
-                    recipient_list=[settings.HSS_ADMIN_EMAIL],
+                    "order_status_closing_message": ORDER_STATUS_CLOSING_MSG[
+                        response.data["status"]
+                    ],
+                },
+            )
+            composer.add(
+                self.update_order_email_template_admin,
+                "Hardware Inventory Admins",
+                settings.HSS_ADMIN_EMAIL,
+            )
+            for profile in profiles:
+                composer.add(
+                    self.update_order_email_template_participant,
+                    profile.user.first_name,
+                    profile.user.email,
                 )
-                for profile in profiles:
-                    render_to_string_context = {
-                        **render_to_string_context,
-                        "recipient": profile.user,
-                        "order_status_closing_message": ORDER_STATUS_CLOSING_MSG[
-                            response.data["status"]
-                        ],
-                    }
-                    profile.user.email_user(
-                        subject=render_to_string(
-                            self.update_order_email_subject_template,
-                            render_to_string_context,
-                        ),
-                        message=render_to_string(
-                            self.update_order_email_template_participant,
-                            render_to_string_context,
-                        ),
-                        html_message=render_to_string(
-                            self.update_order_email_template_participant,
-                            render_to_string_context,
-                        ),
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        connection=connection,
-                    )
-            except Exception as e:
-                logger.error(e)
-                raise e
-            finally:
-                connection.close()
+            composer.queue()
         return response
 
 
@@ -366,57 +352,89 @@ class OrderItemReturnView(generics.GenericAPIView):
         if len(create_response["returned_items"]) > 0:
             profiles = Profile.objects.filter(
                 team__team_code=create_response["team_code"]
+            ).select_related("user")
+            composer = NotificationComposer(
+                self.return_order_email_subject_template,
+                {"requester": request.user, "order": create_response},
             )
-            connection = mail.get_connection(fail_silently=False)
-            connection.open()
-
-            try:
-                render_to_string_context = {
-                    "requester": request.user,
-                    "recipient": "Hardware Inventory Admins",
-                    "order": create_response,
-                }
-                send_mail(
-                    subject=render_to_string(
-                        self.return_order_email_subject_template,
-                        render_to_string_context,
-                    ),
-                    message=render_to_string(
-                        self.return_order_email_body_template_admin,
-                        render_to_string_context,
-                    ),
-                    html_message=render_to_string(
-                        self.return_order_email_body_template_admin,
-                        render_to_string_context,
-                    ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    connection=connection,
-                    recipient_list=[settings.HSS_ADMIN_EMAIL],
+            composer.add(
+                self.return_order_email_body_template_admin,
+                "Hardware Inventory Admins",
+                settings.HSS_ADMIN_EMAIL,
+            )
+            for profile in profiles:
+                composer.add(
+                    self.return_order_email_body_template_participant,
+                    profile.user.first_name,
+                    profile.user.email,
+                )
+            composer.queue()
+        return Response(create_response, status=status.HTTP_201_CREATED)
+
+
+class OrderItemBatchReturnView(generics.GenericAPIView):
+    serializer_class = OrderItemBatchReturnSerializer
+    permission_classes = [UserIsAdmin]
+
+    batch_return_email_subject_template = (
+        "hardware/emails/batch_return/batch_return_email_subject.txt"
+    )
+    batch_return_email_body_template_participant = (
+        "hardware/emails/batch_return/batch_return_email_body.html"
+    )
+    batch_return_email_body_template_admin = (
+        "hardware/emails/batch_return/batch_return_email_admin_body.html"
+    )
+
+    def return_items(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        create_response = serializer.save()
+        response_serializer = OrderItemBatchReturnResponseSerializer(
+            data=create_response
+        )
+        if not response_serializer.is_valid():
+            logger.error(response_serializer.errors)
+            return None
+
+        # One email per team, covering all of its returned orders
+        orders_by_team_code = defaultdict(list)
+        for order in create_response["results"]:
+            if len(order["returned_items"]) > 0:
+                orders_by_team_code[order["team_code"]].append(order)
+
+        if orders_by_team_code:
+            profiles = Profile.objects.filter(
+                team__team_code__in=orders_by_team_code.keys()
+            ).select_related("user", "team")
+            for team_code, orders in orders_by_team_code.items():
+                composer = NotificationComposer(
+                    self.batch_return_email_subject_template,
+                    {
+                        "requester": request.user,
+                        "team_code": team_code,
+                        "orders": orders,
+                    },
+                )
+                composer.add(
+                    self.batch_return_email_body_template_admin,
+                    "Hardware Inventory Admins",
+                    settings.HSS_ADMIN_EMAIL,
                 )
                 for profile in profiles:
-                    render_to_string_context = {
-                        **render_to_string_context,
-                        "recipient": profile.user,
-                    }
-                    profile.user.email_user(
-                        subject=render_to_string(
-                            self.return_order_email_subject_template,
-                            render_to_string_context,
-                        ),
-                        message=render_to_string(
-                            self.return_order_email_body_template_participant,
-                            render_to_string_context,
-                        ),
-                        html_message=render_to_string(
-                            self.return_order_email_body_template_participant,
-                            render_to_string_context,
-                        ),
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        connection=connection,
-                    )
-            except Exception as e:
-                logger.error(e)
-                raise e
-            finally:
-                connection.close()
+                    if profile.team.team_code == team_code:
+                        composer.add(
+                            self.batch_return_email_body_template_participant,
+                            profile.user.first_name,
+                            profile.user.email,
+                        )
+                composer.queue()
+        return create_response
+
+    @swagger_auto_schema(responses={201: OrderItemBatchReturnResponseSerializer})
+    def post(self, request, *args, **kwargs):
+        # Emails are queued in the same transaction as the returns
+        create_response = atomic_with_retry(lambda: self.return_items(request))
+        if create_response is None:
+            return HttpResponseServerError()
         return Response(create_response, status=status.HTTP_201_CREATED)
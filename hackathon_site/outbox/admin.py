@@ -0,0 +1,45 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from outbox.models import OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "subject",
+        "recipient_list",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("subject", "recipient_list")
+    readonly_fields = (
+        "subject",
+        "message",
+        "html_message",
+        "from_email",
+        "recipient_list",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "last_error",
+        "sent_at",
+        "created_at",
+        "updated_at",
+    )
+    actions = ("retry",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        count = queryset.exclude(status="Sent").update(
+            status="Pending", attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"Queued {count} email(s) to be sent again.")
+
+    retry.short_description = "Send the selected emails again"
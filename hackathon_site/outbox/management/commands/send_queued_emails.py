@@ -0,0 +1,125 @@
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from outbox.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued emails in batches over a single connection to the mail "
+        "server. Failed emails are retried with exponential backoff, and marked "
+        "as Failed once they run out of attempts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.OUTBOX_BATCH_SIZE,
+            help="Number of emails to send per batch.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, checking for new emails every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between checks for new emails with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        while True:
+            while self.send_batch(options["batch_size"]) == options["batch_size"]:
+                # There may be more emails waiting
+                pass
+            if not options["loop"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
+
+    def send_batch(self, batch_size):
+        """
+        Send one batch of due emails, and return the number of emails processed.
+
+        The batch is locked until it's done, with SKIP LOCKED so that several
+        workers can run at once without sending the same emails. If a worker dies
+        mid-batch, the whole batch is sent again by the next one.
+        """
+        with transaction.atomic():
+            emails = list(
+                OutboxEmail.objects.select_for_update(skip_locked=True)
+                .filter(status="Pending", next_attempt_at__lte=timezone.now())
+                .order_by("next_attempt_at", "id")[:batch_size]
+            )
+            if not emails:
+                return 0
+
+            sent = failed = 0
+            connection = mail.get_connection(fail_silently=False)
+            try:
+                connection.open()
+            except Exception as e:
+                # Couldn't connect to the mail server, retry the batch later
+                for email in emails:
+                    self._record_failure(email, e)
+                failed = len(emails)
+            else:
+                try:
+                    for email in emails:
+                        try:
+                            email.to_message(connection=connection).send()
+                        except Exception as e:
+                            self._record_failure(email, e)
+                            failed += 1
+                            # Don't reuse a connection that may have been dropped,
+                            # backends reconnect for the next email
+                            connection.close()
+                        else:
+                            email.status = "Sent"
+                            email.sent_at = timezone.now()
+                            sent += 1
+                finally:
+                    connection.close()
+
+            now = timezone.now()
+            for email in emails:
+                email.updated_at = now
+            OutboxEmail.objects.bulk_update(
+                emails,
+                [
+                    "status",
+                    "attempts",
+                    "next_attempt_at",
+                    "last_error",
+                    "sent_at",
+                    "updated_at",
+                ],
+            )
+
+        if self.verbosity > 0:
+            self.stdout.write(f"Sent {sent} email(s), {failed} failed.")
+        return len(emails)
+
+    @staticmethod
+    def _record_failure(email, error):
+        email.attempts += 1
+        email.last_error = str(error)
+        if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            # Dead letter, can be retried from the admin site
+            email.status = "Failed"
+        else:
+            email.next_attempt_at = timezone.now() + timedelta(
+                seconds=settings.OUTBOX_RETRY_BACKOFF * 2 ** (email.attempts - 1)
+            )
@@ -0,0 +1,52 @@
+from django.core.mail import EmailMultiAlternatives
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEmail(models.Model):
+    """
+    A rendered email waiting to be sent. Emails are queued in the same transaction
+    as the changes they are about, and sent by the send_queued_emails management
+    command.
+    """
+
+    STATUS_CHOICES = [
+        ("Pending", "Pending"),
+        ("Sent", "Sent"),
+        ("Failed", "Failed"),
+    ]
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    subject = models.TextField(null=False)
+    message = models.TextField(null=False)
+    html_message = models.TextField(null=True, blank=True)
+    from_email = models.CharField(max_length=255, null=False)
+    recipient_list = models.JSONField(null=False)
+
+    status = models.CharField(
+        max_length=64, choices=STATUS_CHOICES, default="Pending", null=False
+    )
+    attempts = models.IntegerField(default=0, null=False)
+    next_attempt_at = models.DateTimeField(default=timezone.now, null=False)
+    last_error = models.TextField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True, null=False)
+    updated_at = models.DateTimeField(auto_now=True, null=False)
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.message,
+            from_email=self.from_email,
+            to=self.recipient_list,
+            connection=connection,
+        )
+        if self.html_message:
+            message.attach_alternative(self.html_message, "text/html")
+        return message
+
+    def __str__(self):
+        return f"{self.id} | {self.subject}"
@@ -0,0 +1,50 @@
+from django.urls import reverse
+from django.test import TestCase
+
+from hackathon_site.tests import SetupUserMixin
+from outbox.models import OutboxEmail
+from outbox.utils import queue_mail
+
+
+class OutboxEmailAdminTestCase(SetupUserMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.is_superuser = True
+        self.user.save()
+
+        self.view = reverse("admin:outbox_outboxemail_changelist")
+        self.failed_email = queue_mail(
+            subject="Failed", message="", recipient_list=["foo@bar.com"]
+        )
+        self.sent_email = queue_mail(
+            subject="Sent", message="", recipient_list=["foo@bar.com"]
+        )
+        OutboxEmail.objects.filter(pk=self.failed_email.pk).update(
+            status="Failed", attempts=5, last_error="Oops"
+        )
+        OutboxEmail.objects.filter(pk=self.sent_email.pk).update(status="Sent")
+
+    def test_list_view(self):
+        self._login()
+        response = self.client.get(self.view)
+        self.assertContains(response, "Failed")
+        self.assertContains(response, "foo@bar.com")
+
+    def test_retry(self):
+        self._login()
+        response = self.client.post(
+            self.view,
+            {
+                "action": "retry",
+                "_selected_action": [self.failed_email.pk, self.sent_email.pk],
+            },
+            follow=True,
+        )
+        self.assertContains(response, "Queued 1 email(s) to be sent again.")
+
+        self.failed_email.refresh_from_db()
+        self.assertEqual(self.failed_email.status, "Pending")
+        self.assertEqual(self.failed_email.attempts, 0)
+        self.sent_email.refresh_from_db()
+        self.assertEqual(self.sent_email.status, "Sent")
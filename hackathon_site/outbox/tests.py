@@ -0,0 +1,220 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core import mail
+from django.core.mail import BadHeaderError
+from django.core.management import call_command
+from django.template.loader import get_template, render_to_string
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from outbox.models import OutboxEmail
+from outbox.utils import NotificationComposer, html_to_text, queue_mail
+
+
+class QueueMailTestCase(TestCase):
+    def test_queue_mail(self):
+        email = queue_mail(
+            subject="Subject",
+            message="Message",
+            recipient_list=["foo@bar.com"],
+            html_message="<p>Message</p>",
+        )
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, "Pending")
+        self.assertEqual(email.recipient_list, ["foo@bar.com"])
+        self.assertEqual(email.from_email, "webmaster@localhost")
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_subject_with_newlines(self):
+        with self.assertRaises(BadHeaderError):
+            queue_mail(
+                subject="Subject\nBcc: foo@bar.com",
+                message="Message",
+                recipient_list=["foo@bar.com"],
+            )
+        self.assertFalse(OutboxEmail.objects.exists())
+
+
+class HtmlToTextTestCase(TestCase):
+    def test_paragraphs_and_links(self):
+        html = """
+            <p>Hello   Foo &amp; Bar,</p>
+            <p> Click <a href="https://example.com/#order1">here</a> to view
+            more information.</p>
+            <p>Best,<br>
+            The Team
+            </p>
+        """
+        self.assertEqual(
+            html_to_text(html),
+            "Hello Foo & Bar,\n\n"
+            "Click here (https://example.com/#order1) to view more information.\n\n"
+            "Best,\nThe Team",
+        )
+
+    def test_table(self):
+        html = """
+            <table>
+                <thead><tr><th>Item ID</th><th>Quantity</th></tr></thead>
+                <tbody>
+                    <tr>
+                        <td> 1 </td>
+                        <td> 2 </td>
+                    </tr>
+                </tbody>
+            </table>
+            <p>Done</p>
+        """
+        self.assertEqual(html_to_text(html), "Item ID | Quantity\n1 | 2\n\nDone")
+
+
+class NotificationComposerTestCase(TestCase):
+    subject_template = (
+        "hardware/emails/order_status_change/order_status_change_email_subject.txt"
+    )
+    body_template = (
+        "hardware/emails/order_status_change/order_status_change_email_body.html"
+    )
+    admin_body_template = (
+        "hardware/emails/order_status_change/order_status_change_email_admin_body.html"
+    )
+
+    def setUp(self):
+        self.context = {
+            "order": {"id": 1, "team_code": "ABCDE", "status": "Picked Up"},
+            "order_status_message": "has been Picked Up!",
+            "order_status_closing_message": "Happy Hacking!",
+        }
+
+    def _compose(self):
+        composer = NotificationComposer(self.subject_template, self.context)
+        composer.add(self.admin_body_template, "Admins", "admin@bar.com")
+        for name in ("Foo", "Bar", "Baz", "Qux"):
+            composer.add(self.body_template, name, f"{name.lower()}@bar.com")
+        return composer
+
+    def test_queue(self):
+        with self.assertNumQueries(1):
+            emails = self._compose().queue()
+
+        self.assertEqual(len(emails), 5)
+        self.assertEqual(OutboxEmail.objects.filter(status="Pending").count(), 5)
+
+        email = OutboxEmail.objects.get(recipient_list=["baz@bar.com"])
+        self.assertEqual(
+            email.subject,
+            f"Order #1 for Team ABCDE has been Picked Up! - {settings.HACKATHON_NAME}",
+        )
+        self.assertTrue(email.html_message.startswith("<p>Hello Baz,</p>"))
+        self.assertIn("Happy Hacking!", email.html_message)
+        self.assertTrue(email.message.startswith("Hello Baz,\n\n"))
+        self.assertEqual(email.message, html_to_text(email.html_message))
+
+        admin_email = OutboxEmail.objects.get(recipient_list=["admin@bar.com"])
+        self.assertTrue(admin_email.message.startswith("Hello Admins,\n\n"))
+        self.assertIn("Team ABCDE's Order #1", admin_email.message)
+
+    @patch("outbox.utils.get_template", wraps=get_template)
+    @patch("outbox.utils.render_to_string", wraps=render_to_string)
+    def test_renders_shared_parts_once(self, mock_render, mock_get_template):
+        self._compose()
+
+        rendered = [call[0][0] for call in mock_render.call_args_list]
+        self.assertEqual(rendered.count(self.subject_template), 1)
+        self.assertEqual(rendered.count(self.admin_body_template), 1)
+        self.assertEqual(rendered.count(self.body_template), 1)
+        # The greeting is rendered for every recipient from the same template
+        mock_get_template.assert_called_once_with(
+            NotificationComposer.greeting_template
+        )
+
+    def test_greeting_strips_tags(self):
+        composer = NotificationComposer(self.subject_template, self.context)
+        composer.add(self.body_template, "<b>Foo</b>", "foo@bar.com")
+        email = composer.queue()[0]
+        self.assertTrue(email.html_message.startswith("<p>Hello Foo,</p>"))
+
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_BACKOFF=60)
+class SendQueuedEmailsTestCase(TestCase):
+    def setUp(self):
+        self.email = queue_mail(
+            subject="Subject",
+            message="Message",
+            recipient_list=["foo@bar.com"],
+            html_message="<p>Message</p>",
+        )
+
+    def test_send(self):
+        call_command("send_queued_emails", verbosity=0)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "Subject")
+        self.assertEqual(mail.outbox[0].body, "Message")
+        self.assertEqual(mail.outbox[0].to, ["foo@bar.com"])
+        self.assertEqual(mail.outbox[0].alternatives, [("<p>Message</p>", "text/html")])
+
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, "Sent")
+        self.assertIsNotNone(self.email.sent_at)
+
+        # Sent emails are not sent again
+        call_command("send_queued_emails", verbosity=0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_send_in_batches(self):
+        for i in range(4):
+            queue_mail(subject=f"Subject {i}", message="", recipient_list=["a@b.com"])
+
+        call_command("send_queued_emails", "--batch-size=2", verbosity=0)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutboxEmail.objects.exclude(status="Sent").exists())
+
+    def test_not_due_yet(self):
+        self.email.next_attempt_at = timezone.now() + timedelta(minutes=1)
+        self.email.save()
+
+        call_command("send_queued_emails", verbosity=0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    @patch("django.core.mail.EmailMessage.send", side_effect=OSError("Oops"))
+    def test_retry_and_dead_letter(self, mock_send):
+        start = timezone.now()
+        call_command("send_queued_emails", verbosity=0)
+
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, "Pending")
+        self.assertEqual(self.email.attempts, 1)
+        self.assertEqual(self.email.last_error, "Oops")
+        self.assertGreaterEqual(
+            self.email.next_attempt_at, start + timedelta(seconds=60)
+        )
+
+        self.email.next_attempt_at = timezone.now()
+        self.email.save()
+        call_command("send_queued_emails", verbosity=0)
+
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, "Failed")
+        self.assertEqual(self.email.attempts, 2)
+
+        # Failed emails are not retried automatically
+        call_command("send_queued_emails", verbosity=0)
+        self.assertEqual(mock_send.call_count, 2)
+
+    @patch(
+        "django.core.mail.backends.locmem.EmailBackend.open",
+        side_effect=OSError("Connection refused"),
+        create=True,
+    )
+    def test_connection_failure(self, mock_open):
+        call_command("send_queued_emails", verbosity=0)
+
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, "Pending")
+        self.assertEqual(self.email.attempts, 1)
+        self.assertEqual(self.email.last_error, "Connection refused")
+        self.assertEqual(len(mail.outbox), 0)
@@ -0,0 +1,121 @@
+from html import unescape
+import re
+
+from django.conf import settings
+from django.core.mail import BadHeaderError
+from django.template.loader import get_template, render_to_string
+
+from hackathon_site.metrics import timed
+from outbox.models import OutboxEmail
+
+LINK_RE = re.compile(r'<a\s[^>]*?href="([^"]*)"[^>]*>(.*?)</a>', re.IGNORECASE)
+CELL_SEPARATOR_RE = re.compile(r"</t[dh]>\s*<t[dh][^>]*>", re.IGNORECASE)
+LINE_BREAK_RE = re.compile(r"<br\s*/?>|</tr>", re.IGNORECASE)
+PARAGRAPH_BREAK_RE = re.compile(r"</(p|table|h[1-6]|div)>", re.IGNORECASE)
+# Only used on our own templates, so there is no need for a full html parser
+# like django.utils.html.strip_tags, which is much slower
+TAG_RE = re.compile(r"<[^>]*>")
+
+
+def check_subject(subject):
+    if "\n" in subject or "\r" in subject:
+        # Checked now rather than when sending, like send_mail would
+        raise BadHeaderError(
+            f"Header values can't contain newlines (got {subject!r} for header 'Subject')"
+        )
+
+
+def queue_mail(subject, message, recipient_list, from_email=None, html_message=None):
+    """
+    Queue an email to be sent by the send_queued_emails management command. Takes
+    the same arguments as django.core.mail.send_mail.
+
+    The email is saved in the current transaction, so it is only sent if the
+    transaction commits.
+    """
+    check_subject(subject)
+
+    with timed("email"):
+        return OutboxEmail.objects.create(
+            subject=subject,
+            message=message,
+            html_message=html_message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipient_list=list(recipient_list),
+        )
+
+
+def html_to_text(html):
+    """
+    Derive the plaintext alternative of an html email. Links are kept as
+    "text (url)", table cells are separated with "|" and paragraphs with a blank
+    line.
+    """
+    # Whitespace in html is not significant, line breaks come from the tags
+    text = " ".join(html.split())
+    text = LINK_RE.sub(r"\2 (\1)", text)
+    text = CELL_SEPARATOR_RE.sub(" | ", text)
+    text = LINE_BREAK_RE.sub("\n", text)
+    text = PARAGRAPH_BREAK_RE.sub("\n\n", text)
+    text = unescape(TAG_RE.sub("", text))
+
+    lines = [" ".join(line.split()) for line in text.split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+class NotificationComposer:
+    """
+    Compose and queue the emails sent to everyone concerned by a single event,
+    such as an order changing status.
+
+    The subject and each body template are rendered once with the shared context.
+    Only the greeting is rendered for each recipient, and the plaintext part is
+    derived from the html instead of rendering the template a second time.
+    """
+
+    greeting_template = "outbox/emails/greeting.html"
+
+    def __init__(self, subject_template, context, from_email=None):
+        self.context = context
+        self.from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        self.subject = render_to_string(subject_template, context)
+        check_subject(self.subject)
+        self.emails = []
+        self._bodies = {}
+        self._greeting_template = get_template(self.greeting_template)
+
+    def render_body(self, template_name):
+        """
+        Return the (html, text) parts of a body template, rendering it on first use.
+        """
+        if template_name not in self._bodies:
+            html_body = render_to_string(template_name, self.context)
+            self._bodies[template_name] = (html_body, html_to_text(html_body))
+        return self._bodies[template_name]
+
+    def add(self, body_template, recipient_name, email):
+        """
+        Add an email to a single recipient, greeted by name, with the body
+        rendered from body_template.
+        """
+        html_body, text_body = self.render_body(body_template)
+        greeting = self._greeting_template.render({"name": recipient_name})
+
+        self.emails.append(
+            OutboxEmail(
+                subject=self.subject,
+                message=f"{html_to_text(greeting)}\n\n{text_body}",
+                html_message=f"{greeting}\n\n{html_body}",
+                from_email=self.from_email,
+                recipient_list=[email],
+            )
+        )
+
+    def queue(self):
+        """
+        Queue all the composed emails in a single query.
+        """
+        with timed("email"):
+            emails = OutboxEmail.objects.bulk_create(self.emails)
+        self.emails = []
+        return emails
@@ -2,7 +2,7 @@ import json
 
 from django.contrib import admin
 from import_export import resources
-from import_export.admin import ExportMixin
+from hackathon_site.admin import ReplicaExportMixin
 
 from hackathon_site import settings
 from registration.models import Application, Team as TeamApplied
@@ -87,7 +87,7 @@ class ApplicationResource(resources.ModelResource):
 
 
 @admin.register(Application)
-class ApplicationAdmin(ExportMixin, admin.ModelAdmin):
+class ApplicationAdmin(ReplicaExportMixin, admin.ModelAdmin):
     change_list_template = "application/change_list.html"
     resource_class = ApplicationResource
     autocomplete_fields = ("user", "team")
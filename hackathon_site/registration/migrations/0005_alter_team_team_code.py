@@ -0,0 +1,51 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:33
+
+import uuid
+
+from django.db import migrations, models
+from django.db.models import Count
+
+import registration.models
+
+
+def deduplicate_team_codes(apps, schema_editor):
+    """
+    Give a new code to every team but the oldest of those sharing a code, which
+    could happen before codes were unique.
+    """
+    Team = apps.get_model("registration", "Team")
+
+    duplicate_codes = (
+        Team.objects.values("team_code")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("team_code", flat=True)
+    )
+    used_codes = set(Team.objects.values_list("team_code", flat=True))
+    for team_code in list(duplicate_codes):
+        for team in Team.objects.filter(team_code=team_code).order_by("id")[1:]:
+            new_code = team_code
+            while new_code in used_codes:
+                new_code = uuid.uuid4().hex[:5].upper()
+            used_codes.add(new_code)
+            Team.objects.filter(id=team.id).update(team_code=new_code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("registration", "0004_application_rsvp"),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_team_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="team",
+            name="team_code",
+            field=models.CharField(
+                default=registration.models._generate_team_code,
+                max_length=5,
+                unique=True,
+            ),
+        ),
+    ]
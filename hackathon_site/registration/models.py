@@ -3,20 +3,21 @@ from django.core import validators
 from django.contrib.auth import get_user_model
 import uuid
 
+from hackathon_site.utils import UniqueTeamCodeMixin
 from registration.validators import UploadedFileValidator
 
 User = get_user_model()
 
 
 def _generate_team_code():
-    team_code = uuid.uuid4().hex[:5].upper()
-    while Team.objects.filter(team_code=team_code).exists():
-        team_code = uuid.uuid4().hex[:5].upper()
-    return team_code
+    # Uniqueness is enforced by the database, see UniqueTeamCodeMixin
+    return uuid.uuid4().hex[:5].upper()
 
 
-class Team(models.Model):
-    team_code = models.CharField(max_length=5, default=_generate_team_code, null=False)
+class Team(UniqueTeamCodeMixin, models.Model):
+    team_code = models.CharField(
+        max_length=5, default=_generate_team_code, unique=True, null=False
+    )
 
     created_at = models.DateTimeField(auto_now_add=True, null=False)
     updated_at = models.DateTimeField(auto_now=True, null=False)
@@ -1,10 +1,14 @@
+from django.db import transaction
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
-from registration.models import Application
+from hackathon_site.utils import lock_teams
+from registration.models import Application, Team
 
 
 @receiver(post_delete, sender=Application, dispatch_uid="application_delete_signal")
 def delete_application(sender, instance, **kwargs):
-    team = instance.team
-    if team.applications.count() == 0:
-        team.delete()
+    with transaction.atomic():
+        # Locked so that nobody joins the team between the count and the delete
+        team = lock_teams(Team, instance.team_id).get(instance.team_id)
+        if team is not None and not team.applications.exists():
+            team.delete()
@@ -1,5 +1,5 @@
 from django.test import TestCase
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from hackathon_site.tests import SetupUserMixin
 from registration.views import SignUpView
@@ -36,12 +36,14 @@ class CustomSignUpViewTestCase(TestCase):
         user.get_username.return_value = "username"
         view = SignUpViewWithHTMLEmailTemplate()
 
-        view.send_activation_email(user)
+        with patch("registration.views.queue_mail") as mock_queue_mail:
+            view.send_activation_email(user)
 
-        user.email_user.assert_called()
+        mock_queue_mail.assert_called()
 
-        subject, plain_message, _ = user.email_user.call_args[0]
-        html_message = user.email_user.call_args[1]["html_message"]
+        subject, plain_message, recipient_list = mock_queue_mail.call_args[0]
+        html_message = mock_queue_mail.call_args[1]["html_message"]
+        self.assertEqual(recipient_list, [user.email])
 
         # Test that the subject had the newline removed
         self.assertEqual(len(subject.splitlines()), 1)
@@ -70,12 +72,14 @@ class CustomSignUpViewTestCase(TestCase):
         user.get_username.return_value = "username"
         view = SignUpViewWithSingleEmailTemplate()
 
-        view.send_activation_email(user)
+        with patch("registration.views.queue_mail") as mock_queue_mail:
+            view.send_activation_email(user)
 
-        user.email_user.assert_called()
+        mock_queue_mail.assert_called()
 
-        subject, plain_message, _ = user.email_user.call_args[0]
-        html_message = user.email_user.call_args[1]["html_message"]
+        subject, plain_message, recipient_list = mock_queue_mail.call_args[0]
+        html_message = mock_queue_mail.call_args[1]["html_message"]
+        self.assertEqual(recipient_list, [user.email])
 
         # Test that the plaintext email is the same as the html email
         self.assertEqual(plain_message, html_message)
@@ -17,9 +17,10 @@ from django_registration.backends.activation.views import (
     ActivationView as _ActivationView,
 )
 
-from hackathon_site.utils import is_registration_open
+from hackathon_site.utils import is_registration_open, lock_teams
+from outbox.utils import queue_mail
 from registration.forms import SignUpForm, ApplicationForm
-from registration.models import Team as RegistrationTeam
+from registration.models import Application, Team as RegistrationTeam
 from event.models import Team as EventTeam, Profile
 
 
@@ -80,10 +81,11 @@ class SignUpView(RegistrationView):
         else:
             html_message = plain_message
 
-        user.email_user(
+        queue_mail(
             subject,
             plain_message,
-            settings.DEFAULT_FROM_EMAIL,
+            [user.email],
+            from_email=settings.DEFAULT_FROM_EMAIL,
             html_message=html_message,
         )
 
@@ -157,8 +159,8 @@ class LeaveTeamView(LoginRequiredMixin, View):
                 "You have not submitted an application.".encode(encoding="utf-8")
             )
 
-        application = self.request.user.application
-        team = application.team
+        application = Application.objects.select_for_update().get(user=request.user)
+        team = lock_teams(RegistrationTeam, application.team_id)[application.team_id]
 
         # Leaving a team automatically puts them on a new team
         application.team = RegistrationTeam.objects.create()
@@ -268,13 +270,9 @@ class RSVPView(LoginRequiredMixin, View):
                 application.rsvp = False
                 application.save()
 
-                # Delete the profile
+                # Delete the profile, and its team if it is now empty (see
+                # event.signals.delete_profile)
                 if hasattr(request.user, "profile"):
-                    team = user.profile.team
                     user.profile.delete()
 
-                    # Delete the team if it is empty
-                    if not team.profiles.exists():
-                        team.delete()
-
         return redirect(reverse_lazy("event:dashboard"))
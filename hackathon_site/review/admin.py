@@ -7,7 +7,7 @@ from django.urls import reverse, path
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 from import_export import resources
-from import_export.admin import ExportMixin
+from hackathon_site.admin import ReplicaExportMixin
 
 from django.http import HttpResponseRedirect
 
@@ -59,7 +59,7 @@ class ReviewResource(resources.ModelResource):
 
 
 @admin.register(Review)
-class ReviewAdmin(ExportMixin, admin.ModelAdmin):
+class ReviewAdmin(ReplicaExportMixin, admin.ModelAdmin):
     resource_class = ReviewResource
     list_display = ("get_user", "status", "decision_sent_date", "get_reviewer")
     list_filter = (
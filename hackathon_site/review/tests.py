@@ -5,6 +5,7 @@ from unittest.mock import patch, MagicMock
 from django.test import TestCase
 from django.urls import reverse
 from django.core import mail
+from django.core.management import call_command
 from django.conf import settings
 from hackathon_site.tests import SetupUserMixin
 from django.contrib.auth.models import Permission
@@ -157,6 +158,7 @@ class MailerTestCase(SetupUserMixin, TestCase):
         self.form_data["quantity"] = 3  # Send 3 acceptance emails
 
         response = self.client.post(self.view, data=self.form_data)
+        call_command("send_queued_emails", verbosity=0)
 
         quantity_after = Review.objects.filter(
             decision_sent_date__isnull=True, status="Accepted"
@@ -180,6 +182,7 @@ class MailerTestCase(SetupUserMixin, TestCase):
         self.form_data["status"] = "Accepted"
 
         response = self.client.post(self.view, data=self.form_data)
+        call_command("send_queued_emails", verbosity=0)
 
         quantity_after = Review.objects.filter(
             decision_sent_date__isnull=True, status="Accepted"
@@ -211,6 +214,7 @@ class MailerTestCase(SetupUserMixin, TestCase):
 
         # Send 1 accepted email
         response = self.client.post(self.view, data=self.form_data)
+        call_command("send_queued_emails", verbosity=0)
 
         clean = re.compile("<.*?>")
         clean_mail_body = re.sub(clean, "", mail.outbox[0].body)
@@ -247,6 +251,7 @@ class MailerTestCase(SetupUserMixin, TestCase):
         # Send 1 waitlisted email
         self.form_data["status"] = "Waitlisted"
         self.client.post(self.view, data=self.form_data)
+        call_command("send_queued_emails", verbosity=0)
 
         clean = re.compile("<.*?>")
         clean_mail_body = re.sub(clean, "", mail.outbox[0].body)
@@ -274,6 +279,7 @@ class MailerTestCase(SetupUserMixin, TestCase):
         # Send 1 rejected email
         self.form_data["status"] = "Rejected"
         self.client.post(self.view, data=self.form_data)
+        call_command("send_queued_emails", verbosity=0)
 
         clean = re.compile("<.*?>")
         clean_mail_body = re.sub(clean, "", mail.outbox[0].body)
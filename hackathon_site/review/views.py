@@ -5,10 +5,11 @@ from django.shortcuts import redirect
 from django.views.generic.edit import FormView
 from django.contrib.auth.mixins import UserPassesTestMixin
 
+from django.db import transaction
 from django.template.loader import render_to_string
-from django.core import mail
 
 from review.forms import MailerForm
+from outbox.utils import queue_mail
 from review.models import Review
 from hackathon_site import settings
 import logging
@@ -46,13 +47,11 @@ class MailerView(UserPassesTestMixin, FormView):
             updated_at__gte=date_start,
             updated_at__lte=date_end,
             decision_sent_date__isnull=True,
-        )[:quantity]
+        ).select_related("application__user")[:quantity]
 
-        # Get a mail socket connection and manually open it
-        connection = mail.get_connection(fail_silently=False)
-        connection.open()
-
-        try:
+        # Queue the emails and mark the decisions as sent together, so decisions
+        # are never marked as sent without an email
+        with transaction.atomic():
             for review in queryset:
                 current_date = datetime.now().date()
 
@@ -66,7 +65,7 @@ class MailerView(UserPassesTestMixin, FormView):
                     ).strftime("%B %-d %Y"),
                 }
 
-                review.application.user.email_user(
+                queue_mail(
                     subject=render_to_string(
                         f"review/emails/{status.lower()}_email_subject.txt"
                     ),
@@ -79,16 +78,11 @@ class MailerView(UserPassesTestMixin, FormView):
                         render_to_string_context,  # Pass context data to the template
                     ),
                     from_email=settings.DEFAULT_FROM_EMAIL,
-                    connection=connection,
+                    recipient_list=[review.application.user.email],
                 )
 
                 review.decision_sent_date = current_date
                 review.save()
-        except Exception as e:
-            logger.error(e)
-            raise e
-        finally:
-            connection.close()
 
         return redirect(self.get_success_url())
 